@@ -1,17 +1,24 @@
 import argparse
 from datetime import datetime
 from avicena.app.run_common import retrieve_database_inputs, run_parser, run_optimizer, retrieve_csv_inputs, \
-    load_optimizer_config, load_app_config, init_logging
+    load_optimizer_config, load_app_config, init_logging, run_reoptimizer
 from avicena.models.Assignment import generate_visualization_from_df, load_assignment_from_df
 from avicena.models.Driver import prepare_drivers_for_optimizer
+from avicena.optimizers.ALNSOptimizer import ALNSOptimizer
+from avicena.optimizers.DecompositionOptimizer import DecompositionOptimizer
 from avicena.optimizers.GeneralOptimizer import GeneralOptimizer
+from avicena.optimizers.HeuristicOptimizer import HeuristicOptimizer
+from avicena.optimizers.MultiStartOptimizer import MultiStartOptimizer
 from avicena.parsers import LogistiCareParser, CSVParser
-from avicena.util.Database import create_db_session, save_and_commit_to_db, close_db_session
+from avicena.util.Database import create_db_session, save_and_commit_assignments_to_db, close_db_session
 from avicena.util.Exceptions import InvalidConfigException
+from avicena.util.ParserUtil import convert_time
 
 # Supported Parser and Optimizer types that will be passed into the Config file
 parsers = {'LogistiCare': LogistiCareParser, 'CSV': CSVParser}
-optimizers = {'GeneralOptimizer': GeneralOptimizer}
+optimizers = {'GeneralOptimizer': GeneralOptimizer, 'HeuristicOptimizer': HeuristicOptimizer,
+              'ALNSOptimizer': ALNSOptimizer, 'DecompositionOptimizer': DecompositionOptimizer,
+              'MultiStartOptimizer': MultiStartOptimizer}
 
 
 def avicena_run_cli():
@@ -37,6 +44,14 @@ def avicena_run_cli():
                                 default=[101, 102, 103, 104],
                                 help='List of driver IDs separated by spaces')
 
+    parser.add_argument('-p', '--previous-solution', action='store', type=str, dest='previous_solution', default=None,
+                        help='Path to the solution of a previous run. Re-optimizes the rest of the day from it instead '
+                             'of solving the whole day')
+
+    parser.add_argument('-c', '--current-time', action='store', type=str, dest='current_time',
+                        default=datetime.now().strftime('%H:%M'),
+                        help='Current time in HH:MM format. Trips picked up until then are kept when re-optimizing')
+
     args = parser.parse_args()
     app_config = load_app_config()
     optimizer_config = load_optimizer_config()
@@ -51,27 +66,39 @@ def avicena_run_cli():
     else:
         raise InvalidConfigException(f"Invalid optimizer {app_config['optimizer']}")
 
+    output_format = app_config.get('output_format', 'csv')
+    parse_cache_directory = app_config.get('parse_cache_directory')
     database_enabled = app_config['database']['enabled']
     if database_enabled:
         db_session = create_db_session(app_config['database'])
         app_config['database']['db_session'] = db_session
         revenue_table, merge_details, drivers_table = retrieve_database_inputs(db_session)
         trips = run_parser(trip_parser, args.trips_file, revenue_table, merge_details, args.speed, args.name,
-                           app_config['output_directory'])
+                           app_config['output_directory'], output_format, parse_cache_directory)
         drivers = prepare_drivers_for_optimizer(drivers_table, args.driver_ids, args.date)
-        solution = run_optimizer(trip_optimizer, trips, drivers, args.name, args.date, args.speed, optimizer_config,
-                                 app_config['output_directory'])
-        save_and_commit_to_db(db_session, load_assignment_from_df(solution, drivers, args.name))
+        if args.previous_solution:
+            solution = run_reoptimizer(trips, drivers, args.name, args.date, args.speed, optimizer_config,
+                                       app_config['output_directory'], args.previous_solution,
+                                       convert_time(args.current_time), output_format)
+        else:
+            solution = run_optimizer(trip_optimizer, trips, drivers, args.name, args.date, args.speed,
+                                     optimizer_config, app_config['output_directory'], output_format)
+        save_and_commit_assignments_to_db(db_session, [load_assignment_from_df(solution, drivers, args.name)])
         generate_visualization_from_df(solution, drivers, args.name,
                                        app_config['output_directory'] + '/visualization.html', False)
         close_db_session(db_session)
     else:
         revenue_table, merge_details, drivers_table = retrieve_csv_inputs(app_config)
         trips = run_parser(trip_parser, args.trips_file, revenue_table, merge_details, args.speed,
-                           args.name, app_config['output_directory'])
+                           args.name, app_config['output_directory'], output_format, parse_cache_directory)
         drivers = prepare_drivers_for_optimizer(drivers_table, args.driver_ids, args.date)
-        solution = run_optimizer(trip_optimizer, trips, drivers, args.name, args.date, args.speed, optimizer_config,
-                                 app_config['output_directory'])
+        if args.previous_solution:
+            solution = run_reoptimizer(trips, drivers, args.name, args.date, args.speed, optimizer_config,
+                                       app_config['output_directory'], args.previous_solution,
+                                       convert_time(args.current_time), output_format)
+        else:
+            solution = run_optimizer(trip_optimizer, trips, drivers, args.name, args.date, args.speed,
+                                     optimizer_config, app_config['output_directory'], output_format)
         generate_visualization_from_df(solution, drivers, args.name,
                                        app_config['output_directory'] + '/visualization.html', False)
 
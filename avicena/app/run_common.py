@@ -1,7 +1,7 @@
 import os
 import random
 from types import ModuleType
-from typing import Union, Type, List, Dict, Any
+from typing import Union, Type, List, Dict, Any, Optional
 import logging.config
 import yaml
 from pandas import DataFrame
@@ -13,16 +13,23 @@ from avicena.models.MergeAddress import MergeAddress, load_merge_details_from_db
 from avicena.models.RevenueRate import RevenueRate, load_revenue_table_from_db, load_revenue_table_from_csv
 from avicena.models.Trip import Trip, load_and_filter_valid_trips_from_df
 from avicena.optimizers import GeneralOptimizer
+from avicena.optimizers.RollingHorizonOptimizer import RollingHorizonOptimizer
 from avicena.util.ConfigValidation import validate_app_config
-from avicena.util.ParserUtil import verify_and_save_parsed_trips_df_to_csv
+from avicena.util.Geolocator import configure_geocode_cache, configure_geocoder
+from avicena.util.DataFrameStorage import SOLUTION_SCHEMA, load_df, storage_path
+from avicena.util.ParseCache import ParseCache, fingerprint as parse_cache_fingerprint
+from avicena.util.ParserUtil import verify_and_save_parsed_trips_df
 
 
 def run_parser(trip_parser: Union[Type[ModuleType]], trips_file: str,
                revenue_table: Dict[str, List[RevenueRate]], merge_details: Dict[str, MergeAddress], assumed_speed: int,
-               model_name: str, output_directory: str) -> List[Trip]:
+               model_name: str, output_directory: str, output_format: str = 'csv',
+               parse_cache_directory: Optional[str] = None) -> List[Trip]:
     """
     Parses the trips from the trips file, verifies the parsing and saves it to a file in the output directory called
-    "parsed_trips.csv", and filters out invalid trips and all legs associated with the invalid trips.
+    "parsed_trips", and filters out invalid trips and all legs associated with the invalid trips.
+    If a parse cache directory is given, the parsed trips are reused from earlier runs with the same trips file
+    content, merge details, revenue table, and speed.
     :param trip_parser: Type of TripParser loaded from config
     :param trips_file: File with trip details
     :param revenue_table: Map from level of service to RevenueRate objects
@@ -30,16 +37,31 @@ def run_parser(trip_parser: Union[Type[ModuleType]], trips_file: str,
     :param assumed_speed: Assumed Driving Speed to determine travel times
     :param model_name: Name for this run
     :param output_directory: Directory where the parsed files will be written
+    :param output_format: Storage format of the parsed trips file, 'csv', 'parquet', or 'arrow'
+    :param parse_cache_directory: (optional) Directory where parsed trips are cached
     :return: List of Trips that are valid and populated with all necessary details.
     """
+    parse_cache = ParseCache(parse_cache_directory) if parse_cache_directory else None
+    if parse_cache is not None:
+        key = parse_cache_fingerprint(trip_parser.__name__, trips_file, merge_details, revenue_table, assumed_speed)
+        cached = parse_cache.load(key)
+        if cached is not None:
+            trips_df, trips = cached
+            verify_and_save_parsed_trips_df(trips_df,
+                                            storage_path(output_directory, model_name + "_parsed_trips", output_format))
+            return trips
     trips_df = trip_parser.parse_trips_to_df(trips_file, merge_details, revenue_table, output_directory)
-    verify_and_save_parsed_trips_df_to_csv(trips_df, output_directory + "/" + model_name + "_parsed_trips.csv")
+    verify_and_save_parsed_trips_df(trips_df,
+                                    storage_path(output_directory, model_name + "_parsed_trips", output_format))
     trips = load_and_filter_valid_trips_from_df(trips_df, assumed_speed)
+    if parse_cache is not None:
+        parse_cache.save(key, trips_df, trips)
     return trips
 
 
 def run_optimizer(trip_optimizer: Union[Type[GeneralOptimizer]], trips: List[Trip], drivers: List[Driver], name: str,
-                  date: str, assumed_speed: int, optimizer_config: Dict[str, Any], output_directory: str) -> DataFrame:
+                  date: str, assumed_speed: int, optimizer_config: Dict[str, Any], output_directory: str,
+                  output_format: str = 'csv') -> DataFrame:
     """
     Initializes and runs the optimizer
     :param trip_optimizer: Type of Optimizer to be used
@@ -49,12 +71,37 @@ def run_optimizer(trip_optimizer: Union[Type[GeneralOptimizer]], trips: List[Tri
     :param date: Date for which this model is used
     :param assumed_speed: Assumed Driving Speed
     :param optimizer_config: Loaded optimizer specific configuratiod
-    :param output_directory: Directory where the solution.csv and other file generated while solving are stored
+    :param output_directory: Directory where the solution file and other file generated while solving are stored
+    :param output_format: Storage format of the solution file, 'csv', 'parquet', or 'arrow'
     :return: DataFrame with the solution of the model containing the original trip details as well estimated pickups,
             estimated dropoffs, and driver assigned to the trip
     """
     optimizer = trip_optimizer(trips, drivers, name, date, assumed_speed, optimizer_config)
-    solution = optimizer.solve(output_directory + '/solution.csv')
+    solution = optimizer.solve(storage_path(output_directory, 'solution', output_format))
+    return solution
+
+
+def run_reoptimizer(trips: List[Trip], drivers: List[Driver], name: str, date: str, assumed_speed: int,
+                    optimizer_config: Dict[str, Any], output_directory: str, previous_solution_file: str,
+                    current_time: float, output_format: str = 'csv') -> DataFrame:
+    """
+    Re-optimizes the rest of the day from a previous solution after the trips or drivers changed
+    :param trips: List of parsed and validated trips for the whole day, without the cancelled trips
+    :param drivers: List of filtered and drivers prepared for optimzier, without the drivers who called out
+    :param name: Name for this run
+    :param date: Date for which this model is used
+    :param assumed_speed: Assumed Driving Speed
+    :param optimizer_config: Loaded optimizer specific configuration
+    :param output_directory: Directory where the solution file and other file generated while solving are stored
+    :param previous_solution_file: Path to the solution file of the previous run in any storage format
+    :param current_time: Current time of the day as a fraction of the day. Trips picked up until then are kept.
+    :param output_format: Storage format of the solution file, 'csv', 'parquet', or 'arrow'
+    :return: DataFrame with the updated solution of the model, including the trips that were already executed
+    """
+    previous_solution = load_df(previous_solution_file, SOLUTION_SCHEMA)
+    optimizer = RollingHorizonOptimizer(trips, drivers, name, date, assumed_speed, optimizer_config, previous_solution,
+                                        current_time)
+    solution = optimizer.solve(storage_path(output_directory, 'solution', output_format))
     return solution
 
 
@@ -105,6 +152,11 @@ def load_app_config() -> Dict[str, Any]:
         app_config = yaml.load(cfg_file, Loader=yaml.FullLoader)
     validate_app_config(app_config)
     os.environ['GEOCODER_KEY'] = app_config['geocoder_key']
+    if 'geocoder' in app_config:
+        configure_geocoder(app_config['geocoder'], app_config['geocoder_key'])
+    if 'geocoder_cache' in app_config:
+        cache_config = app_config['geocoder_cache']
+        configure_geocode_cache(cache_config['path'], cache_config.get('ttl_days'), cache_config.get('max_entries'))
     random.seed(app_config['seed'])
     return app_config
 
@@ -13,6 +13,7 @@ from sqlalchemy.orm import relationship, Session
 
 from avicena.models.Driver import Driver
 from avicena.models.DriverAssignment import DriverAssignment
+from avicena.util.DataFrameStorage import SOLUTION_SCHEMA, SOLUTION_COORDINATE_COLUMNS, load_df
 from avicena.util.Geolocator import find_coord_lon_lat
 from avicena.util.TimeWindows import timedelta_to_hhmmss
 from avicena.util.VisualizationUtil import generate_html_label_for_addr, generate_html_label_for_driver_addr
@@ -203,60 +204,86 @@ class Assignment(Base):
         fig.write_html(visualization_file_name, auto_open=open_in_browser)
 
 
-def _get_coords_and_trip_data_from_df_filtered_by_driver(filtered_trips: DataFrame,
-                                                         driver_id: int, driver_address: str) -> (
-        Tuple[Tuple[float, float]], Tuple[Series]):
+def _get_stops_from_df(assignment_df: DataFrame, driver_ids: List[int]) -> DataFrame:
     """
-    Get a sorted tuple of coordinates visited by each driver and a tuple of Pandas Series that contain bare bones trip information
-    such as pickup_time, pickup_address, and driver id.
-    :param filtered_trips: Pandas DataFrame containing trips associated with only a signle driver
-    :param driver_id: The ID of the driver with which these trips are associated
-    :param driver_address: The starting/ending address of the driver that these trips are associated with
-    :return: A sorted tuple of coordinates visited and a sorted tuple of Pandas Series' containing trip starting information
+    Get every pickup and dropoff in the solution ordered by the driver and the time at which the driver visits it.
+    Dropoffs are labelled with the 'INTER' trip ID. Stops visited at the same time keep the order of the trips in the
+    solution, with the pickup of a trip before its dropoff.
+    :param assignment_df: DataFrame with the solution of the model containing only trips of the drivers and the
+                          coordinates of all of them
+    :param driver_ids: IDs of the drivers in the order they appear in the Assignment
+    :return: DataFrame with the driver_id, trip_id, est_pickup_time, address, lon, and lat of every stop
     """
-    pairs = []
-    pairs.append((0.0, find_coord_lon_lat(driver_address), Series({})))
-    for idx, t in filtered_trips.iterrows():
-        pairs.append((float(t['est_pickup_time']), find_coord_lon_lat(t['trip_pickup_address']), t))
-        pairs.append((float(t['est_dropoff_time']), find_coord_lon_lat(t['trip_dropoff_address']), Series(
-            {'est_pickup_time': t['est_dropoff_time'], 'driver_id': driver_id, 'trip_id': 'INTER',
-             'trip_pickup_address': t['trip_dropoff_address']})))
+    trip_count = len(assignment_df)
+    pickups = DataFrame({'driver_id': assignment_df['driver_id'].values,
+                         'trip_id': assignment_df['trip_id'].values,
+                         'est_pickup_time': assignment_df['est_pickup_time'].values,
+                         'address': assignment_df['trip_pickup_address'].values,
+                         'lon': assignment_df['trip_pickup_lon'].values,
+                         'lat': assignment_df['trip_pickup_lat'].values,
+                         'sequence': np.arange(trip_count) * 2})
+    dropoffs = DataFrame({'driver_id': assignment_df['driver_id'].values,
+                          'trip_id': 'INTER',
+                          'est_pickup_time': assignment_df['est_dropoff_time'].values,
+                          'address': assignment_df['trip_dropoff_address'].values,
+                          'lon': assignment_df['trip_dropoff_lon'].values,
+                          'lat': assignment_df['trip_dropoff_lat'].values,
+                          'sequence': np.arange(trip_count) * 2 + 1})
+    stops = pd.concat([pickups, dropoffs], ignore_index=True)
+    stops['driver_rank'] = stops['driver_id'].map({driver_id: rank for rank, driver_id in enumerate(driver_ids)})
+    stops = stops.sort_values(['driver_rank', 'est_pickup_time', 'sequence']).reset_index(drop=True)
+    return stops.drop(columns=['sequence', 'driver_rank'])
+
+
+def _fill_in_missing_coordinates(sol_df: DataFrame, address_column: str, lat_column: str, lon_column: str) -> None:
+    """
+    Geocode the addresses of the rows of the solution whose coordinates are missing. Only solutions saved before the
+    coordinates were added to them are missing any.
+    :param sol_df: DataFrame with the solution of the model
+    :param address_column: Column with the addresses
+    :param lat_column: Column with the latitudes of the addresses
+    :param lon_column: Column with the longitudes of the addresses
+    """
+    missing = sol_df[lat_column].isna() | sol_df[lon_column].isna()
+    if not missing.any():
+        return
+    addresses = sol_df.loc[missing, address_column]
+    coords = {address: find_coord_lon_lat(address) for address in addresses.unique()}
+    sol_df.loc[missing, lon_column] = [coords[address][0] for address in addresses]
+    sol_df.loc[missing, lat_column] = [coords[address][1] for address in addresses]
+
 
-    pairs.append((1.0, find_coord_lon_lat(driver_address), Series({})))
-    _, coords, trips = zip(*sorted(pairs, key=lambda x: x[0]))
-    return coords, trips
+def _get_location_labels_from_stops(stops: DataFrame) -> Tuple[List[float], List[float], List[str]]:
+    """
+    Generate the map labels of every location visited in the solution. Each label lists the trips passing by the
+    location sorted by the time they pass by it.
+    :param stops: DataFrame with every stop ordered by driver and time as produced by _get_stops_from_df
+    :return: Longitudes, latitudes, and labels of the locations in the order they are first visited
+    """
+    first_visits = stops.drop_duplicates(['lon', 'lat'])
+    by_time = stops.sort_values('est_pickup_time', kind='mergesort').reset_index(drop=True)
+    visits = by_time[['trip_id', 'est_pickup_time', 'driver_id']].to_dict('records')
+    location_visits = by_time.groupby(['lon', 'lat'], sort=False).indices
+    labels = [generate_html_label_for_addr([visits[i] for i in location_visits[point]], address)
+              for point, address in zip(zip(first_visits['lon'], first_visits['lat']), first_visits['address'])]
+    return first_visits['lon'].tolist(), first_visits['lat'].tolist(), labels
 
 
-def _get_driver_trips_times_miles_rev_from_df(sol_df: DataFrame, id: int) -> (
-        str, str, float, float, float, float, float):
+def _to_timedeltas(times: Series) -> List[timedelta]:
     """
-    Generate a summary of the driver's overall day from the Solution Dataframe
-    :param sol_df: DataFrame with the solution of the model containing the original trip details as well estimated pickups,
-                    estimated dropoffs, and driver assigned to the trip
-    :param id: ID of driver whose summary is to be generated
-    :return: Driver Name, CSV of trip IDs, time traveled in the day, time of earliest pickup, time of latest dropoff,
-            total miles traveled, total revenue earned
+    :param times: Times as fractions of a day
+    :return: List of timedeltas of the times
     """
-    filtered_trips = sol_df[sol_df['driver_id'] == id]
-    try:
-        ep = (min(float(t['est_pickup_time']) for _, t in filtered_trips.iterrows()))
-    except ValueError:
-        ep = '0'
-    try:
-        ld = (max(float(t['est_dropoff_time']) for _, t in filtered_trips.iterrows()))
-    except:
-        ld = '0'
-    name = ("".join(str(t['driver_name']) for _, t in filtered_trips.sample(1).iterrows())) + ";" + str(id)
-    trps = ", ".join(t['trip_id'] for _, t in filtered_trips.iterrows())
-    time = (sum(float(t['est_time']) for _, t in filtered_trips.iterrows()))
-    m = (sum(float(t['est_miles']) for _, t in filtered_trips.iterrows()))
-    r = (sum(float(t['trip_rev']) for _, t in filtered_trips.iterrows()))
-    return name, trps, time, ep, ld, m, r
+    return [timedelta(days=t) for t in times.tolist()]
 
 
 def load_assignment_from_df(assignment_df: DataFrame, drivers: List[Driver], name: str) -> Assignment:
     """
-    Generate Assignment object from the solution DataFrame produced by Optimizer
+    Generate Assignment object from the solution DataFrame produced by Optimizer.
+    The solution is grouped by driver once, and every per driver list and summary is sliced out of columns converted
+    for the whole solution at once. Drivers without any assigned trips get empty routes and zero totals.
+    The coordinates of every location are taken from the solution, so addresses are only geocoded for drivers without
+    any assigned trips and for solutions saved before coordinates were added to them.
     :param assignment_df: DataFrame with the solution of the model containing the original trip details as well estimated pickups,
                          estimated dropoffs, and driver assigned to the trip
     :param drivers: List of drivers associated with solution
@@ -265,60 +292,87 @@ def load_assignment_from_df(assignment_df: DataFrame, drivers: List[Driver], nam
     """
     assignment_date = datetime.strptime(assignment_df['trip_date'].iloc[0], '%m-%d-%Y')
     assign = Assignment(assignment_date, name)
-    locations = dict()
-    addresses = dict()
-    for i, d in enumerate(drivers):
-        filtered_trips = assignment_df[assignment_df['driver_id'] == d.id]
-        points, trips = _get_coords_and_trip_data_from_df_filtered_by_driver(filtered_trips, d.id,
-                                                                             d.get_clean_address())
-        x, y = zip(*points)
+    driver_ids = [d.id for d in drivers]
+    sol_df = assignment_df[assignment_df['driver_id'].isin(driver_ids)].reset_index(drop=True)
+    for column in SOLUTION_COORDINATE_COLUMNS:
+        if column not in sol_df:
+            sol_df[column] = np.nan
+    sol_df = sol_df.astype({column: float for column in
+                            ['trip_pickup_time', 'est_pickup_time', 'trip_dropoff_time', 'est_dropoff_time',
+                             'est_miles', 'est_time', 'trip_rev'] + SOLUTION_COORDINATE_COLUMNS})
+    _fill_in_missing_coordinates(sol_df, 'trip_pickup_address', 'trip_pickup_lat', 'trip_pickup_lon')
+    _fill_in_missing_coordinates(sol_df, 'trip_dropoff_address', 'trip_dropoff_lat', 'trip_dropoff_lon')
+
+    trip_ids = sol_df['trip_id'].astype(str).tolist()
+    pickup_addresses = sol_df['trip_pickup_address'].tolist()
+    dropoff_addresses = sol_df['trip_dropoff_address'].tolist()
+    estimated_pickups = _to_timedeltas(sol_df['est_pickup_time'])
+    scheduled_pickups = _to_timedeltas(sol_df['trip_pickup_time'])
+    estimated_dropoffs = _to_timedeltas(sol_df['est_dropoff_time'])
+    scheduled_dropoffs = _to_timedeltas(sol_df['trip_dropoff_time'])
+    trip_miles = sol_df['est_miles'].tolist()
+    trip_los = sol_df['trip_los'].astype(str).tolist()
+    trip_rev = sol_df['trip_rev'].tolist()
+    driver_trips = sol_df.groupby('driver_id', sort=False).indices
+    summary = sol_df.groupby('driver_id').agg(driver_name=('driver_name', 'first'), time=('est_time', 'sum'),
+                                              earliest_pick=('est_pickup_time', 'min'),
+                                              latest_drop=('est_dropoff_time', 'max'), miles=('est_miles', 'sum'),
+                                              revenue=('trip_rev', 'sum'), driver_lon=('driver_lon', 'first'),
+                                              driver_lat=('driver_lat', 'first'))
+
+    stops = _get_stops_from_df(sol_df, driver_ids)
+    driver_stops = stops.groupby('driver_id', sort=False).indices
+    stop_lons = stops['lon'].tolist()
+    stop_lats = stops['lat'].tolist()
+    # Only the homes of drivers without trips, or of solutions saved without coordinates, are geocoded
+    homes = summary[['driver_lon', 'driver_lat']].dropna()
+    home_lon_lats = [(float(homes.at[d.id, 'driver_lon']), float(homes.at[d.id, 'driver_lat']))
+                     if d.id in homes.index else find_coord_lon_lat(d.get_clean_address()) for d in drivers]
+
+    no_trips = np.array([], dtype=np.int64)
+    for d, (home_lon, home_lat) in zip(drivers, home_lon_lats):
+        trips = driver_trips.get(d.id, no_trips)
+        route = driver_stops.get(d.id, no_trips)
         da = DriverAssignment()
         da.date = assignment_date
         da.driver_id = d.id
         da.assignment_id = assign.id
-        da.trip_ids = [str(t['trip_id']) for _, t in filtered_trips.iterrows()]
-        da.trip_pickup_addresses = [t['trip_pickup_address'] for _, t in filtered_trips.iterrows()]
-        da.trip_dropoff_addresses = [t['trip_dropoff_address'] for _, t in filtered_trips.iterrows()]
-        da.trip_estimated_pickup_times = [timedelta(days=float(t['est_pickup_time'])) for _, t in
-                                          filtered_trips.iterrows()]
-        da.trip_scheduled_pickup_times = [timedelta(days=float(t['trip_pickup_time'])) for _, t in
-                                          filtered_trips.iterrows()]
-        da.trip_estimated_dropoff_times = [timedelta(days=float(t['est_dropoff_time'])) for _, t in
-                                           filtered_trips.iterrows()]
-        da.trip_scheduled_dropoff_times = [timedelta(days=float(t['trip_dropoff_time'])) for _, t in
-                                           filtered_trips.iterrows()]
-        da.trip_miles = [(t['est_miles']) for _, t in filtered_trips.iterrows()]
-        da.trip_los = [str(t['trip_los']) for _, t in filtered_trips.iterrows()]
-        da.trip_rev = [(t['trip_rev']) for _, t in filtered_trips.iterrows()]
-        da.lats = list(y)
-        da.lons = list(x)
+        da.trip_ids = [trip_ids[i] for i in trips]
+        da.trip_pickup_addresses = [pickup_addresses[i] for i in trips]
+        da.trip_dropoff_addresses = [dropoff_addresses[i] for i in trips]
+        da.trip_estimated_pickup_times = [estimated_pickups[i] for i in trips]
+        da.trip_scheduled_pickup_times = [scheduled_pickups[i] for i in trips]
+        da.trip_estimated_dropoff_times = [estimated_dropoffs[i] for i in trips]
+        da.trip_scheduled_dropoff_times = [scheduled_dropoffs[i] for i in trips]
+        da.trip_miles = [trip_miles[i] for i in trips]
+        da.trip_los = [trip_los[i] for i in trips]
+        da.trip_rev = [trip_rev[i] for i in trips]
+        da.lats = [home_lat] + [stop_lats[i] for i in route] + [home_lat]
+        da.lons = [home_lon] + [stop_lons[i] for i in route] + [home_lon]
         assign.driver_assignments.append(da)
-        names, ids, time, ep, ld, miles, rev = _get_driver_trips_times_miles_rev_from_df(assignment_df, d.id)
-        assign.driver_names.append(names)
+
+        if d.id in summary.index:
+            driver_summary = summary.loc[d.id]
+            assign.driver_names.append(str(driver_summary['driver_name']) + ";" + str(d.id))
+            assign.times.append(timedelta(days=driver_summary['time']))
+            assign.earliest_picks.append(timedelta(days=driver_summary['earliest_pick']))
+            assign.latest_drops.append(timedelta(days=driver_summary['latest_drop']))
+            assign.miles.append(float(driver_summary['miles']))
+            assign.revenues.append(float(driver_summary['revenue']))
+        else:
+            assign.driver_names.append(str(d.name) + ";" + str(d.id))
+            assign.times.append(timedelta(0))
+            assign.earliest_picks.append(timedelta(0))
+            assign.latest_drops.append(timedelta(0))
+            assign.miles.append(0.0)
+            assign.revenues.append(0.0)
         assign.driver_ids.append(d.id)
-        assign.trips.append(ids)
-        assign.times.append(timedelta(days=time))
-        assign.earliest_picks.append(timedelta(days=ep))
-        assign.latest_drops.append(timedelta(days=ld))
-        assign.miles.append(miles)
-        assign.revenues.append(rev)
-        points = points[1:-1]
-        trips = trips[1:-1]
-        for idx, point in enumerate(points):
-            if point in locations:
-                locations[point].append(trips[idx])
-                locations[point] = list(sorted(locations[point], key=lambda x: float(x['est_pickup_time'])))
-            else:
-                locations[point] = [trips[idx]]
-            if point not in addresses:
-                addresses[point] = trips[idx]['trip_pickup_address']
-
-    lon, lat = map(list, zip(*locations.keys()))
-    labels = [generate_html_label_for_addr(locations[k], addresses[k]) for k in locations.keys()]
-
-    for d in drivers:
-        lon.append(find_coord_lon_lat(d.get_clean_address())[0])
-        lat.append(find_coord_lon_lat(d.get_clean_address())[1])
+        assign.trips.append(", ".join(da.trip_ids))
+
+    lon, lat, labels = _get_location_labels_from_stops(stops)
+    for d, (home_lon, home_lat) in zip(drivers, home_lon_lats):
+        lon.append(home_lon)
+        lat.append(home_lat)
         labels.append(generate_html_label_for_driver_addr(d))
 
     assign.location_lats = lat
@@ -327,6 +381,18 @@ def load_assignment_from_df(assignment_df: DataFrame, drivers: List[Driver], nam
     return assign
 
 
+def load_assignment_from_file(assignment_file: str, drivers: List[Driver], mdl_name: str) -> Assignment:
+    """
+    Generate Assignment Object from solution stored in a CSV, Parquet, or Arrow IPC file
+    :param assignment_file: Path to solution file. The storage format is given by its extension.
+    :param drivers: list of drivers associated with solution
+    :param mdl_name: model name
+    :return: Assignment object with details filled in from the file
+    """
+    sol_df = load_df(assignment_file, SOLUTION_SCHEMA)
+    return load_assignment_from_df(sol_df, drivers, mdl_name)
+
+
 def load_assignment_from_csv(assignment_csv: str, drivers: List[Driver], mdl_name: str) -> Assignment:
     """
     Generate Assignment Object from solution stored in CSV
@@ -335,8 +401,7 @@ def load_assignment_from_csv(assignment_csv: str, drivers: List[Driver], mdl_nam
     :param mdl_name: model name
     :return: Assignment object with details filled in from CSV
     """
-    sol_df = pd.read_csv(assignment_csv)
-    return load_assignment_from_df(sol_df, drivers, mdl_name)
+    return load_assignment_from_file(assignment_csv, drivers, mdl_name)
 
 
 def generate_visualization_from_db(assignment_id: int, session: Session,
@@ -368,6 +433,22 @@ def generate_visualization_from_df(sol_df: DataFrame, drivers: List[Driver], mdl
     load_assignment_from_df(sol_df, drivers, mdl_name).generate_visualization(visualization_file_name, open_in_browser)
 
 
+def generate_visualization_from_file(assignment_file: str, drivers: List[Driver], mdl_name: str,
+                                     visualization_file_name: str = 'visualized.html',
+                                     open_in_browser: bool = False) -> None:
+    """
+    Generate visualization from a solution stored in a CSV, Parquet, or Arrow IPC file
+    :param assignment_file: Solution file that can be loaded into a data frame of the same format as the Solution
+                            Dataframe. The storage format is given by its extension.
+    :param drivers: List of Drivers for which the solution was produced
+    :param mdl_name: Name of Model
+    :param visualization_file_name: path where visualization will be stored
+    :param open_in_browser: Whether the visualization will be opened in browser after visualization is generated
+    """
+    load_assignment_from_file(assignment_file, drivers, mdl_name).generate_visualization(visualization_file_name,
+                                                                                         open_in_browser)
+
+
 def generate_visualization_from_csv(assignment_csv: str, drivers: List[Driver], mdl_name: str,
                                     visualization_file_name: str = 'visualized.html',
                                     open_in_browser: bool = False) -> None:
@@ -1,8 +1,10 @@
 import logging
+from typing import Optional
 
 from haversine import haversine, Unit
 
 from avicena.models.Location import Location
+from avicena.models.TravelMatrix import TravelMatrix
 from avicena.util.TimeWindows import ONE_MINUTE
 
 log = logging.getLogger(__name__)
@@ -15,17 +17,24 @@ class LocationPair:
     as well as the distance in miles.
     """
 
-    def __init__(self, l1: Location, l2: Location, speed: int) -> None:
+    def __init__(self, l1: Location, l2: Location, speed: int, travel_matrix: Optional[TravelMatrix] = None) -> None:
         """
         Initialize a location pair object and compute the miles and travel time (in fraction of a day)
         :param l1: Origin Location of the Pair
         :param l2: Destination Location of the Pair
         :param speed: Assumed traveling speed between location in MPH
+        :param travel_matrix: (optional) Precomputed TravelMatrix containing both locations from which the miles and
+                              travel time are read instead of being computed. It must be built with the same speed.
         """
         self.o = l1
         self.d = l2
-        self.miles = haversine(self.o.coord, self.d.coord, Unit.MILES)
-        self.time = (self.miles / float(speed)) / 24 + ONE_MINUTE
+        if travel_matrix is not None:
+            i, j = travel_matrix.index[l1], travel_matrix.index[l2]
+            self.miles = float(travel_matrix.miles[i, j])
+            self.time = float(travel_matrix.time[i, j])
+        else:
+            self.miles = haversine(self.o.coord, self.d.coord, Unit.MILES)
+            self.time = (self.miles / float(speed)) / 24 + ONE_MINUTE
         if self.time > 1:
             log.warning(
                 "Travel Time Longer than a Day for given speed. "
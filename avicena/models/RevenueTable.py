@@ -0,0 +1,87 @@
+from typing import Dict, List, Iterable, Optional
+
+import numpy as np
+
+from avicena.models.RevenueRate import RevenueRate
+from avicena.util.Exceptions import RevenueCalculationException
+
+
+class RevenueTable:
+    """
+    This class holds the RevenueRates of every level of service as sorted arrays of mileage bounds, base rates, and
+    rates per mile, so that the revenue of any number of trips is computed at once with a binary search of the mileage
+    brackets instead of scanning the list of RevenueRates trip by trip.
+    The brackets of a level of service may only overlap at their bounds. Miles on a bound shared by two brackets use the
+    bracket that comes first in the list of RevenueRates.
+    """
+
+    def __init__(self, table: Dict[str, List[RevenueRate]]) -> None:
+        """
+        Initialize a RevenueTable from the loaded RevenueRates
+        :param table: dictionary mapping level of service to a list of associated revenue rates
+        """
+        self.lower_bounds = dict()
+        self.upper_bounds = dict()
+        self.base_rates = dict()
+        self.rates_per_mile = dict()
+        self.priorities = dict()  # Position of every bracket in the list of RevenueRates
+        for los, revenue_rates in table.items():
+            if not revenue_rates:
+                continue
+            order = sorted(range(len(revenue_rates)), key=lambda i: revenue_rates[i].lower_mileage_bound)
+            rates = [revenue_rates[i] for i in order]
+            for previous, rate in zip(rates, rates[1:]):
+                if rate.lower_mileage_bound < previous.upper_mileage_bound:
+                    raise RevenueCalculationException(
+                        f"Overlapping revenue rates for level of service:{los} [{previous.lower_mileage_bound},"
+                        f"{previous.upper_mileage_bound}] and [{rate.lower_mileage_bound},{rate.upper_mileage_bound}]")
+            self.lower_bounds[los] = np.array([rate.lower_mileage_bound for rate in rates], dtype=np.float64)
+            self.upper_bounds[los] = np.array([rate.upper_mileage_bound for rate in rates], dtype=np.float64)
+            self.base_rates[los] = np.array([rate.base_rate for rate in rates], dtype=np.float64)
+            self.rates_per_mile[los] = np.array([rate.revenue_per_mile for rate in rates], dtype=np.float64)
+            self.priorities[los] = np.array(order)
+
+    def __brackets(self, los: str, miles: np.ndarray) -> np.ndarray:
+        """
+        :param los: Level of service
+        :param miles: Miles of trips with the level of service
+        :return: Index of the bracket of every trip or -1 for trips outside all brackets
+        """
+        lower, upper, priority = self.lower_bounds[los], self.upper_bounds[los], self.priorities[los]
+        brackets = np.searchsorted(lower, miles, side='right') - 1
+        brackets[(brackets >= 0) & (miles > upper[np.maximum(brackets, 0)])] = -1
+        # On a bound shared with the previous bracket, use the bracket that was listed first
+        previous = brackets - 1
+        shared = (previous >= 0) & (miles == upper[np.maximum(previous, 0)])
+        shared &= priority[np.maximum(previous, 0)] < priority[np.maximum(brackets, 0)]
+        brackets[shared] = previous[shared]
+        return brackets
+
+    def calculate_revenues(self, miles: Iterable[float], levels_of_service: Iterable[str],
+                           trip_ids: Optional[Iterable[str]] = None) -> np.ndarray:
+        """
+        Calculate the revenue of every trip
+        :param miles: miles of every trip
+        :param levels_of_service: level of service of every trip
+        :param trip_ids: (optional) ID of every trip, used to report the trips whose revenue cannot be calculated
+        :return: revenue earned from every trip
+        """
+        miles = np.asarray(miles, dtype=np.float64)
+        levels_of_service = np.asarray(levels_of_service, dtype=object)
+        revenues = np.full(len(miles), np.nan)
+        for los in set(levels_of_service):
+            if los not in self.lower_bounds:
+                continue
+            trips = np.flatnonzero(levels_of_service == los)
+            brackets = self.__brackets(los, miles[trips])
+            found = brackets >= 0
+            trips, brackets = trips[found], brackets[found]
+            revenues[trips] = self.base_rates[los][brackets] + self.rates_per_mile[los][brackets] * miles[trips]
+
+        failed = np.flatnonzero(np.isnan(revenues))
+        if len(failed):
+            trip_ids = np.asarray(list(trip_ids), dtype=object) if trip_ids is not None else np.arange(len(miles))
+            details = ", ".join(f"{trip_ids[i]} (level of service:{levels_of_service[i]} miles:{miles[i]})"
+                                for i in failed)
+            raise RevenueCalculationException(f"Unable to calculate revenue for {len(failed)} trips: {details}")
+        return revenues
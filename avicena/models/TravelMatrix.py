@@ -0,0 +1,57 @@
+from typing import Iterable
+
+import numpy as np
+
+from avicena.models.Location import Location
+from avicena.util.TimeWindows import ONE_MINUTE
+
+EARTH_RADIUS_MILES = 3958.7613
+
+
+class TravelMatrix:
+    """
+    This class holds the distance in miles and the travel time between every ordered pair of a set of Locations.
+    The full matrices are computed at once with a vectorized haversine formula and stored in float32, so that the
+    optimizers can look up the travel details of any pair by index instead of computing them pair by pair.
+    """
+
+    def __init__(self, locations: Iterable[Location], speed: int) -> None:
+        """
+        Initialize a TravelMatrix and compute the miles and travel time (in fraction of a day) between all locations
+        :param locations: Locations included in the matrix
+        :param speed: Assumed traveling speed between locations in MPH
+        """
+        self.locations = list(locations)
+        self.index = {loc: i for i, loc in enumerate(self.locations)}
+        self.speed = speed
+        coords = np.radians(np.array([loc.coord for loc in self.locations], dtype=np.float64).reshape(-1, 2))
+        lat, lon = coords[:, 0], coords[:, 1]
+        d_lat = lat[np.newaxis, :] - lat[:, np.newaxis]
+        d_lon = lon[np.newaxis, :] - lon[:, np.newaxis]
+        a = np.sin(d_lat / 2) ** 2 + np.cos(lat[:, np.newaxis]) * np.cos(lat[np.newaxis, :]) * np.sin(d_lon / 2) ** 2
+        miles = 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+        self.miles = miles.astype(np.float32)
+        self.time = ((miles / float(speed)) / 24 + ONE_MINUTE).astype(np.float32)
+
+    def __contains__(self, loc: Location) -> bool:
+        """
+        :param loc: Location object
+        :return: True if the location is part of the matrix
+        """
+        return loc in self.index
+
+    def get_miles(self, o: Location, d: Location) -> float:
+        """
+        :param o: Origin Location
+        :param d: Destination Location
+        :return: Distance in miles between the locations
+        """
+        return float(self.miles[self.index[o], self.index[d]])
+
+    def get_time(self, o: Location, d: Location) -> float:
+        """
+        :param o: Origin Location
+        :param d: Destination Location
+        :return: Travel time between the locations as a fraction of a day
+        """
+        return float(self.time[self.index[o], self.index[d]])
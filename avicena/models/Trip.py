@@ -5,11 +5,13 @@ from pandas import DataFrame
 from avicena.models.Location import Location
 from avicena.models.LocationPair import LocationPair
 from avicena.util.Exceptions import InvalidTripException
-from avicena.util.ParserUtil import convert_time
 from avicena.util.TimeWindows import get_time_window_by_hours_minutes
 
 log = logging.getLogger(__name__)
 
+# A trip is invalid if it cannot be completed between this long before its scheduled pickup and its scheduled dropoff
+INVALID_TRIP_PICKUP_BUFFER = get_time_window_by_hours_minutes(0, 20)
+
 
 class Trip:
     """
@@ -46,7 +48,7 @@ class Trip:
         self.required_level_of_service = 'W' if space == 1.5 else 'A'
         self.is_merge = is_merge
         self.rev = revenue
-        if self.lp.time > scheduled_dropoff - max(0, scheduled_pickup - get_time_window_by_hours_minutes(0, 20)):
+        if self.lp.time > scheduled_dropoff - max(0, scheduled_pickup - INVALID_TRIP_PICKUP_BUFFER):
             raise InvalidTripException(f"Trip ID:{id} start:{scheduled_pickup} end:{scheduled_dropoff}  "
                                        f"trip length:{self.lp.time}")
         self.preset_miles = preset_miles
@@ -63,7 +65,7 @@ def load_and_filter_valid_trips_from_df(trip_df: DataFrame, speed: int) -> List[
     Filter out the invalid trips in the data frame and generate a list of Trip objects.
     For any invalid trips, all other legs of the trip associated with an invalid leg are also marked invalid and
     filtered away. This function assumes the IDs of a patient's trip legs end in 'A' , 'B' , or 'C'.
-    :param trip_df: Input dataframe of parsed/prepared trip data
+    :param trip_df: Input dataframe of parsed/prepared trip data with times standardized to fractions of the day
     :param speed: Assumed speed for all trips
     :return: List of valid Trip objects. All invalid trips and their legs are ignored.
     """
@@ -75,8 +77,8 @@ def load_and_filter_valid_trips_from_df(trip_df: DataFrame, speed: int) -> List[
         pickup = Location(row['trip_pickup_address'] + "P" + str(hash(row['trip_id']))[:3], pickup_coord, suffix_len=4)
         dropoff = Location(row['trip_dropoff_address'] + "D" + str(hash(row['trip_id']))[:3], dropoff_coord,
                            suffix_len=4)
-        scheduled_pickup = convert_time(str(row['trip_pickup_time']))
-        scheduled_dropoff = convert_time(str(row['trip_dropoff_time']))
+        scheduled_pickup = float(row['trip_pickup_time'])
+        scheduled_dropoff = float(row['trip_dropoff_time'])
         capacity_needed = 1 if row['trip_los'] == 'A' else 1.5
         id = row['trip_id']
         rev = float(row['trip_revenue'])
@@ -4,4 +4,4 @@ from sqlalchemy.ext.declarative import declarative_base
 metadata = MetaData()
 Base = declarative_base(metadata=metadata)
 
-from . import Assignment, Driver, DriverAssignment, Location, LocationPair, MergeAddress, RevenueRate, Trip
\ No newline at end of file
+from . import Assignment, Driver, DriverAssignment, Location, LocationPair, MergeAddress, RevenueRate, RevenueTable, TravelMatrix, Trip
\ No newline at end of file
@@ -0,0 +1,59 @@
+import logging
+import time
+from typing import List, Dict, Any
+
+from avicena.models.Driver import Driver
+from avicena.models.Trip import Trip
+from avicena.optimizers.HeuristicOptimizer import HeuristicOptimizer
+from avicena.optimizers.solver_util.heuristic.ALNS import ALNS
+from avicena.optimizers.solver_util.heuristic.Listeners import TimeListener, TargetListener
+from avicena.optimizers.solver_util.heuristic.LocalSearch import local_search
+from avicena.optimizers.solver_util.heuristic.Solution import Solution
+
+log = logging.getLogger(__name__)
+
+POLISH_FRACTION = 0.1  # Fraction of the time left after the initial local search reserved to polish the best solution
+
+
+class ALNSOptimizer(HeuristicOptimizer):
+    """
+    The ALNSOptimizer is an anytime version of the HeuristicOptimizer. After the constructed solution is improved with
+    local search, it runs an Adaptive Large Neighborhood Search for the configured amount of time, and finally polishes
+    the best solution found with local search again. Like the HeuristicOptimizer it does not require CPLEX and minimizes
+    the same objective as the GeneralOptimizer.
+    """
+
+    def __init__(self, trips: List[Trip], drivers: List[Driver], name: str, date: str, speed: int,
+                 config: Dict[str, Any]) -> None:
+        """
+        Initialize an ALNS Optimizer
+        :param trips: List of valid Trip objects that were parsed and cleaned from the input file
+        :param drivers: List of drivers selected to be dispatched for this model
+        :param name: Name of the given model
+        :param date: Date for which the model is running
+        :param speed: Assumed travelling speed
+        :param config: Configuration Details for this optimizer type and its parameters
+        """
+        super().__init__(trips, drivers, name, date, speed, config)
+        self.TIME_LIMIT = config.get("alns_time", 60)
+        self.MAX_ITERATIONS = config.get("alns_max_iterations")
+        self.TARGET_OBJECTIVE = config.get("alns_target_objective")
+        if self.TARGET_OBJECTIVE is not None:
+            self.listeners = [TargetListener(self.TIME_LIMIT, self.TARGET_OBJECTIVE)]
+        else:
+            self.listeners = [TimeListener(self.TIME_LIMIT)]
+        self.alns = ALNS(self.problem, config['seed'], self.listeners)
+
+    def improve(self, solution: Solution, deadline: float) -> Solution:
+        """
+        Improve the constructed solution with local search and Adaptive Large Neighborhood Search
+        :param solution: Solution built by the construction heuristic
+        :param deadline: Monotonic clock time after which the improvement stops
+        :return: Best Solution found
+        """
+        solution = local_search(solution, deadline)
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            solution = self.alns.run(solution, (1 - POLISH_FRACTION) * remaining, self.MAX_ITERATIONS)
+            solution = local_search(solution, deadline)
+        return solution
@@ -5,6 +5,10 @@ from pandas import DataFrame
 
 from avicena.models.Trip import Trip
 from avicena.models.Driver import Driver
+from avicena.util.DataFrameStorage import SOLUTION_SCHEMA
+
+# Columns of the solution DataFrame returned by every optimizer
+SOLUTION_COLUMNS = SOLUTION_SCHEMA.names
 
 
 class BaseOptimizer:
@@ -31,6 +35,7 @@ class BaseOptimizer:
         self.mdl = Model(name=name)
         self.mdl.parameters.randomseed.set(config['seed'])
         self.SPEED = speed
+        self.objective_value = None  # Objective value of the solution once solved
 
     def solve(self, solution_file: str) -> DataFrame:
         """
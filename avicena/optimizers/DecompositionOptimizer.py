@@ -0,0 +1,93 @@
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil, sqrt
+from typing import List, Dict, Any
+
+import pandas as pd
+
+from avicena.models.Driver import Driver
+from avicena.models.Trip import Trip
+from avicena.optimizers.HeuristicOptimizer import HeuristicOptimizer
+from avicena.optimizers.solver_util.ParallelSolve import WORKER_OPTIMIZERS, solve_in_worker
+from avicena.optimizers.solver_util.decomposition.Clustering import patient_groups, split_regions, split_bands
+from avicena.optimizers.solver_util.heuristic.Insertion import greedy_insertion
+from avicena.optimizers.solver_util.heuristic.Solution import Solution, load_solution
+from avicena.util.Exceptions import InvalidConfigException
+
+log = logging.getLogger(__name__)
+
+
+class DecompositionOptimizer(HeuristicOptimizer):
+    """
+    The DecompositionOptimizer splits a large day into subproblems that are solved independently and in parallel.
+    Patients are clustered into geographic regions by their pickups and dropoffs, and every region gets its own subset
+    of the drivers. The patients of a region are then split into bands of the day, all served by the region's drivers.
+    All legs of a patient always belong to the same subproblem. Each subproblem is solved in a worker process by the
+    configured optimizer, and the routes of each driver are stitched together in time order. Trips that make a stitched
+    route infeasible, usually at the boundary between two bands, are inserted again and the whole day is improved with
+    the HeuristicOptimizer's local search.
+    """
+
+    def __init__(self, trips: List[Trip], drivers: List[Driver], name: str, date: str, speed: int,
+                 config: Dict[str, Any]) -> None:
+        """
+        Initialize a Decomposition Optimizer
+        :param trips: List of valid Trip objects that were parsed and cleaned from the input file
+        :param drivers: List of drivers selected to be dispatched for this model
+        :param name: Name of the given model
+        :param date: Date for which the model is running
+        :param speed: Assumed travelling speed
+        :param config: Configuration Details for this optimizer type and its parameters
+        """
+        super().__init__(trips, drivers, name, date, speed, config)
+        self.SUBPROBLEM_OPTIMIZER = config.get("decomposition_optimizer", "GeneralOptimizer")
+        if self.SUBPROBLEM_OPTIMIZER not in WORKER_OPTIMIZERS:
+            raise InvalidConfigException(f"Unknown decomposition_optimizer {self.SUBPROBLEM_OPTIMIZER}. Expected one of "
+                                         f"{list(WORKER_OPTIMIZERS)}")
+        self.SUBPROBLEM_SIZE = config.get("decomposition_subproblem_size", 150)
+        self.REGIONS = config.get("decomposition_regions")
+        self.WORKERS = config.get("decomposition_workers") or os.cpu_count()
+        self.TIME_LIMIT = config.get("decomposition_repair_time", 30)
+        self.config = config
+        self.name = name
+        self.speed = speed
+
+    def construct(self) -> Solution:
+        """
+        Solve the subproblems in parallel and stitch their solutions together
+        :return: Stitched Solution with the trips that could not be kept inserted again
+        """
+        p = self.problem
+        groups = patient_groups(p.trips)
+        num_regions = self.REGIONS or ceil(sqrt(ceil(2 * p.n / self.SUBPROBLEM_SIZE)))
+        subproblems = []
+        for region, drivers in split_regions(groups, p.drivers, num_regions, self.config['seed']):
+            for band in split_bands(region, self.SUBPROBLEM_SIZE):
+                subproblems.append(([t for group in band for t in group], drivers))
+        log.info(f"Solving {len(subproblems)} subproblems with {[len(trips) for trips, _ in subproblems]} trips using "
+                 f"{self.WORKERS} workers")
+
+        with tempfile.TemporaryDirectory() as directory, ProcessPoolExecutor(self.WORKERS) as executor:
+            futures = [executor.submit(solve_in_worker, self.SUBPROBLEM_OPTIMIZER, trips, drivers,
+                                       f"{self.name}_{i}", self.date, self.speed,
+                                       dict(self.config, max_trips=len(trips), max_drivers=len(drivers)),
+                                       os.path.join(directory, f"solution_{i}.csv"))
+                       for i, (trips, drivers) in enumerate(subproblems)]
+            solutions = [future.result().solution_df for future in futures]
+        failed = [i for i, solution_df in enumerate(solutions) if solution_df is None]
+        if failed:
+            log.warning(f"Subproblems {failed} could not be solved, their trips will be inserted heuristically")
+
+        solution_df = pd.concat([solution_df for solution_df in solutions if solution_df is not None],
+                                ignore_index=True) if len(failed) < len(solutions) else None
+        solution = load_solution(p, solution_df) if solution_df is not None else Solution(p)
+        if solution.unassigned and any(p.earliest_start):
+            # The subproblem optimizers may have relaxed the early day requirements
+            p.relax_early_day()
+            solution = load_solution(p, solution_df) if solution_df is not None else Solution(p)
+        log.info(f"Stitched subproblem solutions with objective {solution.objective()} and "
+                 f"{len(solution.unassigned)} trips to insert again")
+        greedy_insertion(solution, list(solution.unassigned))
+        return solution
@@ -1,15 +1,25 @@
 from copy import copy
-from typing import List, Any, Dict, Iterable
+from typing import List, Any, Dict, Iterable, Optional, Callable, Tuple
 import logging
+import time
+import numpy as np
 import pandas as pd
-from docloud.status import JobSolveStatus
-from docplex.mp.utils import DOcplexException
+from docplex.mp.constants import EffortLevel, WriteLevel
+from docplex.mp.linear import LinearExpr
+from docplex.mp.solution import SolveSolution
 from pandas import DataFrame
 
-from avicena.models.Trip import Trip, Location
+from avicena.models.LocationPair import LocationPair
+from avicena.models.TravelMatrix import TravelMatrix
+from avicena.models.Trip import Trip, Location, INVALID_TRIP_PICKUP_BUFFER
 from avicena.models.Driver import Driver
-from avicena.optimizers.BaseOptimizer import BaseOptimizer
-from avicena.optimizers.solver_util.cplex.Listeners import GapListener, TimeListener
+from avicena.optimizers.BaseOptimizer import BaseOptimizer, SOLUTION_COLUMNS
+from avicena.optimizers.solver_util.cplex.ModelCache import ModelCache, fingerprint, lp_safe_name
+from avicena.optimizers.solver_util.cplex.StagedSolve import ConstraintGroup, Stage, StagedSolver
+from avicena.optimizers.solver_util.heuristic.Insertion import construct_solution
+from avicena.optimizers.solver_util.heuristic.LocalSearch import local_search
+from avicena.optimizers.solver_util.heuristic.RoutingProblem import RoutingProblem
+from avicena.util.DataFrameStorage import SOLUTION_SCHEMA, save_df, suffixed_path
 from avicena.util.Exceptions import InvalidTripException, SolutionNotFoundException, DuplicateAddressException
 from avicena.util.Geolocator import find_coord_lat_lon
 from avicena.util.ParserUtil import convert_time
@@ -52,9 +62,12 @@ class GeneralOptimizer(BaseOptimizer):
         self.node_window_open = dict()  # Earliest departure time from a node
         self.node_window_close = dict()  # earliest arrival time to a node
         self.location_to_primary_trip_id_map = dict()  # Map from starting location to ID of primary trip from that location
+        self.node_keys = dict()  # Map from node to a key identifying it across runs, as address suffixes may differ
         self.merges = dict()  # Map from merge trip to incoming primary trip
         self.revenues = dict()  # Map from start node to revenue of the trip
         self.wheelchair_locations = set()  # Set of locations where wheelchair trips start
+        self.travel_matrix = None  # Miles and travel times between all driver and request nodes
+        self.arc_pruning_stats = dict()  # Map from pruning rule to number of request arcs it removed
 
         # Decision Variable Structures
         self.trip_vars = dict()  # Map from driver to map of trip to model variable
@@ -66,6 +79,13 @@ class GeneralOptimizer(BaseOptimizer):
         # Additional Structures
         self.intrips = dict()  # Map from driver to Map from location to list of incoming trips to that location
         self.outtrips = dict()  # Map from driver to Map from location to list of outgoing trips from that location
+        self.node_ids = dict()  # Map from location to compact integer ID of the node
+        self.driver_start_nodes = dict()  # Map from driver to the driver's starting node
+        self.driver_end_nodes = dict()  # Map from driver to the driver's ending node
+        self.driver_arcs = dict()  # Map from driver to list of trips the driver can feasibly perform
+        self.driver_arc_sets = dict()  # Map from driver to set of trips the driver can feasibly perform
+        self.driver_in_arcs = dict()  # Map from driver to Map from node ID to feasible incoming trips to the node
+        self.driver_out_arcs = dict()  # Map from driver to Map from node ID to feasible outgoing trips from the node
 
         # Constants
         self.TRIPS_TO_DO = config["max_trips"]
@@ -87,17 +107,41 @@ class GeneralOptimizer(BaseOptimizer):
         self.STAGE2_TIME = config["stage2_time"]
         self.STAGE2_GAP = config["stage2_gap"]
         self.MAX_RETRIES = config["max_retries"]
+        self.NAME_VARIABLES = config.get("name_variables", True)
+        if config.get("cplex_threads"):
+            self.mdl.parameters.threads = config["cplex_threads"]
+        self.WARM_START = config.get("warm_start", False)
+        self.WARM_START_TIME = config.get("warm_start_time", 5)
+        self.model_cache = ModelCache(config["model_cache_directory"], config.get("model_cache_format", "sav")) \
+            if config.get("model_cache_directory") else None
 
         # Prepare Model
         self.obj = 0.0
         self.solution_df = None
-        self.single_rider_constraints = set()
-        self.early_day_constraints = set()
         self.__prepare_trip_parameters()
         self.__prepare_driver_parameters()
-        self.__generate_variables()
-        self.__prepare_constraints()
-        self.__prepare_objective()
+        self.__prepare_travel_matrix()
+        self.__generate_arcs()
+        if not self.__load_cached_model(config):
+            self.single_rider_constraints = ConstraintGroup(self.mdl, 'single_rider', 1)
+            self.early_day_constraints = ConstraintGroup(self.mdl, 'early_day', self.EARLY_DAY_TIME)
+            self.__generate_variables()
+            self.__prepare_constraints()
+            self.__prepare_objective()
+            self.__save_cached_model()
+        self.stages = [Stage('stage1', self.STAGE1_TIME,
+                             fallback=Stage('stage1_no_ed', self.STAGE1_TIME, self.STAGE1_GAP,
+                                            relax=[self.early_day_constraints])),
+                       Stage('stage2', self.STAGE2_TIME, self.STAGE2_GAP, relax=[self.single_rider_constraints])]
+        self.staged_solver = StagedSolver(self.mdl, [self.single_rider_constraints, self.early_day_constraints],
+                                          self.MAX_RETRIES)
+
+        # Stage 1 only allows a single rider in the vehicle at a time, so the heuristic used for the warm start can not
+        # fit two passengers in the vehicle at once
+        self.warm_start_problem = RoutingProblem(
+            trips, drivers, speed, dict(config, driver_capacity=max((t.space for t in self.all_trips.values()
+                                                                     if isinstance(t.id, str)), default=0.0))) \
+            if self.WARM_START else None
 
     def filter_driver_feasible_trips(self, driver: Driver, iter: Iterable[Trip]) -> Iterable[Trip]:
         """
@@ -107,12 +151,7 @@ class GeneralOptimizer(BaseOptimizer):
         :param iter: Iterable of Trips
         :return: Filter generator of feasible trips that a given driver can perform
         """
-        return filter(lambda t: not (
-                    (t.lp.o in self.driver_nodes and t.lp.o.get_clean_address() != driver.get_clean_address()) or (
-                    t.lp.d in self.driver_nodes and t.lp.d.get_clean_address() != driver.get_clean_address()))
-                                and t.required_level_of_service in driver.level_of_service
-                                and not (
-                    abs(self.node_capacities[t.lp.o] + self.node_capacities[t.lp.d]) > driver.capacity), iter)
+        return filter(lambda t: t in self.driver_arc_sets[driver], iter)
 
     def __prepare_trip_parameters(self) -> None:
         """
@@ -155,6 +194,8 @@ class GeneralOptimizer(BaseOptimizer):
             self.all_trips[id] = trip
             self.primary_trips[(start, end)] = trip
             self.location_to_primary_trip_id_map[start] = trip.id
+            self.node_keys[start] = (trip.id, 'pickup')
+            self.node_keys[end] = (trip.id, 'dropoff')
             self.revenues[start] = rev
             self.revenues[end] = 0
             if start not in self.outtrips:
@@ -192,6 +233,10 @@ class GeneralOptimizer(BaseOptimizer):
             self.driver_nodes.add(end)
             self.driver_starts.add(start)
             self.driver_ends.add(end)
+            self.driver_start_nodes[d] = start
+            self.driver_end_nodes[d] = end
+            self.node_keys[start] = (d.id, 'start')
+            self.node_keys[end] = (d.id, 'end')
             self.node_capacities[start] = 0
             self.node_capacities[end] = 0
             self.revenues[start] = 0
@@ -200,9 +245,119 @@ class GeneralOptimizer(BaseOptimizer):
                 break
         log.info(f"Number of Drivers: {count}")
 
-    def __generate_variables(self) -> None:
+    def driver_intrips(self, driver: Driver, loc: Location) -> List[Trip]:
         """
-        Generate the model variables
+        :param driver: Driver object
+        :param loc: Location of a node in the model
+        :return: Incoming trips to the location that the driver can feasibly perform
+        """
+        return self.driver_in_arcs[driver].get(self.node_ids[loc], [])
+
+    def driver_outtrips(self, driver: Driver, loc: Location) -> List[Trip]:
+        """
+        :param driver: Driver object
+        :param loc: Location of a node in the model
+        :return: Outgoing trips from the location that the driver can feasibly perform
+        """
+        return self.driver_out_arcs[driver].get(self.node_ids[loc], [])
+
+    def __prepare_driver_arc_index(self) -> None:
+        """
+        Index the trips each driver can feasibly perform once, both as a whole and by incoming and outgoing node, so
+        that the constraint builders do not need to filter the trips for every constraint.
+        """
+        self.node_ids = self.travel_matrix.index
+        driver_node_addresses = {loc: loc.get_clean_address() for loc in self.driver_nodes}
+        for d in self.drivers:
+            driver_address = d.get_clean_address()
+            self.driver_arcs[d] = []
+            self.driver_in_arcs[d] = dict()
+            self.driver_out_arcs[d] = dict()
+            for t in self.all_trips.values():
+                if driver_node_addresses.get(t.lp.o, driver_address) != driver_address or \
+                        driver_node_addresses.get(t.lp.d, driver_address) != driver_address:
+                    continue
+                if t.required_level_of_service not in d.level_of_service or \
+                        abs(self.node_capacities[t.lp.o] + self.node_capacities[t.lp.d]) > d.capacity:
+                    continue
+                self.driver_arcs[d].append(t)
+                self.driver_out_arcs[d].setdefault(self.node_ids[t.lp.o], []).append(t)
+                self.driver_in_arcs[d].setdefault(self.node_ids[t.lp.d], []).append(t)
+            self.driver_arc_sets[d] = set(self.driver_arcs[d])
+        log.info(f"Indexed feasible trips for each driver: {[len(arcs) for arcs in self.driver_arcs.values()]}")
+
+    def __prepare_travel_matrix(self) -> None:
+        """
+        Compute the miles and travel times between every pair of driver and request nodes at once
+        """
+        self.travel_matrix = TravelMatrix(list(self.driver_nodes) + list(self.request_nodes), self.SPEED)
+        log.info(f"Computed travel matrix for {len(self.travel_matrix.locations)} nodes")
+
+    def __prune_request_arcs(self) -> (List[Location], np.ndarray):
+        """
+        Determine which arcs between request nodes can be part of a feasible route.
+        The rules are applied on the whole travel matrix at once, and each removed arc is attributed to the first rule
+        that removes it in the per-rule statistics stored in arc_pruning_stats:
+        * invalid_trip: the arc would raise an InvalidTripException when constructed
+        * time_window: leaving the origin at its earliest time still arrives after the destination closes
+        * capacity: both nodes are pickups (or both are dropoffs) and their combined space exceeds the capacity
+        * precedence: the arc visits a leg of a patient's trip before completing the leg that must precede it
+        :return: List of request nodes and a boolean matrix indexed by positions in that list marking the kept arcs
+        """
+        request_nodes = list(self.request_nodes)
+        position = {loc: i for i, loc in enumerate(request_nodes)}
+        matrix_idx = np.array([self.travel_matrix.index[loc] for loc in request_nodes], dtype=int)
+        travel_times = self.travel_matrix.time[np.ix_(matrix_idx, matrix_idx)]
+        window_open = np.array([self.node_window_open[loc] for loc in request_nodes])
+        window_close = np.array([self.node_window_close[loc] for loc in request_nodes])
+        capacities = np.array([self.node_capacities[loc] for loc in request_nodes])
+
+        candidate_arcs = np.ones((len(request_nodes), len(request_nodes)), dtype=bool)
+        np.fill_diagonal(candidate_arcs, False)
+        for rS, rE in self.request_map.items():
+            candidate_arcs[position[rS], position[rE]] = False
+            candidate_arcs[position[rE], position[rS]] = False
+
+        """
+        Legs of a patient's trip linked by precedence constraints (A before B, B before C) are ranked in the order in
+        which they must be visited: origin then destination of each leg.
+        """
+        patient = np.full(len(request_nodes), -1)
+        rank = np.zeros(len(request_nodes), dtype=int)
+        patient_ids = dict()
+        for trp in sorted(filter(lambda x: isinstance(x, str), self.all_trips)):
+            trip = self.all_trips[trp]
+            previous = trp[:-1] + chr(ord(trp[-1]) - 1)
+            if previous in self.all_trips:
+                previous_dest = position[self.all_trips[previous].lp.d]
+                patient[position[trip.lp.o]] = patient[previous_dest]
+                rank[position[trip.lp.o]] = rank[previous_dest] + 1
+            else:
+                patient[position[trip.lp.o]] = patient_ids.setdefault(trp, len(patient_ids))
+            patient[position[trip.lp.d]] = patient[position[trip.lp.o]]
+            rank[position[trip.lp.d]] = rank[position[trip.lp.o]] + 1
+
+        rules = [
+            ('invalid_trip', travel_times > window_close[np.newaxis, :] - np.maximum(
+                0, window_open[:, np.newaxis] - INVALID_TRIP_PICKUP_BUFFER)),
+            ('time_window', window_open[:, np.newaxis] + travel_times > window_close[np.newaxis, :]),
+            ('capacity', (np.sign(capacities[:, np.newaxis]) == np.sign(capacities[np.newaxis, :])) & (
+                    np.abs(capacities[:, np.newaxis]) + np.abs(capacities[np.newaxis, :]) > self.CAP)),
+            ('precedence', (patient[:, np.newaxis] == patient[np.newaxis, :]) & (patient[:, np.newaxis] >= 0) & (
+                    rank[np.newaxis, :] != rank[:, np.newaxis] + 1))
+        ]
+        self.arc_pruning_stats = {'candidates': int(candidate_arcs.sum())}
+        for rule, prunable in rules:
+            pruned = candidate_arcs & prunable
+            self.arc_pruning_stats[rule] = int(pruned.sum())
+            candidate_arcs &= ~pruned
+        self.arc_pruning_stats['kept'] = int(candidate_arcs.sum())
+        log.info(f"Request arc pruning statistics: {self.arc_pruning_stats}")
+        return request_nodes, candidate_arcs
+
+    def __generate_arcs(self) -> None:
+        """
+        Generate the trips between driver and request nodes that can be part of a route and index them by driver
         """
         id = 1
         """
@@ -210,7 +365,8 @@ class GeneralOptimizer(BaseOptimizer):
         """
         for dS in self.driver_starts:
             for rS in self.request_starts:
-                t = Trip(dS, rS, 0, id, 0.0, 1.0, self.SPEED, False, 0.0)
+                t = Trip(dS, rS, 0, id, 0.0, 1.0, self.SPEED, False, 0.0,
+                         lp=LocationPair(dS, rS, self.SPEED, self.travel_matrix))
                 if dS not in self.outtrips:
                     self.outtrips[dS] = {t}
                 else:
@@ -227,7 +383,8 @@ class GeneralOptimizer(BaseOptimizer):
         """
         for dE in self.driver_ends:
             for rE in self.request_ends:
-                t = Trip(rE, dE, 0, id, 0.0, 1.0, self.SPEED, False, 0.0)
+                t = Trip(rE, dE, 0, id, 0.0, 1.0, self.SPEED, False, 0.0,
+                         lp=LocationPair(rE, dE, self.SPEED, self.travel_matrix))
                 if rE not in self.outtrips:
                     self.outtrips[rE] = {t}
                 else:
@@ -242,43 +399,166 @@ class GeneralOptimizer(BaseOptimizer):
         """
         Trips from any request location to any other request location
         """
-        for rS in self.request_nodes:
-            for rE in self.request_nodes:
-                if rS == rE or (rS in self.request_map and self.request_map[rS] == rE) or (
-                        rE in self.request_map and self.request_map[rE] == rS):
-                    continue
-                try:
-                    space = 0
-                    if rS in self.wheelchair_locations: space = 1.5
-                    t = Trip(rS, rE, space, id, self.node_window_open[rS], self.node_window_close[rE], self.SPEED,
-                             False, 0.0)
-                except InvalidTripException:
-                    continue
-                if rS not in self.outtrips:
-                    self.outtrips[rS] = {t}
-                else:
-                    self.outtrips[rS].add(t)
-                if rE not in self.intrips:
-                    self.intrips[rE] = {t}
-                else:
-                    self.intrips[rE].add(t)
-                id += 1
-                self.all_trips[id] = t
+        request_nodes, candidate_arcs = self.__prune_request_arcs()
+        for i, j in zip(*np.nonzero(candidate_arcs)):
+            rS, rE = request_nodes[i], request_nodes[j]
+            try:
+                space = 0
+                if rS in self.wheelchair_locations: space = 1.5
+                t = Trip(rS, rE, space, id, self.node_window_open[rS], self.node_window_close[rE], self.SPEED,
+                         False, 0.0, lp=LocationPair(rS, rE, self.SPEED, self.travel_matrix))
+            except InvalidTripException:
+                continue
+            if rS not in self.outtrips:
+                self.outtrips[rS] = {t}
+            else:
+                self.outtrips[rS].add(t)
+            if rE not in self.intrips:
+                self.intrips[rE] = {t}
+            else:
+                self.intrips[rE].add(t)
+            id += 1
+            self.all_trips[id] = t
+
+        self.__prepare_driver_arc_index()
 
+    def __generate_variables(self) -> None:
         """
-        Create Decision Variables for Each Driver
+        Generate the model variables
         """
         for d in self.drivers:
-            self.trip_vars[d] = dict()
-            self.time_vars[d] = dict()
-            self.capacity_vars[d] = dict()
-            for t in self.filter_driver_feasible_trips(d, self.all_trips.values()):
-                self.trip_vars[d][t] = self.mdl.binary_var(name='y' + '_' + str(d.id) + '_' + str(t.id))
-                self.time_vars[d][t] = self.mdl.continuous_var(lb=0, ub=1, name='t' + '_' + str(d.id) + '_' + str(t.id))
-                self.mdl.add_constraint(self.time_vars[d][t] - self.trip_vars[d][t] <= 0)
-                self.capacity_vars[d][t] = self.mdl.continuous_var(lb=0, ub=d.capacity,
-                                                                   name='q' + '_' + str(d.id) + '_' + str(t.id))
-                self.mdl.add_constraint(self.capacity_vars[d][t] - self.trip_vars[d][t] * d.capacity <= 0)
+            arcs = self.driver_arcs[d]
+            self.trip_vars[d] = self.mdl.binary_var_dict(arcs, name=self.__var_namer('y', d))
+            self.time_vars[d] = self.mdl.continuous_var_dict(arcs, lb=0, ub=1, name=self.__var_namer('t', d))
+            self.capacity_vars[d] = self.mdl.continuous_var_dict(arcs, lb=0, ub=d.capacity,
+                                                                 name=self.__var_namer('q', d))
+            self.mdl.add_constraints(self.time_vars[d][t] <= self.trip_vars[d][t] for t in arcs)
+            self.mdl.add_constraints(self.capacity_vars[d][t] <= d.capacity * self.trip_vars[d][t] for t in arcs)
+
+    def __model_fingerprint(self) -> str:
+        """
+        :return: Fingerprint of the trips, drivers, and configuration details the model is built from
+        """
+        return fingerprint(self.trips_inp, self.drivers_inp, self.SPEED, {
+            'max_trips': self.TRIPS_TO_DO, 'max_drivers': self.NUM_DRIVERS,
+            'early_pickup_window': self.EARLY_PICK_WINDOW, 'late_pickup_window': self.EARLY_DROP_WINDOW,
+            'early_drop_window': self.LATE_PICK_WINDOW, 'late_drop_window': self.LATE_DROP_WINDOW,
+            'driver_capacity': self.CAP, 'route_limit': self.ROUTE_LIMIT, 'route_limit_penalty': self.ROUTE_LIMIT_PEN,
+            'early_day_time': self.EARLY_DAY_TIME, 'merge_penalty': self.MERGE_PEN, 'revenue_penalty': self.REVENUE_PEN,
+            'wheelchair_penalty': self.W_PEN, 'name_variables': self.NAME_VARIABLES})
+
+    def __arc_key(self, driver: Driver, trip: Trip) -> Tuple[Any, ...]:
+        """
+        :param driver: Driver object
+        :param trip: Trip the driver can perform
+        :return: Key identifying the driver's variables for the trip in the model cache
+        """
+        return (driver.id,) + self.node_keys[trip.lp.o] + self.node_keys[trip.lp.d]
+
+    def __load_cached_model(self, config: Dict[str, Any]) -> bool:
+        """
+        Replace the model with the cached model built from the same inputs, if there is one
+        :param config: Configuration Details for this optimizer type and its parameters
+        :return: True if the cached model was loaded
+        """
+        if self.model_cache is None:
+            return False
+        cached = self.model_cache.load(self.__model_fingerprint(), self.mdl.name)
+        if cached is None:
+            return False
+        mdl, variables = cached
+        try:
+            for name, driver_vars in (('trip', self.trip_vars), ('time', self.time_vars),
+                                      ('capacity', self.capacity_vars)):
+                for d in self.drivers:
+                    driver_vars[d] = {t: variables[name][self.__arc_key(d, t)] for t in self.driver_arcs[d]}
+            self.revenue_vars = {d: variables['revenue'][d.id] for d in self.drivers}
+            self.wheelchair_vars = {d: variables['wheelchair'][d.id] for d in self.drivers
+                                    if 'W' in d.level_of_service}
+        except KeyError:
+            log.warning("Cached model does not match the feasible trips of the drivers, building the model again")
+            self.trip_vars, self.time_vars, self.capacity_vars = dict(), dict(), dict()
+            self.revenue_vars, self.wheelchair_vars = dict(), dict()
+            return False
+        self.rev_max, self.rev_min = variables['rev_max'], variables['rev_min']
+        self.max_wheelchair_trips = variables['max_wheelchair_trips']
+        self.min_wheelchair_trips = variables['min_wheelchair_trips']
+        self.single_rider_constraints = ConstraintGroup(mdl, 'single_rider', 1, variables['single_rider'])
+        self.early_day_constraints = ConstraintGroup(mdl, 'early_day', self.EARLY_DAY_TIME, variables['early_day'])
+        mdl.parameters.randomseed.set(config['seed'])
+        if config.get("cplex_threads"):
+            mdl.parameters.threads = config["cplex_threads"]
+        self.mdl = mdl
+        return True
+
+    def __save_cached_model(self) -> None:
+        """
+        Export the built model and the keys of its variables to the model cache
+        """
+        if self.model_cache is None:
+            return
+        variables = {name: {self.__arc_key(d, t): var for d in self.drivers for t, var in driver_vars[d].items()}
+                     for name, driver_vars in (('trip', self.trip_vars), ('time', self.time_vars),
+                                               ('capacity', self.capacity_vars))}
+        variables['revenue'] = {d.id: var for d, var in self.revenue_vars.items()}
+        variables['wheelchair'] = {d.id: var for d, var in self.wheelchair_vars.items()}
+        variables.update(rev_max=self.rev_max, rev_min=self.rev_min, max_wheelchair_trips=self.max_wheelchair_trips,
+                         min_wheelchair_trips=self.min_wheelchair_trips,
+                         single_rider=self.single_rider_constraints.relaxation,
+                         early_day=self.early_day_constraints.relaxation)
+        self.model_cache.save(self.__model_fingerprint(), self.mdl, variables)
+
+    def __var_namer(self, prefix: str, driver: Driver) -> Optional[Callable[[Trip], str]]:
+        """
+        :param prefix: Prefix of the variable names
+        :param driver: Driver whose variables are being named
+        :return: Function giving a driver's variable for a trip an LP safe name, or None if variable naming is disabled
+        """
+        if not self.NAME_VARIABLES:
+            return None
+        return lambda t: lp_safe_name(prefix + '_' + str(driver.id) + '_' + str(t.id))
+
+    def __ct_names(self, names: List[str]) -> Optional[List[str]]:
+        """
+        :param names: Names of a batch of constraints
+        :return: The names, or None if naming is disabled
+        """
+        return names if self.NAME_VARIABLES else None
+
+    def __in_arcs(self, loc: Location) -> List[Tuple[Driver, Trip]]:
+        """
+        :param loc: Location of a node in the model
+        :return: Feasible incoming trips to the location paired with the driver performing them for all drivers
+        """
+        return [(d, t) for d in self.drivers for t in self.driver_intrips(d, loc)]
+
+    def __out_arcs(self, loc: Location) -> List[Tuple[Driver, Trip]]:
+        """
+        :param loc: Location of a node in the model
+        :return: Feasible outgoing trips from the location paired with the driver performing them for all drivers
+        """
+        return [(d, t) for d in self.drivers for t in self.driver_outtrips(d, loc)]
+
+    def __time_sum(self, arcs: List[Tuple[Driver, Trip]]) -> LinearExpr:
+        """
+        :param arcs: Trips paired with the driver performing them
+        :return: Sum of the departure time variables of the trips
+        """
+        return self.mdl.sum(self.time_vars[d][t] for d, t in arcs)
+
+    def __travel_time_sum(self, arcs: List[Tuple[Driver, Trip]]) -> LinearExpr:
+        """
+        :param arcs: Trips paired with the driver performing them
+        :return: Sum of the travel times of the trips that are taken
+        """
+        return self.mdl.scal_prod([self.trip_vars[d][t] for d, t in arcs], [t.lp.time for _, t in arcs])
+
+    def __driver_id_sum(self, arcs: List[Tuple[Driver, Trip]]) -> LinearExpr:
+        """
+        :param arcs: Trips paired with the driver performing them
+        :return: Sum of the IDs of the drivers taking the trips
+        """
+        return self.mdl.scal_prod([self.trip_vars[d][t] for d, t in arcs], [d.id for d, _ in arcs])
 
     def __prepare_constraints(self) -> None:
         """
@@ -288,76 +568,60 @@ class GeneralOptimizer(BaseOptimizer):
         """
         Request Requirements
         """
+        # Flow conservation already allows at most one driver to take the primary trip, so requiring at least one
+        # forces every request to be served directly from its pickup to its dropoff until the group is relaxed
+        single_rider_constraints = []
         for trp in self.all_trips:
             if isinstance(trp, str):
-                driver_id_sum = 0
-                for d in self.drivers:
-                    if self.all_trips[trp].required_level_of_service in d.level_of_service:
-                        driver_id_sum += self.trip_vars[d][self.all_trips[trp]]
-                con = self.mdl.add_constraint(ct=driver_id_sum == 1)
-                self.single_rider_constraints.add(con)
+                trip = self.all_trips[trp]
+                single_rider_constraints.append(self.mdl.sum(
+                    self.trip_vars[d][trip] for d in self.drivers
+                    if trip.required_level_of_service in d.level_of_service) +
+                    self.single_rider_constraints.relaxation >= 1)
+        self.mdl.add_constraints(single_rider_constraints)
 
         """
         Flow Conservation
         """
+        flow_constraints, flow_names = [], []
         for rN in self.request_nodes:
-            total_flow_in = 0
-            total_flow_out = 0
-            for d in self.drivers:
-                for intrip in self.filter_driver_feasible_trips(d, self.intrips[rN]):
-                    total_flow_in += self.trip_vars[d][intrip]
-                for otrip in self.filter_driver_feasible_trips(d, self.outtrips[rN]):
-                    total_flow_out -= self.trip_vars[d][otrip]
-            self.mdl.add_constraint(ct=total_flow_in <= 1, ctname='flowin' + '_' + str(rN)[:5])
-            self.mdl.add_constraint(ct=total_flow_out >= -1, ctname='flowout' + '_' + str(rN)[:5])
-            self.mdl.add_constraint(ct=total_flow_in + total_flow_out == 0, ctname='flowinout' + '_' + str(rN)[:5])
+            total_flow_in = self.mdl.sum(self.trip_vars[d][t] for d, t in self.__in_arcs(rN))
+            total_flow_out = self.mdl.sum(self.trip_vars[d][t] for d, t in self.__out_arcs(rN))
+            flow_constraints += [total_flow_in <= 1, total_flow_out <= 1, total_flow_in - total_flow_out == 0]
+            flow_names += ['flowin' + '_' + str(rN)[:5], 'flowout' + '_' + str(rN)[:5],
+                           'flowinout' + '_' + str(rN)[:5]]
         for d in self.drivers:
-            for dS in self.driver_starts:
-                if dS.get_clean_address() != d.get_clean_address():
-                    continue
-                driver_id_sum = 0
-                for otrip in self.filter_driver_feasible_trips(d, self.outtrips[dS]):
-                    driver_id_sum -= self.trip_vars[d][otrip]
-                self.mdl.add_constraint(ct=driver_id_sum == -1, ctname='driverout' + '_' + str(d.id))
+            flow_constraints.append(self.mdl.sum(
+                self.trip_vars[d][t] for t in self.driver_outtrips(d, self.driver_start_nodes[d])) == 1)
+            flow_names.append('driverout' + '_' + str(d.id))
         for d in self.drivers:
-            for dE in self.driver_ends:
-                if dE.get_clean_address() != d.get_clean_address():
-                    continue
-                driver_id_sum = 0
-                for intrip in self.filter_driver_feasible_trips(d, self.intrips[dE]):
-                    driver_id_sum += self.trip_vars[d][intrip]
-                self.mdl.add_constraint(ct=driver_id_sum == 1, ctname='driverin' + '_' + str(d.id))
+            flow_constraints.append(self.mdl.sum(
+                self.trip_vars[d][t] for t in self.driver_intrips(d, self.driver_end_nodes[d])) == 1)
+            flow_names.append('driverin' + '_' + str(d.id))
+        self.mdl.add_constraints(flow_constraints, self.__ct_names(flow_names))
 
         log.info("Set flow conservation constraints")
 
         """
         Time Constraints
         """
-        for loc in self.request_ends:
-            intrip_time_var_sum = 0
-            intrip_travel_time_sum = 0
-            location_close_window = self.node_window_close[loc]
-            for d in self.drivers:
-                for intrip in self.filter_driver_feasible_trips(d, self.intrips[loc]):
-                    intrip_time_var_sum += self.time_vars[d][intrip]
-                    intrip_travel_time_sum += intrip.lp.time * self.trip_vars[d][intrip]
-            self.mdl.add_constraint(intrip_time_var_sum + intrip_travel_time_sum <= location_close_window)
+        self.mdl.add_constraints(
+            self.__time_sum(self.__in_arcs(loc)) + self.__travel_time_sum(self.__in_arcs(loc)) <=
+            self.node_window_close[loc] for loc in self.request_ends)
         log.info("Set arrival time constriants")
 
+        departure_constraints = []
         for loc in self.request_starts:
-            outtrip_time_var_sum = 0
-            location_close_window = self.node_window_close[loc]
-            location_open_window = self.node_window_open[loc]
-            for d in self.drivers:
-                for otrip in self.filter_driver_feasible_trips(d, self.outtrips[loc]):
-                    outtrip_time_var_sum += self.time_vars[d][otrip]
-            self.mdl.add_constraint(outtrip_time_var_sum >= location_open_window)
-            self.mdl.add_constraint(outtrip_time_var_sum <= location_close_window)
+            outtrip_time_var_sum = self.__time_sum(self.__out_arcs(loc))
+            departure_constraints += [outtrip_time_var_sum >= self.node_window_open[loc],
+                                      outtrip_time_var_sum <= self.node_window_close[loc]]
+        self.mdl.add_constraints(departure_constraints)
         log.info("Set departure time constraints")
 
         """
         Precedence Constraints
         """
+        precedence_constraints = []
         for trp in self.all_trips:
             if isinstance(trp, str):
                 if (trp.endswith('A') and (trp[:-1] + 'B' in self.all_trips)) or (
@@ -371,83 +635,46 @@ class GeneralOptimizer(BaseOptimizer):
                         alt_origin = self.all_trips[trp[:-1] + "C"].lp.o
                         alt_dest = self.all_trips[trp[:-1] + "C"].lp.d
 
-                    main_origin_outtrip_time_var_sum = 0
-                    for d in self.drivers:
-                        for itrip in self.filter_driver_feasible_trips(d, self.outtrips[main_origin]):
-                            main_origin_outtrip_time_var_sum += self.time_vars[d][itrip]
-                    main_dest_intrip_time_var_sum = 0
-                    main_dest_incoming_travel_time_sum = 0
-                    for d in self.drivers:
-                        for itrip in self.filter_driver_feasible_trips(d, self.intrips[main_dest]):
-                            main_dest_intrip_time_var_sum += self.time_vars[d][itrip]
-                            main_dest_incoming_travel_time_sum += itrip.lp.time * self.trip_vars[d][itrip]
-                    alt_origin_outgoing_time_var_sum = 0
-                    for d2 in self.drivers:
-                        for otrip in self.filter_driver_feasible_trips(d2, self.outtrips[alt_origin]):
-                            alt_origin_outgoing_time_var_sum += self.time_vars[d2][otrip]
-                    alt_dest_incoming_time_var_sum = 0
-                    for d2 in self.drivers:
-                        for otrip in self.filter_driver_feasible_trips(d2, self.outtrips[alt_dest]):
-                            alt_dest_incoming_time_var_sum += self.time_vars[d2][otrip]
-                    self.mdl.add_constraint(main_origin_outtrip_time_var_sum <= main_dest_intrip_time_var_sum)
-                    self.mdl.add_constraint(
-                        main_dest_intrip_time_var_sum + main_dest_incoming_travel_time_sum <= alt_origin_outgoing_time_var_sum)
-                    self.mdl.add_constraint(alt_origin_outgoing_time_var_sum <= alt_dest_incoming_time_var_sum)
+                    main_origin_outtrip_time_var_sum = self.__time_sum(self.__out_arcs(main_origin))
+                    main_dest_intrip_time_var_sum = self.__time_sum(self.__in_arcs(main_dest))
+                    main_dest_incoming_travel_time_sum = self.__travel_time_sum(self.__in_arcs(main_dest))
+                    alt_origin_outgoing_time_var_sum = self.__time_sum(self.__out_arcs(alt_origin))
+                    alt_dest_incoming_time_var_sum = self.__time_sum(self.__out_arcs(alt_dest))
+                    precedence_constraints += [
+                        main_origin_outtrip_time_var_sum <= main_dest_intrip_time_var_sum,
+                        main_dest_intrip_time_var_sum + main_dest_incoming_travel_time_sum <=
+                        alt_origin_outgoing_time_var_sum,
+                        alt_origin_outgoing_time_var_sum <= alt_dest_incoming_time_var_sum]
+        self.mdl.add_constraints(precedence_constraints)
         log.info("Set primary trip precedence constraints")
 
-        for loc in self.request_nodes:
-            incoming_time_var_sum, outgoing_time_var_sum = 0, 0
-            travel_time_sum = 0
-            for d in self.drivers:
-                for intrip in self.filter_driver_feasible_trips(d, self.intrips[loc]):
-                    incoming_time_var_sum += self.time_vars[d][intrip]
-                    travel_time_sum += self.trip_vars[d][intrip] * intrip.lp.time
-                for otrip in self.filter_driver_feasible_trips(d, self.outtrips[loc]):
-                    outgoing_time_var_sum += self.time_vars[d][otrip]
-            self.mdl.add_constraint(incoming_time_var_sum + travel_time_sum <= outgoing_time_var_sum)
+        self.mdl.add_constraints(
+            self.__time_sum(self.__in_arcs(loc)) + self.__travel_time_sum(self.__in_arcs(loc)) <=
+            self.__time_sum(self.__out_arcs(loc)) for loc in self.request_nodes)
         log.info("Set incoming trip before outgoing trip constraints")
 
-        for loc in self.request_nodes:
-            driver_id_sum = 0
-            for d in self.drivers:
-                for intrip in self.filter_driver_feasible_trips(d, self.intrips[loc]):
-                    driver_id_sum += d.id * self.trip_vars[d][intrip]
-                for otrip in self.filter_driver_feasible_trips(d, self.outtrips[loc]):
-                    driver_id_sum -= d.id * self.trip_vars[d][otrip]
-            self.mdl.add_constraint(ct=driver_id_sum == 0)
-
-        for rS in self.request_starts:
-            rE = self.request_map[rS]
-            driver_id_sum = 0
-            for d in self.drivers:
-                for intrip in self.filter_driver_feasible_trips(d, self.intrips[rE]):
-                    driver_id_sum += d.id * self.trip_vars[d][intrip]
-                for otrip in self.filter_driver_feasible_trips(d, self.outtrips[rS]):
-                    driver_id_sum -= d.id * self.trip_vars[d][otrip]
-            self.mdl.add_constraint(ct=driver_id_sum == 0)
+        self.mdl.add_constraints(
+            self.__driver_id_sum(self.__in_arcs(loc)) - self.__driver_id_sum(self.__out_arcs(loc)) == 0
+            for loc in self.request_nodes)
+        self.mdl.add_constraints(
+            self.__driver_id_sum(self.__in_arcs(self.request_map[rS])) - self.__driver_id_sum(self.__out_arcs(rS)) == 0
+            for rS in self.request_starts)
         log.info("Set incoming driver is the same as outgoing driver constraints")
 
         """
         Capacity Constraints
         """
-        for loc in self.request_nodes:
-            incoming_capacity_filled = 0
-            outgoing_capacity_filled = 0
-            for d in self.drivers:
-                for otrip in self.filter_driver_feasible_trips(d, self.outtrips[loc]):
-                    outgoing_capacity_filled += self.capacity_vars[d][otrip]
-                for intrip in self.filter_driver_feasible_trips(d, self.intrips[loc]):
-                    incoming_capacity_filled += self.capacity_vars[d][intrip]
-            self.mdl.add_constraint(outgoing_capacity_filled == incoming_capacity_filled + self.node_capacities[loc])
+        self.mdl.add_constraints(
+            self.mdl.sum(self.capacity_vars[d][t] for d, t in self.__out_arcs(loc)) ==
+            self.mdl.sum(self.capacity_vars[d][t] for d, t in self.__in_arcs(loc)) + self.node_capacities[loc]
+            for loc in self.request_nodes)
         log.info("Set capacity value constraints")
 
         for d in self.drivers:
-            for loc in self.driver_starts:
-                for otrip in self.filter_driver_feasible_trips(d, self.outtrips[loc]):
-                    self.mdl.add_constraint(ct=self.capacity_vars[d][otrip] == 0)
-            for loc in self.driver_ends:
-                for intrip in self.filter_driver_feasible_trips(d, self.intrips[loc]):
-                    self.mdl.add_constraint(ct=self.capacity_vars[d][intrip] == 0)
+            self.mdl.add_constraints(self.capacity_vars[d][t] == 0 for t in
+                                     self.driver_outtrips(d, self.driver_start_nodes[d]))
+            self.mdl.add_constraints(self.capacity_vars[d][t] == 0 for t in
+                                     self.driver_intrips(d, self.driver_end_nodes[d]))
         log.info("Set initial and final trip capacity constraints")
 
         self.__add_custom_constraints()
@@ -463,54 +690,42 @@ class GeneralOptimizer(BaseOptimizer):
         Route Length Penalty
         """
         for d in self.drivers:
-            driver_departure_time = 0
-            driver_return_time = 0
-            for dS in self.driver_starts:
-                if dS.get_clean_address() != d.get_clean_address():
-                    continue
-                for otrip in self.filter_driver_feasible_trips(d, self.outtrips[dS]):
-                    driver_departure_time += self.time_vars[d][otrip]
-                break
-            for dE in self.driver_ends:
-                if dE.get_clean_address() != d.get_clean_address():
-                    continue
-                for intrip in self.filter_driver_feasible_trips(d, self.intrips[dE]):
-                    driver_return_time += self.time_vars[d][intrip]
-                break
+            driver_departure_time = self.mdl.sum(
+                self.time_vars[d][t] for t in self.driver_outtrips(d, self.driver_start_nodes[d]))
+            driver_return_time = self.mdl.sum(
+                self.time_vars[d][t] for t in self.driver_intrips(d, self.driver_end_nodes[d]))
             self.obj += self.ROUTE_LIMIT_PEN * (driver_return_time - driver_departure_time)
             if not d.early_day_flag:
-                try:
-                    c = self.mdl.add_constraint(driver_departure_time >= self.EARLY_DAY_TIME)
-                    self.early_day_constraints.add(c)
-                    pass
-                except DOcplexException as e:
-                    if 'trivially' not in e.message:
-                        raise e
+                if driver_departure_time.is_constant():
                     log.info(f"Can't restrict early day for {d}")
+                else:
+                    self.mdl.add_constraint(
+                        driver_departure_time + self.early_day_constraints.relaxation >= self.EARLY_DAY_TIME)
 
         log.info("Set Route Length Penalty and Early Day constraints")
         """
         Merge Trip Requirements
         """
-        for d in self.drivers:
-            for mer in self.filter_driver_feasible_trips(d, self.merges):
-                self.mdl.add_constraint(ct=self.trip_vars[d][mer] == self.trip_vars[d][self.merges[mer]])
-                self.obj += self.MERGE_PEN * (self.time_vars[d][mer] - (
-                            self.time_vars[d][self.merges[mer]] + self.merges[mer].lp.time * self.trip_vars[d][
-                        mer])) * (24)
+        merge_arcs = [(d, mer) for d in self.drivers for mer in self.merges if mer in self.driver_arc_sets[d]]
+        self.mdl.add_constraints(self.trip_vars[d][mer] == self.trip_vars[d][self.merges[mer]] for d, mer in merge_arcs)
+        self.obj += self.MERGE_PEN * 24 * (
+                self.mdl.sum(self.time_vars[d][mer] - self.time_vars[d][self.merges[mer]] for d, mer in merge_arcs)
+                - self.mdl.scal_prod([self.trip_vars[d][mer] for d, mer in merge_arcs],
+                                     [self.merges[mer].lp.time for _, mer in merge_arcs]))
 
         log.info("Set merge trip constraints")
 
         """
         Equalizing Revenue Penalty
         """
-        self.rev_max = self.mdl.continuous_var(0)
-        self.rev_min = self.mdl.continuous_var(0)
+        self.rev_max = self.mdl.continuous_var(0, name="RevenueMax" if self.NAME_VARIABLES else None)
+        self.rev_min = self.mdl.continuous_var(0, name="RevenueMin" if self.NAME_VARIABLES else None)
         for d in self.drivers:
-            self.revenue_vars[d] = self.mdl.continuous_var(lb=0, name="Revenue" + str(d.id))
-            self.mdl.add_constraint(self.revenue_vars[d] == sum(self.revenues[t.lp.o] * self.trip_vars[d][t] for t in
-                                                                self.filter_driver_feasible_trips(d,
-                                                                                                  self.all_trips.values())))
+            self.revenue_vars[d] = self.mdl.continuous_var(lb=0, name="Revenue" + str(d.id)
+                                                           if self.NAME_VARIABLES else None)
+            self.mdl.add_constraint(self.revenue_vars[d] == self.mdl.scal_prod(
+                [self.trip_vars[d][t] for t in self.driver_arcs[d]],
+                [self.revenues[t.lp.o] for t in self.driver_arcs[d]]))
             self.mdl.add_constraint(self.rev_max >= self.revenue_vars[d])
             self.mdl.add_constraint(self.rev_min <= self.revenue_vars[d])
         self.obj += self.REVENUE_PEN * (self.rev_max - self.rev_min)
@@ -519,15 +734,14 @@ class GeneralOptimizer(BaseOptimizer):
         """
         Equalizing Wheel Chair Trip Penalty
         """
-        self.max_wheelchair_trips = self.mdl.continuous_var(0)
-        self.min_wheelchair_trips = self.mdl.continuous_var(0)
+        self.max_wheelchair_trips = self.mdl.continuous_var(0, name="WheelchairsMax" if self.NAME_VARIABLES else None)
+        self.min_wheelchair_trips = self.mdl.continuous_var(0, name="WheelchairsMin" if self.NAME_VARIABLES else None)
         for d in self.drivers:
             if 'W' not in d.level_of_service: continue
-            self.wheelchair_vars[d] = self.mdl.continuous_var(lb=0, name="Wheelchairs" + str(d.id))
-            self.mdl.add_constraint(self.wheelchair_vars[d] == sum(self.trip_vars[d][t] for t in
-                                                                   filter(lambda x: x.required_level_of_service == 'W',
-                                                                          self.filter_driver_feasible_trips(d,
-                                                                                                            self.all_trips.values()))))
+            self.wheelchair_vars[d] = self.mdl.continuous_var(lb=0, name="Wheelchairs" + str(d.id)
+                                                              if self.NAME_VARIABLES else None)
+            self.mdl.add_constraint(self.wheelchair_vars[d] == self.mdl.sum(
+                self.trip_vars[d][t] for t in self.driver_arcs[d] if t.required_level_of_service == 'W'))
             self.mdl.add_constraint(self.max_wheelchair_trips >= self.wheelchair_vars[d])
             self.mdl.add_constraint(self.min_wheelchair_trips <= self.wheelchair_vars[d])
         self.obj += self.W_PEN * (self.max_wheelchair_trips - self.min_wheelchair_trips)
@@ -537,138 +751,128 @@ class GeneralOptimizer(BaseOptimizer):
         """
         Objective function
         """
-        for d, driver_trips in self.trip_vars.items():
-            for t, var in driver_trips.items():
-                self.obj += 1440 * t.lp.time * var
+        self.obj += self.mdl.scal_prod([var for driver_trips in self.trip_vars.values() for var in driver_trips.values()],
+                                       [1440 * t.lp.time for driver_trips in self.trip_vars.values() for t in
+                                        driver_trips])
         log.info("Defined Objective Function")
         self.mdl.minimize(self.obj)
 
+    def __add_heuristic_warm_start(self) -> None:
+        """
+        Build a single rider solution with the insertion and local search heuristic and register it as a MIP start, so
+        that Stage 1 starts from a feasible incumbent instead of spending its time searching for one
+        """
+        p = self.warm_start_problem
+        solution = local_search(construct_solution(p), time.monotonic() + self.WARM_START_TIME)
+        start = {var: 0 for driver_trips in self.trip_vars.values() for var in driver_trips.values()}
+        for route, d in zip(solution.routes, self.drivers):
+            if not route.stops:
+                continue
+            locations = [self.driver_start_nodes[d]] + \
+                        [p.trips[s].lp.o if s < p.n else p.trips[s - p.n].lp.d for s in route.stops] + \
+                        [self.driver_end_nodes[d]]
+            departures = [max(0.0, route.times[0] - p.time[p.depot[route.driver]][route.stops[0]])] + route.times
+            loads = [0.0] + route.loads
+            arcs = {(t.lp.o, t.lp.d): t for t in self.driver_arcs[d]}
+            route_arcs = [arcs.get(pair) for pair in zip(locations, locations[1:])]
+            if None in route_arcs:
+                log.info(f"Route of {d.name} found by the warm start heuristic uses pruned trips, leaving it to CPLEX")
+                for t in self.driver_arcs[d]:
+                    del start[self.trip_vars[d][t]]
+                continue
+            for t, departure, load in zip(route_arcs, departures, loads):
+                start[self.trip_vars[d][t]] = 1
+                start[self.time_vars[d][t]] = departure
+                start[self.capacity_vars[d][t]] = load
+        log.info(f"Warm start heuristic objective {solution.objective()} with {len(solution.unassigned)} "
+                 "unassigned trips")
+        self.mdl.add_mip_start(SolveSolution(self.mdl, start), effort_level=EffortLevel.Repair,
+                               write_level=WriteLevel.AllVars)
+
     def solve(self, solution_file: str, save_stages: bool = False) -> DataFrame:
+        """
+        Solve the model in stages. Stage 1 only allows a single rider in the vehicle at a time and is solved again
+        without the early day constraints if it is infeasible. Stage 2 allows multiple riders and starts from the
+        solution of Stage 1.
+        :param solution_file: path to save solution details
+        :param save_stages: Whether to also save the solution of every stage next to the solution file
+        :return: DataFrame with the solution details
+        """
         self.solution_df = None
-        """TODO: Make this process of retrying solver better!!!"""
-        for i in range(self.MAX_RETRIES):
-            removed_early_day_constraints = False
-            removed_single_rider_constraints = False
-            try:
-                progress_listener = TimeListener(self.STAGE1_TIME)
-                self.mdl.add_progress_listener(progress_listener)
-                first_solve = self.mdl.solve()
-                if first_solve and (
-                        first_solve.solve_status == JobSolveStatus.FEASIBLE_SOLUTION or first_solve.solve_status == JobSolveStatus.OPTIMAL_SOLUTION):
-                    log.info(f"First solve status: {self.mdl.get_solve_status()}")
-                    log.info(f"First solve obj value:  {self.mdl.objective_value}")
-                    if save_stages: self.__save_solution(solution_file + '_stage1')
-                    driver_miles = self.__calc_driver_miles()
-                    log.info(f"Total Number of trip miles by each driver after stage 1: {driver_miles}")
-                else:
-                    log.info("Stage 1 Infeasible with Early Day constraints")
-                if not first_solve or first_solve.solve_status == JobSolveStatus.INFEASIBLE_SOLUTION:
-                    self.mdl.remove_progress_listener(progress_listener)
-                    if self.STAGE1_GAP:
-                        progress_listener = GapListener(self.STAGE1_TIME, self.STAGE1_GAP)
-                    else:
-                        progress_listener = TimeListener(self.STAGE1_TIME)
-                    self.mdl.add_progress_listener(progress_listener)
-                    log.info("Relaxing Early Day Constraints")
-                    self.mdl.remove_constraints(self.early_day_constraints)
-                    removed_early_day_constraints = True
-                    first_solve = self.mdl.solve()
-                    if first_solve and (
-                            first_solve.solve_status == JobSolveStatus.FEASIBLE_SOLUTION or first_solve.solve_status == JobSolveStatus.OPTIMAL_SOLUTION):
-                        log.info(f"First solve status (No Early Day constraints): {self.mdl.get_solve_status()}")
-                        log.info(f"First solve obj value (No Early Day constraints): {self.mdl.objective_value}")
-                        if save_stages: self.__save_solution(solution_file + '_stage1_no_ed')
-                        driver_miles = self.__calc_driver_miles()
-                        log.info(f"Total Number of trip miles by each driver after stage 1:  {driver_miles}")
-                    else:
-                        log.info("Stage 1 infeasible without early day constraints")
-                log.info("Relaxing single rider requirements constraints")
-                self.mdl.remove_constraints(self.single_rider_constraints)
-                removed_single_rider_constraints = True
-                log.info("Warm starting from single rider constrained solution")
-                if first_solve:
-                    self.mdl.add_mip_start(first_solve)
-                self.mdl.remove_progress_listener(progress_listener)
-
-                if self.STAGE2_GAP:
-                    progress_listener = GapListener(self.STAGE2_TIME, self.STAGE2_GAP)
-                else:
-                    progress_listener = TimeListener(self.STAGE2_TIME)
-
-                self.mdl.add_progress_listener(progress_listener)
-                self.mdl.solve()
-                log.info("Final solve status: {self.mdl.get_solve_status()}")
-                log.info(f"Final Obj value: {self.mdl.objective_value}")
-                log.info(f"Min Revenue: {self.rev_min.solution_value}")
-                log.info(f"Max Revenue: {self.rev_max.solution_value}")
-                log.info(f"Min W Trips: {self.min_wheelchair_trips.solution_value}")
-                log.info(f"Max W Trips: {self.max_wheelchair_trips.solution_value}")
-            except DOcplexException as e:
-                log.info(f"{i}th solution did not work...trying again", exc_info=True)
-                continue
-            finally:
-                self.__save_solution(solution_file)
-                driver_miles = self.__calc_driver_miles()
-                log.info(f"Total Number of trip miles by each driver: {driver_miles}")
-                break
-        if self.solution_df is None:
+        if self.WARM_START:
+            self.__add_heuristic_warm_start()
+        solution = self.staged_solver.run(self.stages)
+        if solution is None:
             raise SolutionNotFoundException(
                 f"General Optimizer failed to find solution for {self.mdl.name} after {self.MAX_RETRIES} tries")
-
+        for name, stage_solution in self.staged_solver.solutions.items():
+            log.info(f"Total Number of trip miles by each driver after {name}: "
+                     f"{self.__calc_driver_miles(stage_solution)}")
+            if save_stages:
+                self.__save_solution(stage_solution, suffixed_path(solution_file, '_' + name))
+
+        log.info(f"Final solve status: {solution.solve_status}")
+        log.info(f"Final Obj value: {solution.objective_value}")
+        self.objective_value = solution.objective_value
+        log.info(f"Min Revenue: {solution.get_value(self.rev_min)}")
+        log.info(f"Max Revenue: {solution.get_value(self.rev_max)}")
+        log.info(f"Min W Trips: {solution.get_value(self.min_wheelchair_trips)}")
+        log.info(f"Max W Trips: {solution.get_value(self.max_wheelchair_trips)}")
+        self.__save_solution(solution, solution_file)
+        log.info(f"Total Number of trip miles by each driver: {self.__calc_driver_miles(solution)}")
         return self.solution_df
 
-    def __calc_driver_miles(self) -> Dict[Driver, float]:
+    def __calc_driver_miles(self, solution: SolveSolution) -> Dict[Driver, float]:
         """
         Calculate the number of miles traveled by each driver
+        :param solution: Solution of the model
         :return: Mapping between driver and miles assigned to driver by solution
         """
         driverMiles = dict()
         for d, driver_trips in self.trip_vars.items():
             driverMiles[d] = 0
             for t, var in driver_trips.items():
-                if self.trip_vars[d][t].solution_value >= 0.1:
+                if solution.get_value(self.trip_vars[d][t]) >= 0.1:
                     driverMiles[d] += t.lp.miles
         return driverMiles
 
-    def __save_solution(self, solution_file: str) -> None:
+    def __save_solution(self, solution: SolveSolution, solution_file: str) -> None:
         """
-        Write solution in CSV format to the
+        Write solution to the solution file in the storage format given by its extension
+        :param solution: Solution of the model
         :param solution_file: Path to where solution will be saved
         """
 
         def assigned_trip_generator():
             for d, driver_trips in self.trip_vars.items():
                 for t, var in driver_trips.items():
-                    if t.lp.o not in self.request_starts or var.solution_value != 1:
+                    if t.lp.o not in self.request_starts or solution.get_value(var) < 0.5:
                         continue
                     yield (d, t)
 
         def debug_trip_generator(d):
             for t, var in self.trip_vars[d].items():
-                if var.solution_value != 1:
+                if solution.get_value(var) < 0.5:
                     continue
                 yield (d, t)
 
         for dr in self.drivers:
-            for d, t in sorted(debug_trip_generator(dr), key=lambda x: self.time_vars[x[0]][x[1]].solution_value):
-                log.debug(f"{d.name}, {t.lp.o}, {t.lp.d}, {self.time_vars[d][t].solution_value}, {t.lp.time}")
+            for d, t in sorted(debug_trip_generator(dr), key=lambda x: solution.get_value(self.time_vars[x[0]][x[1]])):
+                log.debug(f"{d.name}, {t.lp.o}, {t.lp.d}, {solution.get_value(self.time_vars[d][t])}, {t.lp.time}")
 
-        columns = ['trip_id', 'driver_id', 'driver_name', 'trip_date', 'trip_pickup_address', 'trip_pickup_time',
-                   'est_pickup_time', 'trip_dropoff_address', 'trip_dropoff_time', 'est_dropoff_time', 'trip_los',
-                   'est_miles', 'est_time', 'trip_rev']
         data = []
-        for d, t in sorted(assigned_trip_generator(), key=lambda x: self.time_vars[x[0]][x[1]].solution_value):
+        for d, t in sorted(assigned_trip_generator(), key=lambda x: solution.get_value(self.time_vars[x[0]][x[1]])):
             end_time = -1
             rE = self.request_map[t.lp.o]
-            for intrip in self.filter_driver_feasible_trips(d, self.intrips[rE]):
-                if self.trip_vars[d][intrip].solution_value == 1:
-                    end_time = self.time_vars[d][intrip].solution_value + intrip.lp.time
-                    if end_time < self.time_vars[d][t].solution_value + t.lp.time:
-                        log.critical(f"Entering time (end_time) into request end ({rE}) earlier than departure time ({self.time_vars[d][t].solution_value}) from request start ({t.lp.o}) with a mininum travel time of {t.lp.time}")
-                        incoming_trips_to_request_end = sum(self.trip_vars[d][intrip].solution_value for intrip in self.filter_driver_feasible_trips(d, self.intrips[rE]))
+            for intrip in self.driver_intrips(d, rE):
+                if solution.get_value(self.trip_vars[d][intrip]) > 0.5:
+                    end_time = solution.get_value(self.time_vars[d][intrip]) + intrip.lp.time
+                    if end_time < solution.get_value(self.time_vars[d][t]) + t.lp.time:
+                        log.critical(f"Entering time (end_time) into request end ({rE}) earlier than departure time ({solution.get_value(self.time_vars[d][t])}) from request start ({t.lp.o}) with a mininum travel time of {t.lp.time}")
+                        incoming_trips_to_request_end = sum(solution.get_value(self.trip_vars[d][intrip]) for intrip in self.driver_intrips(d, rE))
                         log.critical(f"Total Incoming Trips to request end {incoming_trips_to_request_end}")
-                        log.critical(f"Outgoing trip from request start {t}, trip_id: {t.id} , start_time: {self.time_vars[d][t].solution_value}, travel time: {t.lp.time}")
-                        log.critical(f"Incoming trip to request end {intrip}, trip_id: {intrip.id} , start_time: {self.time_vars[d][intrip].solution_value}, travel time: {intrip.lp.time}")
+                        log.critical(f"Outgoing trip from request start {t}, trip_id: {t.id} , start_time: {solution.get_value(self.time_vars[d][t])}, travel time: {t.lp.time}")
+                        log.critical(f"Incoming trip to request end {intrip}, trip_id: {intrip.id} , start_time: {solution.get_value(self.time_vars[d][intrip])}, travel time: {intrip.lp.time}")
                     break
             if end_time < 0:
                 log.critical(f"No end time found for trip starting from {t.lp.o} and ending at {rE}")
@@ -676,8 +880,9 @@ class GeneralOptimizer(BaseOptimizer):
             ptrip = self.all_trips[self.location_to_primary_trip_id_map[t.lp.o]]
             data.append(
                 [self.location_to_primary_trip_id_map[t.lp.o], d.id, d.name, self.date, t.lp.o.get_clean_address(),
-                 t.scheduled_pickup, self.time_vars[d][t].solution_value, rE.get_clean_address(), required_end,
+                 t.scheduled_pickup, solution.get_value(self.time_vars[d][t]), rE.get_clean_address(), required_end,
                  end_time,
-                 t.required_level_of_service, ptrip.lp.miles, ptrip.lp.time, self.revenues[t.lp.o]])
-        self.solution_df = pd.DataFrame(data, columns=columns)
-        self.solution_df.to_csv(solution_file)
+                 t.required_level_of_service, ptrip.lp.miles, ptrip.lp.time, self.revenues[t.lp.o], *t.lp.o.coord,
+                 *rE.coord, *self.driver_start_nodes[d].coord])
+        self.solution_df = pd.DataFrame(data, columns=SOLUTION_COLUMNS)
+        save_df(self.solution_df, solution_file, SOLUTION_SCHEMA)
@@ -0,0 +1,111 @@
+import logging
+import time
+from typing import List, Dict, Any
+
+import pandas as pd
+from pandas import DataFrame
+
+from avicena.models.Driver import Driver
+from avicena.models.Trip import Trip
+from avicena.optimizers.BaseOptimizer import BaseOptimizer, SOLUTION_COLUMNS
+from avicena.optimizers.solver_util.heuristic.Insertion import construct_solution
+from avicena.optimizers.solver_util.heuristic.LocalSearch import local_search
+from avicena.optimizers.solver_util.heuristic.RoutingProblem import RoutingProblem
+from avicena.optimizers.solver_util.heuristic.Solution import Solution
+from avicena.util.Exceptions import SolutionNotFoundException
+from avicena.util.DataFrameStorage import SOLUTION_SCHEMA, save_df
+
+log = logging.getLogger(__name__)
+
+
+class HeuristicOptimizer(BaseOptimizer):
+    """
+    The HeuristicOptimizer solves the Patient Dispatch problem without CPLEX.
+    It builds routes with a time window aware cheapest insertion heuristic and improves them with relocate, exchange,
+    and 2-opt* local search moves. It minimizes the same objective as the GeneralOptimizer: travel time plus the route
+    length, merge trip, revenue fairness, and wheelchair trip fairness penalties.
+    """
+
+    def __init__(self, trips: List[Trip], drivers: List[Driver], name: str, date: str, speed: int,
+                 config: Dict[str, Any]) -> None:
+        """
+        Initialize a Heuristic Optimizer
+        :param trips: List of valid Trip objects that were parsed and cleaned from the input file
+        :param drivers: List of drivers selected to be dispatched for this model
+        :param name: Name of the given model
+        :param date: Date for which the model is running
+        :param speed: Assumed travelling speed
+        :param config: Configuration Details for this optimizer type and its parameters
+        """
+        super().__init__(trips, drivers, name, date, speed, config)
+        self.TIME_LIMIT = config.get("heuristic_time_limit", 10)
+        self.problem = self.build_problem(trips, drivers, speed, config)
+        self.solution = None
+        self.solution_df = None
+
+    def solve(self, solution_file: str) -> DataFrame:
+        """
+        Solve the model
+        :param solution_file: path to save solution details
+        :return: DataFrame with the solution details
+        """
+        solution = self.construct()
+        if len(solution.unassigned) == self.problem.n and self.problem.n:
+            raise SolutionNotFoundException(f"Heuristic Optimizer failed to assign any trips for {self.mdl.name}")
+        self.solution = self.improve(solution, time.monotonic() + self.TIME_LIMIT)
+        self.objective_value = self.solution.objective()
+        log.info(f"Final Obj value: {self.objective_value}")
+        if self.solution.unassigned:
+            log.warning("Trips with the following IDs could not be feasibly assigned: "
+                        f"{[self.problem.trips[r].id for r in sorted(self.solution.unassigned)]}")
+        self.__save_solution(self.solution, solution_file)
+        return self.solution_df
+
+    def build_problem(self, trips: List[Trip], drivers: List[Driver], speed: int,
+                      config: Dict[str, Any]) -> RoutingProblem:
+        """
+        Build the problem solved by the optimizer
+        :param trips: List of valid Trip objects that were parsed and cleaned from the input file
+        :param drivers: List of drivers selected to be dispatched for this model
+        :param speed: Assumed travelling speed
+        :param config: Configuration Details for this optimizer type and its parameters
+        :return: RoutingProblem for the trips and drivers
+        """
+        return RoutingProblem(trips, drivers, speed, config)
+
+    def construct(self) -> Solution:
+        """
+        Build the initial solution
+        :return: Solution built by the construction heuristic
+        """
+        return construct_solution(self.problem)
+
+    def improve(self, solution: Solution, deadline: float) -> Solution:
+        """
+        Improve the constructed solution
+        :param solution: Solution built by the construction heuristic
+        :param deadline: Monotonic clock time after which the improvement stops
+        :return: Improved Solution
+        """
+        return local_search(solution, deadline)
+
+    def __save_solution(self, solution: Solution, solution_file: str) -> None:
+        """
+        Write solution to the solution file in the storage format given by its extension, ordered by estimated pickup
+        time
+        :param solution: Solution to save
+        :param solution_file: Path to where solution will be saved
+        """
+        p = self.problem
+        data = []
+        for route in solution.routes:
+            d = p.drivers[route.driver]
+            for r in route.requests():
+                trip = p.trips[r]
+                data.append([trip.id, d.id, d.name, self.date, trip.lp.o.get_clean_address(), trip.scheduled_pickup,
+                             solution.node_time[r], trip.lp.d.get_clean_address(), trip.scheduled_dropoff,
+                             solution.node_time[r + p.n], trip.required_level_of_service, trip.lp.miles, trip.lp.time,
+                             trip.rev, *trip.lp.o.coord, *trip.lp.d.coord, *p.depots[route.driver].coord])
+        self.solution_df = pd.DataFrame(data, columns=SOLUTION_COLUMNS).sort_values('est_pickup_time').reset_index(
+            drop=True)
+        save_df(self.solution_df, solution_file, SOLUTION_SCHEMA)
@@ -0,0 +1,88 @@
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any
+
+from pandas import DataFrame
+
+from avicena.models.Driver import Driver
+from avicena.models.Trip import Trip
+from avicena.optimizers.BaseOptimizer import BaseOptimizer
+from avicena.optimizers.solver_util.ParallelSolve import WORKER_OPTIMIZERS, solve_in_worker
+from avicena.util.Exceptions import InvalidConfigException, SolutionNotFoundException
+from avicena.util.DataFrameStorage import SOLUTION_SCHEMA, save_df
+
+log = logging.getLogger(__name__)
+
+
+class MultiStartOptimizer(BaseOptimizer):
+    """
+    The MultiStartOptimizer runs several independent solves of another optimizer at the same time, each in its own
+    worker process with its own model, seed, and time budget, and keeps the best solution. Solutions that assign more
+    trips are preferred, and then solutions with a lower objective value. Every run uses the seed from the
+    configuration plus its index and can override parameters of the configuration with one of the parameter profiles.
+    """
+
+    def __init__(self, trips: List[Trip], drivers: List[Driver], name: str, date: str, speed: int,
+                 config: Dict[str, Any]) -> None:
+        """
+        Initialize a Multi Start Optimizer
+        :param trips: List of valid Trip objects that were parsed and cleaned from the input file
+        :param drivers: List of drivers selected to be dispatched for this model
+        :param name: Name of the given model
+        :param date: Date for which the model is running
+        :param speed: Assumed travelling speed
+        :param config: Configuration Details for this optimizer type and its parameters
+        """
+        super().__init__(trips, drivers, name, date, speed, config)
+        self.OPTIMIZER = config.get("multi_start_optimizer", "GeneralOptimizer")
+        if self.OPTIMIZER not in WORKER_OPTIMIZERS:
+            raise InvalidConfigException(f"Unknown multi_start_optimizer {self.OPTIMIZER}. Expected one of "
+                                         f"{list(WORKER_OPTIMIZERS)}")
+        self.RUNS = config.get("multi_start_runs", 4)
+        self.WORKERS = min(self.RUNS, config.get("multi_start_workers") or os.cpu_count())
+        self.PROFILES = config.get("multi_start_profiles") or [dict()]
+        self.config = config
+        self.name = name
+        self.solution_df = None
+        self.run_stats = []  # Seed, profile, objective value, number of assigned trips and solve time of every run
+
+    def solve(self, solution_file: str) -> DataFrame:
+        """
+        Solve the model
+        :param solution_file: path to save solution details
+        :return: DataFrame with the solution details
+        """
+        # Split the cores between the runs instead of letting every CPLEX instance use all of them
+        threads = max(1, (os.cpu_count() or 1) // self.WORKERS)
+        configs = [dict(self.config, **self.PROFILES[i % len(self.PROFILES)], seed=self.config['seed'] + i,
+                        cplex_threads=threads) for i in range(self.RUNS)]
+        log.info(f"Starting {self.RUNS} runs of {self.OPTIMIZER} with {self.WORKERS} workers")
+        with tempfile.TemporaryDirectory() as directory, ProcessPoolExecutor(self.WORKERS) as executor:
+            futures = [executor.submit(solve_in_worker, self.OPTIMIZER, self.trips_inp, self.drivers_inp,
+                                       f"{self.name}_{i}", self.date, self.SPEED, config,
+                                       os.path.join(directory, f"solution_{i}.csv"))
+                       for i, config in enumerate(configs)]
+            results = [future.result() for future in futures]
+
+        best = None
+        for i, result in enumerate(results):
+            assigned = len(result.solution_df) if result.solution_df is not None else 0
+            self.run_stats.append({'seed': configs[i]['seed'], 'profile': i % len(self.PROFILES),
+                                   'objective_value': result.objective_value, 'assigned_trips': assigned,
+                                   'solve_time': result.solve_time})
+            log.info(f"Run {i} with seed {configs[i]['seed']} and profile {i % len(self.PROFILES)}: objective "
+                     f"{result.objective_value}, {assigned} assigned trips, {result.solve_time:.1f} seconds")
+            if result.solution_df is None or result.objective_value is None:
+                continue
+            if best is None or (-assigned, result.objective_value) < (-len(best.solution_df), best.objective_value):
+                best = result
+        if best is None:
+            raise SolutionNotFoundException(f"Multi Start Optimizer failed to find solution for {self.name} in "
+                                            f"{self.RUNS} runs")
+        log.info(f"Best run {best.name} with objective {best.objective_value}")
+        self.objective_value = best.objective_value
+        self.solution_df = best.solution_df
+        save_df(self.solution_df, solution_file, SOLUTION_SCHEMA)
+        return self.solution_df
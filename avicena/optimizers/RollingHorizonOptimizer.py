@@ -0,0 +1,92 @@
+import logging
+from typing import List, Dict, Any
+
+import pandas as pd
+from pandas import DataFrame
+
+from avicena.models.Driver import Driver
+from avicena.models.Trip import Trip
+from avicena.optimizers.ALNSOptimizer import ALNSOptimizer
+from avicena.optimizers.BaseOptimizer import SOLUTION_COLUMNS
+from avicena.optimizers.solver_util.heuristic.Insertion import greedy_insertion
+from avicena.optimizers.solver_util.heuristic.RoutingProblem import RoutingProblem
+from avicena.optimizers.solver_util.heuristic.Solution import Solution, load_solution
+from avicena.util.DataFrameStorage import SOLUTION_SCHEMA, save_df
+
+log = logging.getLogger(__name__)
+
+
+class RollingHorizonOptimizer(ALNSOptimizer):
+    """
+    The RollingHorizonOptimizer re-optimizes the rest of a day that is already under way after the trips or drivers
+    changed, such as a cancelled trip, an added leg, or a driver calling out. It takes the solution from the previous run
+    and the current time. Trips whose estimated pickup is not after the current time have been executed and are kept
+    as they are. Every driver continues from the dropoff of their last executed trip. The remaining trips of the previous
+    solution keep their drivers and order as a warm start, and the trips that were added, changed, or served by drivers
+    who are no longer dispatched are inserted into it. The result is then improved with the ALNSOptimizer's search for a
+    few seconds.
+    The trips and drivers given to the optimizer are the current ones for the whole day, so trips of the previous
+    solution that are missing were cancelled.
+    """
+
+    def __init__(self, trips: List[Trip], drivers: List[Driver], name: str, date: str, speed: int,
+                 config: Dict[str, Any], previous_solution: DataFrame, current_time: float) -> None:
+        """
+        Initialize a Rolling Horizon Optimizer
+        :param trips: List of valid Trip objects that were parsed and cleaned from the input file
+        :param drivers: List of drivers selected to be dispatched for this model
+        :param name: Name of the given model
+        :param date: Date for which the model is running
+        :param speed: Assumed travelling speed
+        :param config: Configuration Details for this optimizer type and its parameters
+        :param previous_solution: DataFrame with the solution details of the previous run
+        :param current_time: Current time of the day as a fraction of the day
+        """
+        self.previous_solution = previous_solution.reindex(columns=SOLUTION_COLUMNS)
+        self.current_time = current_time
+        self.executed = self.previous_solution[self.previous_solution['est_pickup_time'] <= current_time]
+        executed_ids = set(self.executed['trip_id'])
+        remaining = [trip for trip in trips if trip.id not in executed_ids]
+        log.info(f"{len(self.executed)} trips were executed, re-optimizing {len(remaining)} remaining trips")
+        super().__init__(remaining, drivers, name, date, speed, config)
+        self.TIME_LIMIT = config.get("reoptimization_time", 5)
+
+    def build_problem(self, trips: List[Trip], drivers: List[Driver], speed: int,
+                      config: Dict[str, Any]) -> RoutingProblem:
+        """
+        Build the problem for the remaining trips, starting every driver after their executed trips
+        :param trips: List of the remaining trips
+        :param drivers: List of drivers selected to be dispatched for this model
+        :param speed: Assumed travelling speed
+        :param config: Configuration Details for this optimizer type and its parameters
+        :return: RoutingProblem for the remaining trips and drivers
+        """
+        return RoutingProblem(trips, drivers, speed, config, self.executed, self.current_time)
+
+    def construct(self) -> Solution:
+        """
+        Load the remaining routes of the previous solution and insert the trips they do not serve
+        :return: Warm started Solution
+        """
+        p = self.problem
+        solution = load_solution(p, self.previous_solution)
+        if solution.unassigned and p.earliest_start != p.available:
+            # The previous solution may have relaxed the early day requirements
+            p.relax_early_day()
+            solution = load_solution(p, self.previous_solution)
+        log.info(f"Kept previous routes with objective {solution.objective()} and {len(solution.unassigned)} trips "
+                 "to insert")
+        greedy_insertion(solution, list(solution.unassigned))
+        return solution
+
+    def solve(self, solution_file: str) -> DataFrame:
+        """
+        Solve the model
+        :param solution_file: path to save solution details
+        :return: DataFrame with the solution details, including the executed trips
+        """
+        super().solve(solution_file)
+        self.solution_df = pd.concat([self.executed, self.solution_df]).sort_values(
+            'est_pickup_time').reset_index(drop=True)
+        save_df(self.solution_df, solution_file, SOLUTION_SCHEMA)
+        return self.solution_df
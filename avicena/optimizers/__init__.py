@@ -1 +1,6 @@
 from .GeneralOptimizer import GeneralOptimizer
+from .HeuristicOptimizer import HeuristicOptimizer
+from .ALNSOptimizer import ALNSOptimizer
+from .DecompositionOptimizer import DecompositionOptimizer
+from .MultiStartOptimizer import MultiStartOptimizer
+from .RollingHorizonOptimizer import RollingHorizonOptimizer
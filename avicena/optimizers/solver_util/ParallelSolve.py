@@ -0,0 +1,61 @@
+import logging
+import time
+from typing import List, Dict, Any, Optional
+
+from pandas import DataFrame
+
+from avicena.models.Driver import Driver
+from avicena.models.Trip import Trip
+from avicena.optimizers.ALNSOptimizer import ALNSOptimizer
+from avicena.optimizers.GeneralOptimizer import GeneralOptimizer
+from avicena.optimizers.HeuristicOptimizer import HeuristicOptimizer
+
+log = logging.getLogger(__name__)
+
+# Optimizers that can be run in worker processes
+WORKER_OPTIMIZERS = {'GeneralOptimizer': GeneralOptimizer, 'HeuristicOptimizer': HeuristicOptimizer,
+                     'ALNSOptimizer': ALNSOptimizer}
+
+
+class WorkerResult:
+    """
+    Outcome of solving a model in a worker process
+    """
+
+    def __init__(self, name: str, solution_df: Optional[DataFrame], objective_value: Optional[float],
+                 solve_time: float) -> None:
+        """
+        :param name: Name of the model
+        :param solution_df: DataFrame with the solution details or None if the model could not be solved
+        :param objective_value: Objective value of the solution or None if the model could not be solved
+        :param solve_time: Time in seconds spent building and solving the model
+        """
+        self.name = name
+        self.solution_df = solution_df
+        self.objective_value = objective_value
+        self.solve_time = solve_time
+
+
+def solve_in_worker(optimizer_name: str, trips: List[Trip], drivers: List[Driver], name: str, date: str, speed: int,
+                    config: Dict[str, Any], solution_file: str) -> WorkerResult:
+    """
+    Build and solve a model with its own optimizer, meant to be run in a worker process of a ProcessPoolExecutor.
+    Failures are logged and reported in the result instead of being raised.
+    :param optimizer_name: Name of the optimizer in WORKER_OPTIMIZERS
+    :param trips: List of valid Trip objects of the model
+    :param drivers: List of drivers of the model
+    :param name: Name of the model
+    :param date: Date for which the model is running
+    :param speed: Assumed travelling speed
+    :param config: Configuration Details for the optimizer
+    :param solution_file: path to save the solution details
+    :return: WorkerResult with the solution
+    """
+    start = time.monotonic()
+    try:
+        optimizer = WORKER_OPTIMIZERS[optimizer_name](trips, drivers, name, date, speed, config)
+        solution_df = optimizer.solve(solution_file)
+        return WorkerResult(name, solution_df, optimizer.objective_value, time.monotonic() - start)
+    except Exception:
+        log.warning(f"Failed to solve model {name}", exc_info=True)
+        return WorkerResult(name, None, None, time.monotonic() - start)
@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+import pickle
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+from docplex.mp.dvar import Var
+from docplex.mp.model import Model
+from docplex.mp.model_reader import ModelReader
+
+from avicena.models.Driver import Driver
+from avicena.models.Trip import Trip
+from avicena.util.Exceptions import InvalidConfigException
+
+log = logging.getLogger(__name__)
+
+MODEL_CACHE_VERSION = 2  # Increase whenever the formulation changes so that previously cached models are not reused
+MODEL_FORMATS = {'sav': Model.export_as_sav, 'lp': Model.export_as_lp}
+LP_UNSAFE_CHARACTERS = re.compile(r'[^A-Za-z0-9_]')
+
+
+def fingerprint(trips: List[Trip], drivers: List[Driver], speed: int, parameters: Dict[str, Any]) -> str:
+    """
+    Compute a fingerprint of everything a model is built from
+    :param trips: List of valid Trip objects the model is built for
+    :param drivers: List of drivers the model is built for
+    :param speed: Assumed travelling speed
+    :param parameters: Configuration Details that are used while building the model
+    :return: Hexadecimal fingerprint
+    """
+    digest = hashlib.sha256(repr((MODEL_CACHE_VERSION, speed, sorted(parameters.items()))).encode())
+    for t in trips:
+        digest.update(repr((t.id, t.lp.o.get_clean_address(), t.lp.o.coord, t.lp.d.get_clean_address(), t.lp.d.coord,
+                            t.scheduled_pickup, t.scheduled_dropoff, t.space, t.required_level_of_service, t.rev,
+                            t.is_merge)).encode())
+    for d in drivers:
+        digest.update(repr((d.id, d.address, d.level_of_service, d.early_day_flag)).encode())
+    return digest.hexdigest()
+
+
+def lp_safe_name(name: str) -> str:
+    """
+    :param name: Name of a variable or constraint
+    :return: The name with every character that LP files do not allow in names replaced by an underscore, so that the
+             name is kept when the model is exported in LP format and read again
+    """
+    return LP_UNSAFE_CHARACTERS.sub('_', name)
+
+
+def _variable_keys(variables: Any, model_format: str) -> Any:
+    """
+    :param variables: Variable or (nested) dictionary of variables
+    :param model_format: Format of the exported model file
+    :return: The same structure with every variable replaced by its key in the exported model file. SAV files keep the
+             columns of the model in order, so variables are identified by their index. LP files keep the names of the
+             variables but not their order, so variables are identified by their name.
+    """
+    if isinstance(variables, Var):
+        return variables.index if model_format == 'sav' else variables.lp_name
+    return {key: _variable_keys(value, model_format) for key, value in variables.items()}
+
+
+def _find_variables(mdl: Model, keys: Any) -> Any:
+    """
+    :param mdl: Model loaded from a file
+    :param keys: Key of a variable or (nested) dictionary of keys in the file as produced by _variable_keys
+    :return: The same structure with every key replaced by the variable of the model
+    """
+    if isinstance(keys, dict):
+        return {key: _find_variables(mdl, value) for key, value in keys.items()}
+    if isinstance(keys, int):
+        var = mdl.get_var_by_index(keys) if keys < mdl.number_of_variables else None
+    else:
+        var = mdl.get_var_by_name(keys)
+    if var is None:
+        raise KeyError(f"Variable {keys} not found in cached model")
+    return var
+
+
+def _check_variables(variables: Any, loaded: Any) -> None:
+    """
+    Check that every variable of a model was found with the same type and bounds in the model read from its file
+    :param variables: Variable or (nested) dictionary of variables of the built model
+    :param loaded: The same structure with the variables found in the model read from the file
+    """
+    if isinstance(variables, Var):
+        if variables.vartype.cplex_typecode != loaded.vartype.cplex_typecode or variables.lb != loaded.lb or \
+                variables.ub != loaded.ub:
+            raise KeyError(f"Variable {variables.lp_name} does not match {loaded.lp_name} in cached model")
+        return
+    for key, value in variables.items():
+        _check_variables(value, loaded[key])
+
+
+class ModelCache:
+    """
+    This class stores built models on disk so that runs with the same inputs can skip building the model.
+    Every model is exported in LP or SAV format next to a pickled map from the keys the optimizer uses for its variables
+    to the variables in the file, and both are identified by the fingerprint of the model's inputs. Variables are found
+    by their index in SAV files and by their name in LP files, so models saved in LP format need LP safe names.
+    """
+
+    def __init__(self, directory: str, model_format: str = 'sav') -> None:
+        """
+        Initialize a Model Cache
+        :param directory: Directory where the models are stored
+        :param model_format: Format of the model files, 'sav' or 'lp'
+        """
+        if model_format not in MODEL_FORMATS:
+            raise InvalidConfigException(f"Unknown model_cache_format {model_format}. Expected one of "
+                                         f"{list(MODEL_FORMATS)}")
+        self.directory = directory
+        self.model_format = model_format
+        os.makedirs(directory, exist_ok=True)
+
+    def __paths(self, key: str) -> Tuple[str, str]:
+        """
+        :param key: Fingerprint of the model
+        :return: Paths of the model file and the variable map file
+        """
+        base = os.path.join(self.directory, key)
+        return f"{base}.{self.model_format}", f"{base}_variables.pkl"
+
+    def load(self, key: str, name: str) -> Optional[Tuple[Model, Dict[str, Any]]]:
+        """
+        Load a cached model
+        :param key: Fingerprint of the model
+        :param name: Name of the loaded model
+        :return: Loaded model and the map from variable keys to its variables or None if the model is not cached
+        """
+        model_file, variables_file = self.__paths(key)
+        if not os.path.exists(model_file) or not os.path.exists(variables_file):
+            return None
+        try:
+            mdl = ModelReader.read(model_file, model_name=name)
+            with open(variables_file, 'rb') as f:
+                variables = _find_variables(mdl, pickle.load(f))
+        except Exception:
+            log.warning(f"Failed to load cached model {model_file}", exc_info=True)
+            return None
+        log.info(f"Loaded cached model {model_file} with {mdl.number_of_variables} variables and "
+                 f"{mdl.number_of_constraints} constraints")
+        return mdl, variables
+
+    def save(self, key: str, mdl: Model, variables: Dict[str, Any]) -> None:
+        """
+        Export a built model to the cache. The exported model is read back once to check that all of its variables are
+        found again. Files are written under a temporary name first so that optimizers running in parallel never read a
+        partially written model.
+        :param key: Fingerprint of the model
+        :param mdl: Built model
+        :param variables: (Nested) dictionary from the keys of the variables to the variables of the model
+        """
+        model_file, variables_file = self.__paths(key)
+        suffix = f".{os.getpid()}.tmp"
+        # CPLEX reads the format of a model file from its extension, so it must be kept for the temporary file
+        temporary_model_file = f"{model_file[:-len(self.model_format) - 1]}{suffix}.{self.model_format}"
+        keys = _variable_keys(variables, self.model_format)
+        try:
+            MODEL_FORMATS[self.model_format](mdl, temporary_model_file)
+            # Read the model back once so that a model whose variables cannot be found again is never cached
+            _check_variables(variables, _find_variables(ModelReader.read(temporary_model_file), keys))
+            with open(variables_file + suffix, 'wb') as f:
+                pickle.dump(keys, f)
+        except Exception:
+            log.warning(f"Failed to save model to cache {model_file}", exc_info=True)
+            for path in (temporary_model_file, variables_file + suffix):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        os.replace(temporary_model_file, model_file)
+        os.replace(variables_file + suffix, variables_file)
+        log.info(f"Saved model to cache {model_file}")
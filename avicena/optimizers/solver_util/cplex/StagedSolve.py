@@ -0,0 +1,151 @@
+import logging
+from typing import List, Iterable, Optional, Dict
+
+from docplex.mp.constants import WriteLevel
+from docplex.mp.dvar import Var
+from docplex.mp.model import Model
+from docplex.mp.solution import SolveSolution
+from docplex.mp.utils import DOcplexException
+
+from avicena.optimizers.solver_util.cplex.Listeners import GapListener, TimeListener
+
+log = logging.getLogger(__name__)
+
+
+class ConstraintGroup:
+    """
+    A group of constraints that can be relaxed and enforced again without changing the structure of the model.
+    Every constraint of the group must include the group's relaxation variable on the side that it relaxes, e.g.
+    "lhs + relaxation >= rhs". The variable is fixed to 0 while the group is enforced, and relaxing the group raises its
+    upper bound far enough that none of the constraints bind.
+    """
+
+    def __init__(self, mdl: Model, name: str, relaxed_bound: float, relaxation: Optional[Var] = None) -> None:
+        """
+        Initialize a Constraint Group
+        :param mdl: Model the constraints belong to
+        :param name: Name of the group
+        :param relaxed_bound: Upper bound of the relaxation variable that makes every constraint of the group redundant
+        :param relaxation: (optional) Existing relaxation variable of the group, e.g. in a model loaded from a file
+        """
+        self.name = name
+        self.relaxed_bound = relaxed_bound
+        self.relaxation = relaxation if relaxation is not None else \
+            mdl.continuous_var(lb=0, ub=0, name="relax_" + name)
+
+    def relax(self) -> None:
+        """
+        Stop enforcing the constraints of the group
+        """
+        self.relaxation.ub = self.relaxed_bound
+
+    def enforce(self) -> None:
+        """
+        Enforce the constraints of the group
+        """
+        self.relaxation.ub = 0
+
+
+class Stage:
+    """
+    A single solve of the model with some of the constraint groups relaxed
+    """
+
+    def __init__(self, name: str, time_limit: float, gap: Optional[float] = None,
+                 relax: Iterable[ConstraintGroup] = (), fallback: Optional['Stage'] = None) -> None:
+        """
+        Initialize a Stage
+        :param name: Name of the stage
+        :param time_limit: Time in seconds after which the solve is stopped
+        :param gap: (optional) Target MIP Gap at which the solve is stopped
+        :param relax: Constraint groups relaxed from this stage onwards, in addition to those relaxed by earlier stages
+        :param fallback: (optional) Stage to run instead if this stage finds no solution
+        """
+        self.name = name
+        self.time_limit = time_limit
+        self.gap = gap
+        self.relax = list(relax)
+        self.fallback = fallback
+
+
+class StagedSolver:
+    """
+    This class solves a single built model in a sequence of stages. Before every stage the constraint groups are
+    relaxed or enforced by changing the bounds of their relaxation variables, and the incumbent of the previous stage is
+    given to CPLEX as the only MIP start, so the model is never rebuilt and every stage starts from the same state no
+    matter what happened before. Relaxed groups stay relaxed in later stages, so every incumbent remains feasible.
+    A stage that fails with a CPLEX error is retried after restoring the relaxed groups and incumbent it started with.
+    """
+
+    def __init__(self, mdl: Model, groups: List[ConstraintGroup], max_retries: int) -> None:
+        """
+        Initialize a Staged Solver
+        :param mdl: Model to solve
+        :param groups: Constraint groups that can be relaxed by the stages
+        :param max_retries: Number of times to attempt each stage
+        """
+        self.mdl = mdl
+        self.groups = groups
+        self.MAX_RETRIES = max_retries
+        self.relaxed = set()  # Constraint groups relaxed by the stages run so far
+        self.incumbent = None  # Latest solution found
+        self.solutions = dict()  # Map from stage name to the solution found by the stage
+
+    def run(self, stages: List[Stage]) -> Optional[SolveSolution]:
+        """
+        Run the stages in order, running the fallback of any stage that does not find a solution
+        :param stages: Stages to run
+        :return: Solution of the last stage that found one or None if no stage found a solution
+        """
+        self.relaxed, self.incumbent, self.solutions = set(), None, dict()
+        for stage in stages:
+            while stage is not None and not self.__run_with_retries(stage):
+                stage = stage.fallback
+        return self.incumbent
+
+    def __run_with_retries(self, stage: Stage) -> bool:
+        """
+        Run a stage, restoring the state it started with and trying again if CPLEX fails
+        :param stage: Stage to run
+        :return: True if the stage found a solution
+        """
+        relaxed, incumbent = set(self.relaxed), self.incumbent
+        for i in range(self.MAX_RETRIES):
+            self.relaxed, self.incumbent = set(relaxed), incumbent
+            try:
+                return self.__run_stage(stage)
+            except DOcplexException:
+                log.info(f"Attempt {i} of {stage.name} did not work...trying again", exc_info=True)
+        log.warning(f"{stage.name} failed after {self.MAX_RETRIES} attempts")
+        return False
+
+    def __run_stage(self, stage: Stage) -> bool:
+        """
+        Relax and enforce the constraint groups for a stage, warm start it from the incumbent, and solve
+        :param stage: Stage to run
+        :return: True if the stage found a solution
+        """
+        self.relaxed.update(stage.relax)
+        for group in self.groups:
+            if group in self.relaxed:
+                group.relax()
+            else:
+                group.enforce()
+        log.info(f"Solving {stage.name} with relaxed constraint groups {sorted(g.name for g in self.relaxed)}")
+        if self.incumbent is not None:
+            self.mdl.clear_mip_starts()
+            self.mdl.add_mip_start(self.incumbent, write_level=WriteLevel.AllVars)
+        listener = GapListener(stage.time_limit, stage.gap) if stage.gap else TimeListener(stage.time_limit)
+        self.mdl.add_progress_listener(listener)
+        try:
+            solution = self.mdl.solve()
+        finally:
+            self.mdl.remove_progress_listener(listener)
+        if solution is None:
+            log.info(f"{stage.name} found no solution")
+            return False
+        log.info(f"{stage.name} status: {solution.solve_status}")
+        log.info(f"{stage.name} obj value: {solution.objective_value}")
+        self.incumbent = solution
+        self.solutions[stage.name] = solution
+        return True
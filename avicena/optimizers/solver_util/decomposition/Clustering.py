@@ -0,0 +1,126 @@
+import logging
+from math import ceil
+from typing import List, Tuple, Dict
+
+import numpy as np
+
+from avicena.models.Driver import Driver
+from avicena.models.Trip import Trip
+from avicena.util.Geolocator import find_coord_lat_lon
+
+log = logging.getLogger(__name__)
+
+KMEANS_ITERATIONS = 100
+
+
+def patient_groups(trips: List[Trip]) -> List[List[Trip]]:
+    """
+    Group the legs of every patient's trip (A, B, C legs with the same ID prefix), which are linked by precedence and
+    merge requirements and must be solved in the same subproblem
+    :param trips: List of parsed trips
+    :return: List of groups of legs in leg order
+    """
+    groups = dict()
+    for trip in trips:
+        key = trip.id[:-1] if isinstance(trip.id, str) and trip.id[-1] in 'ABC' else trip.id
+        groups.setdefault(key, []).append(trip)
+    return [sorted(group, key=lambda t: t.id) for group in groups.values()]
+
+
+def kmeans(points: np.ndarray, k: int, seed: int) -> np.ndarray:
+    """
+    Cluster points with Lloyd's algorithm from a k-means++ initialization
+    :param points: Array with one row of features per point
+    :param k: Number of clusters
+    :param seed: Seed of the random number generator
+    :return: Array with the cluster index of every point
+    """
+    rng = np.random.RandomState(seed)
+    k = min(k, len(points))
+    centers = [points[rng.randint(len(points))]]
+    for _ in range(1, k):
+        distance = np.min([((points - c) ** 2).sum(axis=1) for c in centers], axis=0)
+        centers.append(points[rng.choice(len(points), p=distance / distance.sum())] if distance.sum() > 0 else
+                       points[rng.randint(len(points))])
+    centers = np.array(centers)
+    labels = np.zeros(len(points), dtype=int)
+    for _ in range(KMEANS_ITERATIONS):
+        distance = ((points[:, np.newaxis, :] - centers[np.newaxis, :, :]) ** 2).sum(axis=2)
+        new_labels = distance.argmin(axis=1)
+        for c in range(k):
+            members = points[new_labels == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+            else:
+                # Restart an empty cluster from the point farthest from its center
+                far = distance[np.arange(len(points)), new_labels].argmax()
+                centers[c] = points[far]
+                new_labels[far] = c
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return labels
+
+
+def split_regions(groups: List[List[Trip]], drivers: List[Driver], num_regions: int, seed: int) -> List[
+        Tuple[List[List[Trip]], List[Driver]]]:
+    """
+    Cluster the patients by the geography of their pickups and dropoffs and split the drivers between the regions in
+    proportion to the number of legs in each region. Drivers are sent to the closest regions that still need drivers,
+    and every region with wheelchair trips gets a wheelchair capable driver when possible.
+    :param groups: Groups of legs of the same patient
+    :param drivers: Drivers available for dispatch
+    :param num_regions: Number of regions, at most the number of drivers
+    :param seed: Seed of the clustering
+    :return: List of the patients and drivers of each region
+    """
+    num_regions = max(1, min(num_regions, len(drivers), len(groups)))
+    coordinates = np.array([np.mean([loc.coord for t in group for loc in (t.lp.o, t.lp.d)], axis=0)
+                            for group in groups])
+    labels = kmeans(coordinates, num_regions, seed)
+    regions = [[group for group, label in zip(groups, labels) if label == c] for c in range(num_regions)]
+    centers = [coordinates[labels == c].mean(axis=0) for c in range(num_regions)]
+
+    legs = np.array([sum(len(group) for group in region) for region in regions])
+    quotas = np.maximum(1, np.floor(legs / legs.sum() * len(drivers))).astype(int)
+    while quotas.sum() > len(drivers):
+        quotas[np.argmax(quotas)] -= 1
+    for c in np.argsort(-(legs / legs.sum() * len(drivers) - quotas))[:len(drivers) - quotas.sum()]:
+        quotas[c] += 1
+
+    needs_wheelchair = [any(t.required_level_of_service == 'W' for group in region for t in group)
+                        for region in regions]
+    region_drivers: Dict[int, List[Driver]] = {c: [] for c in range(num_regions)}
+    for d in sorted(drivers, key=lambda d: 'W' not in d.level_of_service):
+        depot = np.array(find_coord_lat_lon(d.get_clean_address()))
+        open_regions = [c for c in range(num_regions) if len(region_drivers[c]) < quotas[c]]
+        if 'W' in d.level_of_service:
+            lacking = [c for c in open_regions if needs_wheelchair[c] and
+                       not any('W' in other.level_of_service for other in region_drivers[c])]
+            open_regions = lacking or open_regions
+        c = min(open_regions, key=lambda c: ((centers[c] - depot) ** 2).sum())
+        region_drivers[c].append(d)
+    log.info(f"Split trips into regions with {[int(count) for count in legs]} legs and "
+             f"{[len(region_drivers[c]) for c in range(num_regions)]} drivers")
+    return [(regions[c], region_drivers[c]) for c in range(num_regions)]
+
+
+def split_bands(groups: List[List[Trip]], band_size: int) -> List[List[List[Trip]]]:
+    """
+    Split patients into consecutive bands of the day with about the same number of legs
+    :param groups: Groups of legs of the same patient
+    :param band_size: Target number of legs per band
+    :return: List of the patients in each band, ordered by time of day
+    """
+    ordered = sorted(groups, key=lambda group: group[0].scheduled_pickup)
+    num_bands = max(1, ceil(sum(len(group) for group in groups) / band_size))
+    target = sum(len(group) for group in groups) / num_bands
+    bands, band, size = [], [], 0
+    for group in ordered:
+        if band and size + len(group) / 2 > target * (len(bands) + 1) and len(bands) < num_bands - 1:
+            bands.append(band)
+            band = []
+        band.append(group)
+        size += len(group)
+    bands.append(band)
+    return bands
@@ -0,0 +1,308 @@
+import logging
+import math
+import time
+from random import Random
+from typing import List, Callable, Dict, Optional, Tuple
+
+from avicena.optimizers.solver_util.heuristic.Insertion import insertion_groups, group_insertions, greedy_insertion
+from avicena.optimizers.solver_util.heuristic.Listeners import SearchListener, SearchProgress
+from avicena.optimizers.solver_util.heuristic.Route import Route
+from avicena.optimizers.solver_util.heuristic.RoutingProblem import RoutingProblem
+from avicena.optimizers.solver_util.heuristic.Solution import Solution
+
+log = logging.getLogger(__name__)
+
+MIN_REMOVAL = 4  # Fewest requests removed by a destroy operator
+MAX_REMOVAL_FRACTION = 0.2  # Largest fraction of the assigned requests removed by a destroy operator
+MAX_REMOVAL = 60  # Most requests removed by a destroy operator
+REMOVAL_DETERMINISM = 4  # Higher values make the worst and related removals pick their top candidates more often
+SEGMENT_LENGTH = 50  # Iterations between updates of the operator weights
+REACTION_FACTOR = 0.2  # How much the operator weights react to the scores of the last segment
+NEW_BEST_SCORE = 33  # Operator score when a new best solution is found
+IMPROVEMENT_SCORE = 9  # Operator score when the current solution is improved
+ACCEPTED_SCORE = 13  # Operator score when a worse, previously unseen solution is accepted
+START_WORSENING = 0.05  # Relative worsening accepted with probability one half at the start of the search
+END_TEMPERATURE_RATIO = 0.002  # Ratio between the final and the initial temperature
+
+Destroy = Callable[[Solution, int, Random], List[int]]
+Repair = Callable[[Solution, List[int], Random], None]
+
+
+def random_removal(solution: Solution, count: int, rng: Random) -> List[int]:
+    """
+    Select random requests to remove
+    :param solution: Current Solution
+    :param count: Number of requests to select
+    :param rng: Random number generator
+    :return: Selected requests
+    """
+    assigned = _assigned(solution)
+    return rng.sample(assigned, min(count, len(assigned)))
+
+
+def worst_removal(solution: Solution, count: int, rng: Random) -> List[int]:
+    """
+    Select requests whose pickup and dropoff cause the longest detours in their routes
+    :param solution: Current Solution
+    :param count: Number of requests to select
+    :param rng: Random number generator
+    :return: Selected requests
+    """
+    p = solution.problem
+    detour = [0.0] * p.n
+    for route in solution.routes:
+        stops = [p.start[route.driver]] + route.stops + [p.depot[route.driver]]
+        for i in range(1, len(stops) - 1):
+            s = stops[i]
+            detour[s % p.n] += p.time[stops[i - 1]][s] + p.time[s][stops[i + 1]] - p.time[stops[i - 1]][stops[i + 1]]
+    ranked = sorted(_assigned(solution), key=lambda r: -detour[r])
+    return [ranked.pop(_biased_index(len(ranked), rng)) for _ in range(min(count, len(ranked)))]
+
+
+def related_removal(solution: Solution, count: int, rng: Random) -> List[int]:
+    """
+    Select requests that are close to each other in space and time (Shaw removal), which are likely to be exchanged
+    between routes when they are inserted again
+    :param solution: Current Solution
+    :param count: Number of requests to select
+    :param rng: Random number generator
+    :return: Selected requests
+    """
+    p = solution.problem
+    remaining = _assigned(solution)
+    if not remaining:
+        return []
+    selected = [remaining.pop(rng.randrange(len(remaining)))]
+    while remaining and len(selected) < count:
+        r = rng.choice(selected)
+        remaining.sort(key=lambda q: p.time[r][q] + p.time[r + p.n][q + p.n] + abs(p.open[r] - p.open[q]) +
+                       abs(p.close[r + p.n] - p.close[q + p.n]))
+        selected.append(remaining.pop(_biased_index(len(remaining), rng)))
+    return selected
+
+
+def route_removal(solution: Solution, count: int, rng: Random) -> List[int]:
+    """
+    Select all requests of a random driver's route, so that they can be redistributed among the other drivers
+    :param solution: Current Solution
+    :param count: Unused, the size of the route determines the number of selected requests
+    :param rng: Random number generator
+    :return: Selected requests
+    """
+    routes = [route for route in solution.routes if route.stops]
+    return rng.choice(routes).requests() if routes else []
+
+
+def greedy_repair(solution: Solution, requests: List[int], rng: Random) -> None:
+    """
+    Insert the removed requests one group at a time at their cheapest positions
+    :param solution: Solution to repair
+    :param requests: Unassigned requests to insert
+    :param rng: Unused, the insertion order is deterministic
+    """
+    greedy_insertion(solution, requests)
+
+
+def regret_repair(solution: Solution, requests: List[int], rng: Random) -> None:
+    """
+    Insert the removed requests one group at a time, always choosing the group with the largest difference between its
+    cheapest and second cheapest insertion into different routes (regret-2), since postponing it is the most expensive.
+    Groups that fit into a single route come first, and groups that do not fit anywhere remain unassigned.
+    :param solution: Solution to repair
+    :param requests: Unassigned requests to insert
+    :param rng: Unused, the insertion order is deterministic
+    """
+    candidates = dict()
+    for group in insertion_groups(solution.problem, requests):
+        candidates[group[0]] = (group, {k: changes for _, changes in group_insertions(solution, group)
+                                        for k in changes})
+    while candidates:
+        best, best_regret, best_delta = None, None, None
+        for first, (group, by_route) in candidates.items():
+            deltas = sorted((_insertion_delta(solution, changes), k) for k, changes in by_route.items())
+            if not deltas:
+                continue
+            regret = deltas[1][0] - deltas[0][0] if len(deltas) > 1 else math.inf
+            if best is None or regret > best_regret or (regret == best_regret and deltas[0][0] < best_delta):
+                best, best_regret, best_delta = (first, deltas[0][1]), regret, deltas[0][0]
+        if best is None:
+            break
+        # Routes rescheduled by earlier insertions may have invalidated the cached insertion
+        group, by_route = candidates[best[0]]
+        insertions = group_insertions(solution, group, routes=[best[1]])
+        if not insertions:
+            del by_route[best[1]]
+            continue
+        del candidates[best[0]]
+        changes = insertions[0][1]
+        before = [(route, list(route.times)) for route in solution.routes]
+        solution.apply(changes)
+        dirty = [k for k, (route, times) in enumerate(before)
+                 if solution.routes[k] is not route or route.times != times]
+        for other, other_routes in candidates.values():
+            for k in dirty:
+                other_routes.pop(k, None)
+            for _, updated in group_insertions(solution, other, routes=dirty):
+                other_routes.update({k: updated for k in updated})
+
+
+class ALNS:
+    """
+    Adaptive Large Neighborhood Search for the RoutingProblem.
+    Every iteration destroys part of the current solution with one of the destroy operators and repairs it with one of
+    the repair operators. The operators are chosen at random in proportion to weights that adapt to how often they led
+    to improvements, and the repaired solution replaces the current one following a simulated annealing acceptance
+    criterion. The best solution found is returned once the time budget is spent, the iteration limit is reached, or a
+    listener aborts the search.
+    """
+
+    def __init__(self, problem: RoutingProblem, seed: int, listeners: Optional[List[SearchListener]] = None) -> None:
+        """
+        Initialize the search
+        :param problem: RoutingProblem being solved
+        :param seed: Seed of the random number generator
+        :param listeners: (optional) Listeners notified whenever a new best solution is found
+        """
+        self.problem = problem
+        self.rng = Random(seed)
+        self.listeners = listeners or []
+        self.destroy_operators: List[Destroy] = [random_removal, worst_removal, related_removal, route_removal]
+        self.repair_operators: List[Repair] = [greedy_repair, regret_repair]
+        self.destroy_weights = [1.0] * len(self.destroy_operators)
+        self.repair_weights = [1.0] * len(self.repair_operators)
+        self.iterations = 0
+
+    def run(self, solution: Solution, time_limit: float, max_iterations: Optional[int] = None) -> Solution:
+        """
+        Improve a solution
+        :param solution: Initial Solution, which is not modified
+        :param time_limit: Time in seconds after which the search stops
+        :param max_iterations: (optional) Number of iterations after which the search stops
+        :return: Best Solution found
+        """
+        start = time.monotonic()
+        best, current = solution.copy(), solution
+        best_score, current_score = _score(best), _score(current)
+        start_temperature = START_WORSENING * max(current_score[1], 1.0) / math.log(2)
+        seen = {_fingerprint(current)}
+        destroy_scores, destroy_uses = [0.0] * len(self.destroy_operators), [0] * len(self.destroy_operators)
+        repair_scores, repair_uses = [0.0] * len(self.repair_operators), [0] * len(self.repair_operators)
+        self.iterations = 0
+        while not any(listener.aborted for listener in self.listeners):
+            elapsed = time.monotonic() - start
+            if elapsed >= time_limit or (max_iterations is not None and self.iterations >= max_iterations):
+                break
+            temperature = start_temperature * END_TEMPERATURE_RATIO ** (elapsed / time_limit)
+            d = self.__choose(self.destroy_weights)
+            r = self.__choose(self.repair_weights)
+
+            candidate = current.copy()
+            removed = self.destroy_operators[d](candidate, self.__removal_count(candidate), self.rng)
+            removed = [q for first in insertion_groups(self.problem, removed) for q in first]
+            candidate.remove(removed)
+            self.repair_operators[r](candidate, sorted(candidate.unassigned), self.rng)
+            candidate_score = _score(candidate)
+            self.iterations += 1
+
+            score = 0
+            fingerprint = _fingerprint(candidate)
+            if candidate_score < best_score:
+                best, best_score = candidate.copy(), candidate_score
+                current, current_score = candidate, candidate_score
+                score = NEW_BEST_SCORE
+                progress = SearchProgress(time.monotonic() - start, self.iterations, best_score[1], best_score[0])
+                for listener in self.listeners:
+                    listener.notify_progress(progress)
+            elif candidate_score < current_score:
+                current, current_score = candidate, candidate_score
+                score = IMPROVEMENT_SCORE if fingerprint not in seen else 0
+            elif candidate_score[0] == current_score[0] and \
+                    self.rng.random() < math.exp((current_score[1] - candidate_score[1]) / max(temperature, 1e-9)):
+                current, current_score = candidate, candidate_score
+                score = ACCEPTED_SCORE if fingerprint not in seen else 0
+            seen.add(fingerprint)
+
+            destroy_scores[d] += score
+            destroy_uses[d] += 1
+            repair_scores[r] += score
+            repair_uses[r] += 1
+            if self.iterations % SEGMENT_LENGTH == 0:
+                self.__update_weights(self.destroy_weights, destroy_scores, destroy_uses)
+                self.__update_weights(self.repair_weights, repair_scores, repair_uses)
+                log.info(f"ALNS iteration {self.iterations}: current {current_score[1]:.1f}, best {best_score[1]:.1f} "
+                         f"with {best_score[0]} unassigned trips")
+        log.info(f"ALNS finished after {self.iterations} iterations in {time.monotonic() - start:.1f} seconds with "
+                 f"objective {best_score[1]}")
+        return best
+
+    def __choose(self, weights: List[float]) -> int:
+        """
+        :param weights: Weights of the operators
+        :return: Index of an operator chosen at random in proportion to its weight
+        """
+        return self.rng.choices(range(len(weights)), weights=weights)[0]
+
+    def __removal_count(self, solution: Solution) -> int:
+        """
+        :param solution: Solution to destroy
+        :return: Random number of requests to remove
+        """
+        assigned = self.problem.n - len(solution.unassigned)
+        upper = max(MIN_REMOVAL, min(MAX_REMOVAL, int(MAX_REMOVAL_FRACTION * assigned)))
+        return self.rng.randint(min(MIN_REMOVAL, upper), upper)
+
+    @staticmethod
+    def __update_weights(weights: List[float], scores: List[float], uses: List[int]) -> None:
+        """
+        Move the operator weights towards their average score over the last segment and reset the scores
+        :param weights: Weights of the operators, updated in place
+        :param scores: Total score of each operator over the last segment
+        :param uses: Number of times each operator was used over the last segment
+        """
+        for i in range(len(weights)):
+            if uses[i]:
+                weights[i] = max((1 - REACTION_FACTOR) * weights[i] + REACTION_FACTOR * scores[i] / uses[i], 0.1)
+            scores[i], uses[i] = 0.0, 0
+
+
+def _assigned(solution: Solution) -> List[int]:
+    """
+    :param solution: Current Solution
+    :return: Requests served by the solution
+    """
+    return [r for route in solution.routes for r in route.requests()]
+
+
+def _biased_index(size: int, rng: Random) -> int:
+    """
+    :param size: Number of ranked candidates
+    :param rng: Random number generator
+    :return: Random index that favors the first candidates
+    """
+    return int(rng.random() ** REMOVAL_DETERMINISM * size)
+
+
+def _insertion_delta(solution: Solution, changes: Dict[int, Route]) -> float:
+    """
+    :param solution: Current Solution
+    :param changes: Map from route index to a Route replacing the solution's route
+    :return: Change in objective value caused by the changes
+    """
+    return sum(route.cost - solution.routes[k].cost for k, route in changes.items()) + \
+        solution.spread_cost(changes) - solution.spread_cost()
+
+
+def _score(solution: Solution) -> Tuple[int, float]:
+    """
+    :param solution: Solution to score
+    :return: Number of unassigned requests and objective value, compared lexicographically
+    """
+    return len(solution.unassigned), solution.objective()
+
+
+def _fingerprint(solution: Solution) -> Tuple[Tuple[int, ...], ...]:
+    """
+    :param solution: Solution to identify
+    :return: Hashable representation of the routes of the solution
+    """
+    return tuple(tuple(route.stops) for route in solution.routes)
@@ -0,0 +1,111 @@
+import logging
+from typing import List, Dict, Optional, Tuple, Iterable
+
+from avicena.optimizers.solver_util.heuristic.Route import Route
+from avicena.optimizers.solver_util.heuristic.RoutingProblem import RoutingProblem
+from avicena.optimizers.solver_util.heuristic.Solution import Solution
+
+log = logging.getLogger(__name__)
+
+
+def insertion_groups(problem: RoutingProblem, requests: Iterable[int]) -> List[List[int]]:
+    """
+    Split requests into the groups of merged legs that must be inserted into the same route together.
+    The groups are ordered so that the most constrained ones, which fewer drivers are able to serve, come first and
+    then by the opening of their first pickup window.
+    :param problem: RoutingProblem being solved
+    :param requests: Requests to group
+    :return: List of groups of requests in leg order
+    """
+    groups = dict()
+    for r in requests:
+        group = problem.merge_group(r)
+        groups[group[0]] = group
+    return sorted(groups.values(), key=lambda g: (sum(all(problem.can_serve[k][r] for r in g)
+                                                      for k in range(problem.num_drivers)), problem.open[g[0]]))
+
+
+def insert_group(solution: Solution, route: Route, group: List[int]) -> Optional[Route]:
+    """
+    Insert the legs of a group one after the other at their cheapest positions in a route
+    :param solution: Current Solution
+    :param route: Scheduled Route to insert the group into, which is not modified
+    :param group: Unassigned requests that must be inserted into the same route
+    :return: New scheduled Route or None if the group can not be feasibly inserted
+    """
+    p = solution.problem
+    if not all(p.can_serve[route.driver][r] for r in group):
+        return None
+    for r in group:
+        position = route.best_insertion(r, solution.node_route, solution.node_time)
+        if position is None:
+            return None
+        route = Route(p, route.driver, list(route.stops))
+        route.insert(r, position[1], position[2])
+        if not route.schedule(solution.node_route, solution.node_time):
+            return None
+    return route
+
+
+def group_insertions(solution: Solution, group: List[int], routes: Optional[Iterable[int]] = None,
+                     base: Optional[Dict[int, Route]] = None) -> List[Tuple[float, Dict[int, Route]]]:
+    """
+    Find the cheapest insertion of a group of unassigned requests into each route
+    :param solution: Current Solution
+    :param group: Requests that must be inserted into the same route
+    :param routes: (optional) Indices of the routes to consider, all routes by default
+    :param base: (optional) Map from route index to a scheduled Route replacing the solution's route before the
+                 insertion, such as the route the group was just removed from
+    :return: List of the change in objective value and the route changes of the cheapest insertion into each route
+             that can feasibly serve the group, sorted by increasing change in objective value
+    """
+    p = solution.problem
+    base = base or dict()
+    base_spread = solution.spread_cost()
+    insertions = []
+    for k in (routes if routes is not None else range(p.num_drivers)):
+        route = insert_group(solution, base.get(k, solution.routes[k]), group)
+        if route is None:
+            continue
+        changes = dict(base)
+        changes[k] = route
+        delta = sum(changed.cost - solution.routes[j].cost for j, changed in changes.items()) + \
+            solution.spread_cost(changes) - base_spread
+        insertions.append((delta, changes))
+    insertions.sort(key=lambda insertion: insertion[0])
+    return insertions
+
+
+def greedy_insertion(solution: Solution, requests: Iterable[int]) -> None:
+    """
+    Insert requests into the solution one group at a time, each at its cheapest feasible position.
+    Requests that can not be feasibly inserted remain unassigned.
+    :param solution: Solution to insert the requests into
+    :param requests: Unassigned requests to insert
+    """
+    for group in insertion_groups(solution.problem, requests):
+        insertions = group_insertions(solution, group)
+        if insertions:
+            solution.apply(insertions[0][1])
+
+
+def construct_solution(problem: RoutingProblem) -> Solution:
+    """
+    Build an initial solution with time window aware cheapest insertion.
+    If some requests or drivers can not be served or dispatched while respecting the early day requirements of the
+    drivers, the requirements are relaxed and the remaining requests are inserted again.
+    :param problem: RoutingProblem being solved
+    :return: Constructed Solution
+    """
+    solution = Solution(problem)
+    greedy_insertion(solution, range(problem.n))
+    if any(problem.earliest_start) and (solution.unassigned or not all(route.stops for route in solution.routes)):
+        log.info(f"{len(solution.unassigned)} trips could not be inserted and "
+                 f"{sum(not route.stops for route in solution.routes)} drivers could not be dispatched with the early "
+                 "day requirements")
+        problem.relax_early_day()
+        solution.reschedule()
+        greedy_insertion(solution, list(solution.unassigned))
+    log.info(f"Constructed initial solution with objective {solution.objective()} and "
+             f"{len(solution.unassigned)} unassigned trips")
+    return solution
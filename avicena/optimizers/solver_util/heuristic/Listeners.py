@@ -0,0 +1,107 @@
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class SearchProgress:
+    """
+    Details about the progress of a heuristic search passed to its listeners whenever the incumbent improves
+    """
+
+    def __init__(self, time: float, iteration: int, current_objective: float, unassigned: int) -> None:
+        """
+        :param time: Elapsed time in seconds since the search started
+        :param iteration: Number of iterations completed by the search
+        :param current_objective: Objective value of the new incumbent
+        :param unassigned: Number of trips the new incumbent leaves unassigned
+        """
+        self.time = time
+        self.iteration = iteration
+        self.current_objective = current_objective
+        self.unassigned = unassigned
+
+
+class SearchListener:
+    """
+    Base class of the listeners notified by the heuristic searches whenever they find a new incumbent. Similar to the
+    CPLEX ProgressListener, a listener can abort the search.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize Listener
+        """
+        self._aborted = False
+
+    def notify_progress(self, data: SearchProgress) -> None:
+        """
+        A Callback used by the search to update the listener when a new incumbent is found
+        :param data: SearchProgress struct with details about the search's progress
+        """
+        pass
+
+    def abort(self) -> None:
+        """
+        Request the search to stop after the current iteration
+        """
+        self._aborted = True
+
+    @property
+    def aborted(self) -> bool:
+        """
+        :return: True if the listener requested the search to stop
+        """
+        return self._aborted
+
+
+class TimeListener(SearchListener):
+    """
+    This listener logs every new incumbent and aborts the search if a certain amount of time has passed.
+    """
+
+    def __init__(self, time: float) -> None:
+        """
+        Initialize Listener
+        :param time: time in seconds until the search will end
+        """
+        SearchListener.__init__(self)
+        self._time = time
+
+    def notify_progress(self, data: SearchProgress) -> None:
+        """
+        A Callback used by the search to update the listener when a new incumbent is found
+        :param data: SearchProgress struct with details about the search's progress
+        """
+        log.info('Elapsed time: %.2f' % data.time)
+        log.info('Current incumbent: %f with %d unassigned trips' % (data.current_objective, data.unassigned))
+        if data.time > self._time:
+            log.info('ABORTING')
+            self.abort()
+
+
+class TargetListener(SearchListener):
+    """
+    This listener logs every new incumbent and aborts the search if an incumbent with all trips assigned reaches a
+    target objective value or a certain amount of time has passed.
+    """
+
+    def __init__(self, time: float, target: float) -> None:
+        """
+        Initialize Listener
+        :param time: time in seconds until the search will end
+        :param target: target objective value
+        """
+        SearchListener.__init__(self)
+        self._time = time
+        self._target = target
+
+    def notify_progress(self, data: SearchProgress) -> None:
+        """
+        A Callback used by the search to update the listener when a new incumbent is found
+        :param data: SearchProgress struct with details about the search's progress
+        """
+        log.info('Elapsed time: %.2f' % data.time)
+        log.info('Current incumbent: %f with %d unassigned trips' % (data.current_objective, data.unassigned))
+        if data.time > self._time or (not data.unassigned and data.current_objective <= self._target):
+            log.info('ABORTING')
+            self.abort()
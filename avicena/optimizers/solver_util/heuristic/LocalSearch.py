@@ -0,0 +1,197 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import List, Tuple, Dict, Optional
+
+from avicena.optimizers.solver_util.heuristic.Insertion import group_insertions, insertion_groups, insert_group
+from avicena.optimizers.solver_util.heuristic.Route import Route
+from avicena.optimizers.solver_util.heuristic.Solution import Solution
+
+log = logging.getLogger(__name__)
+
+IMPROVEMENT_TOLERANCE = 1e-6
+EXCHANGE_NEIGHBORS = 8  # Number of groups starting next in the day considered for an exchange with each group
+
+
+def relocate(solution: Solution, deadline: float) -> Tuple[Solution, bool]:
+    """
+    Move every group of merged legs to its cheapest position in any route, including its own, if that improves the
+    solution
+    :param solution: Current Solution
+    :param deadline: Monotonic clock time after which the search stops
+    :return: The improved Solution and whether any improvement was found
+    """
+    improved = False
+    for group in insertion_groups(solution.problem, _assigned(solution)):
+        if time.monotonic() > deadline:
+            break
+        k = solution.node_route[group[0]]
+        with _unassigned(solution, group):
+            remaining = Route(solution.problem, k, list(solution.routes[k].stops))
+            remaining.remove(group)
+            if not remaining.schedule(solution.node_route, solution.node_time):
+                continue
+            insertions = group_insertions(solution, group, base={k: remaining})
+        if insertions and insertions[0][0] < -IMPROVEMENT_TOLERANCE:
+            improved |= _apply_if_improving(solution, insertions[0][1])
+    return solution, improved
+
+
+def exchange(solution: Solution, deadline: float) -> Tuple[Solution, bool]:
+    """
+    Swap groups of merged legs served by different routes around the same time of day if that improves the solution
+    :param solution: Current Solution
+    :param deadline: Monotonic clock time after which the search stops
+    :return: The improved Solution and whether any improvement was found
+    """
+    p = solution.problem
+    improved = False
+    groups = sorted(insertion_groups(p, _assigned(solution)), key=lambda g: p.open[g[0]])
+    for index, first in enumerate(groups):
+        if time.monotonic() > deadline:
+            break
+        for second in groups[index + 1:index + 1 + EXCHANGE_NEIGHBORS]:
+            k1, k2 = solution.node_route[first[0]], solution.node_route[second[0]]
+            if k1 == k2 or not all(p.can_serve[k1][r] for r in second) or not all(p.can_serve[k2][r] for r in first):
+                continue
+            with _unassigned(solution, first + second):
+                changes = dict()
+                for k, removed, inserted in ((k1, first, second), (k2, second, first)):
+                    route = Route(p, k, list(solution.routes[k].stops))
+                    route.remove(removed)
+                    if route.schedule(solution.node_route, solution.node_time):
+                        changes[k] = insert_group(solution, route, inserted)
+            if changes.get(k1) is not None and changes.get(k2) is not None and \
+                    _apply_if_improving(solution, changes):
+                improved = True
+                break
+    return solution, improved
+
+
+def two_opt_star(solution: Solution, deadline: float) -> Tuple[Solution, bool]:
+    """
+    Exchange the ends of two routes if that improves the solution. Routes are only cut where the vehicle is empty, and
+    merged legs are never split between two routes.
+    :param solution: Current Solution
+    :param deadline: Monotonic clock time after which the search stops
+    :return: The improved Solution and whether any improvement was found
+    """
+    p = solution.problem
+    improved = False
+    for k1 in range(p.num_drivers):
+        for k2 in range(k1 + 1, p.num_drivers):
+            if time.monotonic() > deadline:
+                return solution, improved
+            first, second = solution.routes[k1], solution.routes[k2]
+            for a in _cut_positions(solution, k1):
+                for b in _cut_positions(solution, k2):
+                    if (a == len(first.stops) and b == len(second.stops)) or (a == 0 and b == 0):
+                        continue
+                    if not _can_join(solution, first, a, second, b) or not _can_join(solution, second, b, first, a):
+                        continue
+                    if _apply_if_improving(solution, {k1: Route(p, k1, first.stops[:a] + second.stops[b:]),
+                                                      k2: Route(p, k2, second.stops[:b] + first.stops[a:])}):
+                        improved = True
+                        break
+                else:
+                    continue
+                break
+    return solution, improved
+
+
+def _apply_if_improving(solution: Solution, changes: Dict[int, Route]) -> bool:
+    """
+    Schedule changed routes together and apply them to the solution if they improve its objective value
+    :param solution: Current Solution
+    :param changes: Map from route index to Route replacing the solution's route
+    :return: True if the changes were applied
+    """
+    changes = solution.evaluate({k: route.stops for k, route in changes.items()})
+    if changes is None:
+        return False
+    delta = sum(route.cost - solution.routes[k].cost for k, route in changes.items()) + \
+        solution.spread_cost(changes) - solution.spread_cost()
+    if delta >= -IMPROVEMENT_TOLERANCE:
+        return False
+    solution.apply(changes)
+    return True
+
+
+@contextmanager
+def _unassigned(solution: Solution, requests: List[int]):
+    """
+    Temporarily mark requests as unassigned while evaluating where to move them
+    :param solution: Current Solution
+    :param requests: Requests being moved
+    """
+    nodes = [s for r in requests for s in (r, r + solution.problem.n)]
+    assigned = [solution.node_route[s] for s in nodes]
+    for s in nodes:
+        solution.node_route[s] = -1
+    try:
+        yield
+    finally:
+        for s, k in zip(nodes, assigned):
+            solution.node_route[s] = k
+
+
+def _assigned(solution: Solution) -> List[int]:
+    """
+    :param solution: Current Solution
+    :return: Requests served by the solution
+    """
+    return [r for route in solution.routes for r in route.requests()]
+
+
+def _cut_positions(solution: Solution, k: int) -> List[int]:
+    """
+    :param solution: Current Solution
+    :param k: Route index
+    :return: Positions at which the route can be cut without leaving a passenger in the vehicle or separating merged legs
+    """
+    p = solution.problem
+    route = solution.routes[k]
+    position = {s: i for i, s in enumerate(route.stops)}
+    blocked = set()
+    for i, s in enumerate(route.stops):
+        if s < p.n and p.merge_parent[s] >= 0 and p.merge_parent[s] in position:
+            blocked.update(range(position[p.merge_parent[s]] + 1, i + 1))
+    return [0] + [i + 1 for i, load in enumerate(route.loads) if load < 1e-9 and i + 1 not in blocked]
+
+
+def _can_join(solution: Solution, head: Route, a: int, tail: Route, b: int) -> bool:
+    """
+    Quickly check whether the end of one route can follow the start of another before scheduling the joined route
+    :param solution: Current Solution
+    :param head: Route whose start is kept
+    :param a: Position at which the head is cut
+    :param tail: Route whose end is appended
+    :param b: Position at which the tail is cut
+    :return: False if the joined route is certainly infeasible
+    """
+    p = solution.problem
+    k = head.driver
+    if not all(p.can_serve[k][s] for s in tail.stops[b:] if s < p.n):
+        return False
+    if b == len(tail.stops) or a == 0:
+        return True
+    return head.times[a - 1] + p.time[head.stops[a - 1]][tail.stops[b]] <= tail.latest[b]
+
+
+def local_search(solution: Solution, deadline: float) -> Solution:
+    """
+    Improve a solution with relocate, exchange, and 2-opt* moves until none of them improves it or the time runs out
+    :param solution: Initial Solution
+    :param deadline: Monotonic clock time after which the search stops
+    :return: Improved Solution
+    """
+    rounds = 0
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        for move in (relocate, exchange, two_opt_star):
+            solution, move_improved = move(solution, deadline)
+            improved |= move_improved
+        rounds += 1
+        log.info(f"Local search round {rounds} objective: {solution.objective()}")
+    return solution
@@ -0,0 +1,302 @@
+from typing import List, Optional, Tuple
+
+from avicena.optimizers.solver_util.heuristic.RoutingProblem import RoutingProblem
+
+EPSILON = 1e-9
+
+
+class Route:
+    """
+    This class represents the ordered sequence of pickup and dropoff nodes visited by a single driver.
+    Every node is visited at the earliest feasible time. For pickups this is the departure time, which can not be earlier
+    than the opening of the pickup window, and for dropoffs it is the arrival time. The driver leaves the start node
+    (usually the depot) just in time to reach the first node and returns to the depot after the last node.
+    Legs of a patient's trip served by other routes impose additional bounds on the visiting times: a pickup can not
+    depart before the preceding leg was dropped off and a dropoff must arrive before the following leg departs. These
+    bounds are read from the Solution when the route is scheduled.
+    """
+
+    def __init__(self, problem: RoutingProblem, driver: int, stops: Optional[List[int]] = None) -> None:
+        """
+        Initialize a Route
+        :param problem: RoutingProblem the route belongs to
+        :param driver: Index of the driver performing the route
+        :param stops: (optional) Sequence of nodes visited by the route
+        """
+        self.problem = problem
+        self.driver = driver
+        self.stops = stops if stops is not None else []
+        self.times = []  # Departure time from pickups and arrival time to dropoffs
+        self.loads = []  # Occupied space after visiting each node
+        self.lower = []  # Earliest time each node can be visited
+        self.upper = []  # Latest time each node can be visited
+        self.latest = []  # Latest time each node can be visited so that the rest of the route remains feasible
+        self.merge_coefficients = []  # Coefficient of each node's visiting time in the merge waiting time
+        self.travel = 0.0
+        self.duration = 0.0
+        self.merge_wait = 0.0
+        self.revenue = problem.executed_revenue[driver]
+        self.wheelchairs = problem.executed_wheelchairs[driver]
+        self.cost = 0.0
+
+    def copy(self) -> 'Route':
+        """
+        :return: Copy of the route that can be modified independently
+        """
+        route = Route(self.problem, self.driver, list(self.stops))
+        route.times = list(self.times)
+        route.loads = list(self.loads)
+        route.lower = list(self.lower)
+        route.upper = list(self.upper)
+        route.latest = list(self.latest)
+        route.merge_coefficients = list(self.merge_coefficients)
+        route.travel = self.travel
+        route.duration = self.duration
+        route.merge_wait = self.merge_wait
+        route.revenue = self.revenue
+        route.wheelchairs = self.wheelchairs
+        route.cost = self.cost
+        return route
+
+    def requests(self) -> List[int]:
+        """
+        :return: Requests served by the route in the order they are picked up
+        """
+        return [s for s in self.stops if s < self.problem.n]
+
+    def schedule(self, node_route: List[int], node_time: List[float]) -> bool:
+        """
+        Compute the visiting times, loads, and cost of the route and check its feasibility
+        :param node_route: Route index serving each request node in the solution, -1 if unassigned
+        :param node_time: Visiting time of each request node in the solution
+        :return: True if the route is feasible
+        """
+        p = self.problem
+        n, k = p.n, self.driver
+        travel, open_, close, demand, cap = p.time, p.open, p.close, p.demand, p.CAP + EPSILON
+        previous_leg, next_leg, merge_members, can_serve = p.previous_leg, p.next_leg, p.merge_members, p.can_serve[k]
+        stops = self.stops
+        size = len(stops)
+        position = {s: i for i, s in enumerate(stops)}
+        times, loads, lower, upper = [0.0] * size, [0.0] * size, [0.0] * size, [0.0] * size
+        prev, t, load = p.start[k], p.earliest_start[k], 0.0
+        for i, s in enumerate(stops):
+            arrival = t + travel[prev][s]
+            if s < n:
+                if not can_serve[s] or position.get(s + n, -1) <= i:
+                    return False
+                lo, hi = open_[s], close[s]
+                previous = previous_leg[s]
+                if previous >= 0:
+                    if previous + n in position:
+                        if position[previous + n] > i:
+                            return False
+                    elif node_route[previous + n] >= 0 and node_time[previous + n] > lo:
+                        lo = node_time[previous + n]
+                for r in merge_members[s]:
+                    if r not in position and node_route[r] >= 0:
+                        return False
+                t = arrival if arrival > lo else lo
+            else:
+                if position.get(s - n, size) >= i:
+                    return False
+                lo, hi = 0.0, close[s]
+                following = next_leg[s - n]
+                if following >= 0:
+                    if following in position:
+                        if position[following] < i:
+                            return False
+                    elif node_route[following] >= 0 and node_time[following] < hi:
+                        hi = node_time[following]
+                t = arrival
+            load += demand[s]
+            if t > hi + EPSILON or load > cap:
+                return False
+            times[i], loads[i], lower[i], upper[i] = t, load, lo, hi
+            prev = s
+        latest = list(upper)
+        for i in range(size - 2, -1, -1):
+            bound = latest[i + 1] - travel[stops[i]][stops[i + 1]]
+            if bound < latest[i]:
+                latest[i] = bound
+        self.times, self.loads, self.lower, self.upper, self.latest = times, loads, lower, upper, latest
+        self.__compute_cost(position)
+        return True
+
+    def __compute_cost(self, position: dict) -> None:
+        """
+        Compute the travel time, route length, merge waiting time, revenue, and wheelchair trips of the route and the
+        part of the objective that only depends on this route. Revenue and wheelchair trips include the trips the driver
+        already executed.
+        :param position: Map from node to its position in the route
+        """
+        p = self.problem
+        self.travel = self.duration = self.merge_wait = 0.0
+        self.revenue = p.executed_revenue[self.driver]
+        self.wheelchairs = p.executed_wheelchairs[self.driver]
+        self.merge_coefficients = [0] * len(self.stops)
+        if not self.stops:
+            self.cost = 0.0
+            return
+        depot, origin = p.depot[self.driver], p.start[self.driver]
+        prev = origin
+        for s in self.stops:
+            self.travel += p.time[prev][s]
+            prev = s
+        self.travel += p.time[prev][depot]
+        self.duration = self.times[-1] - self.times[0] + p.time[origin][self.stops[0]]
+        for i, s in enumerate(self.stops):
+            if s >= p.n:
+                continue
+            self.revenue += p.revenue[s]
+            self.wheelchairs += p.wheelchair[s]
+            parent = p.merge_parent[s]
+            if parent >= 0 and parent in position:
+                self.merge_wait += self.times[i] - self.times[position[parent]] - p.direct_time[parent]
+                self.merge_coefficients[i] += 1
+                self.merge_coefficients[position[parent]] -= 1
+        self.cost = 1440 * self.travel + p.ROUTE_LIMIT_PEN * self.duration + p.MERGE_PEN * 24 * self.merge_wait
+
+    def best_insertion(self, r: int, node_route: List[int], node_time: List[float]) -> Optional[
+            Tuple[float, int, int]]:
+        """
+        Find the cheapest feasible positions to insert a request into the route.
+        Positions are explored in order and abandoned as soon as the shifted visiting times show that no later position
+        can be feasible. The remainder of the route is only rescheduled until the shift has been absorbed by waiting
+        time.
+        :param r: Request to insert
+        :param node_route: Route index serving each request node in the solution, -1 if unassigned
+        :param node_time: Visiting time of each request node in the solution
+        :return: Change of the route's cost, pickup position, and dropoff position (both in the current route, the
+                 dropoff is inserted before the node at its position) of the cheapest insertion or None if there is
+                 no feasible insertion
+        """
+        p = self.problem
+        n = p.n
+        k = self.driver
+        if not p.can_serve[k][r]:
+            return None
+        tm = p.time
+        pickup, dropoff = r, r + n
+        stops, times, loads, lower, latest = self.stops, self.times, self.loads, self.lower, self.latest
+        size = len(stops)
+        depot, origin = p.depot[k], p.start[k]
+        position = {s: i for i, s in enumerate(stops)}
+        q = p.demand[pickup]
+
+        pickup_lo, pickup_hi = p.open[pickup], p.close[pickup]
+        dropoff_hi = p.close[dropoff]
+        first_pickup_position, last_dropoff_position = 0, size
+        previous, following = p.previous_leg[r], p.next_leg[r]
+        if previous >= 0:
+            if previous + n in position:
+                first_pickup_position = position[previous + n] + 1
+            elif node_route[previous + n] >= 0:
+                pickup_lo = max(pickup_lo, node_time[previous + n])
+        if following >= 0:
+            if following in position:
+                last_dropoff_position = position[following]
+            elif node_route[following] >= 0:
+                dropoff_hi = min(dropoff_hi, node_time[following])
+        parent = p.merge_parent[r]
+        parent_position = position.get(parent, -1) if parent >= 0 else -1
+        child_position = -1
+        for child in p.merge_children[r]:
+            if child in position:
+                child_position = position[child]
+        coefficients = self.merge_coefficients
+
+        start = times[0] - tm[origin][stops[0]] if size else 0.0
+        end = times[-1] if size else 0.0
+        best = None
+        for i in range(first_pickup_position, size + 1):
+            prev = stops[i - 1] if i else origin
+            t_prev = times[i - 1] if i else p.earliest_start[k]
+            if (loads[i - 1] if i else 0.0) + q > p.CAP + EPSILON:
+                continue
+            t_pickup = max(t_prev + tm[prev][pickup], pickup_lo)
+            if t_pickup > pickup_hi + EPSILON:
+                break
+            next_i = stops[i] if i < size else depot
+            pickup_travel = tm[prev][pickup] + tm[pickup][next_i] - tm[prev][next_i]
+            new_start = t_pickup - tm[origin][pickup] if i == 0 else start
+            t, node, shift_merge = t_pickup, pickup, 0.0
+            for j in range(i, last_dropoff_position + 1):
+                t_dropoff = t + tm[node][dropoff]
+                if t_dropoff > dropoff_hi + EPSILON:
+                    break
+                evaluation = self.__evaluate_suffix(j, dropoff, t_dropoff, child_position)
+                if evaluation is not None:
+                    new_end, suffix_merge, child_time = evaluation
+                    next_j = stops[j] if j < size else depot
+                    if j == i:
+                        travel = tm[prev][pickup] + tm[pickup][dropoff] + tm[dropoff][next_i] - tm[prev][next_i]
+                    else:
+                        travel = pickup_travel + tm[stops[j - 1]][dropoff] + tm[dropoff][next_j] - \
+                                 tm[stops[j - 1]][next_j]
+                    merge = shift_merge + suffix_merge
+                    if parent_position >= 0:
+                        merge += t_pickup - times[parent_position] - p.direct_time[parent]
+                    if child_position >= 0:
+                        merge += child_time - t_pickup - p.direct_time[r]
+                    delta = 1440 * travel + p.ROUTE_LIMIT_PEN * ((new_end - new_start) - (end - start)) + \
+                            p.MERGE_PEN * 24 * merge
+                    if best is None or delta < best[0]:
+                        best = (delta, i, j)
+                if j == size or j == last_dropoff_position:
+                    break
+                s = stops[j]
+                arrival = t + tm[node][s]
+                t_next = max(arrival, lower[j]) if s < n else arrival
+                if t_next > latest[j] + EPSILON or loads[j] + q > p.CAP + EPSILON:
+                    break
+                shift_merge += coefficients[j] * (t_next - times[j])
+                t, node = t_next, s
+        return best
+
+    def __evaluate_suffix(self, j: int, node: int, t: float, child_position: int) -> Optional[
+            Tuple[float, float, float]]:
+        """
+        Reschedule the nodes of the route from a position onwards after a node was inserted before it
+        :param j: Position of the first node to reschedule
+        :param node: Inserted node preceding the position
+        :param t: Visiting time of the inserted node
+        :param child_position: Position of a merge leg whose new visiting time should be reported, -1 if none
+        :return: End time of the route, change of the merge waiting time, and new visiting time of the merge leg or
+                 None if the insertion makes the rest of the route infeasible
+        """
+        p = self.problem
+        stops, times = self.stops, self.times
+        merge = 0.0
+        child_time = times[child_position] if child_position >= 0 else 0.0
+        for i in range(j, len(stops)):
+            s = stops[i]
+            arrival = t + p.time[node][s]
+            t_next = max(arrival, self.lower[i]) if s < p.n else arrival
+            if t_next > self.latest[i] + EPSILON:
+                return None
+            if t_next <= times[i] + EPSILON:
+                return times[-1], merge, child_time
+            merge += self.merge_coefficients[i] * (t_next - times[i])
+            if i == child_position:
+                child_time = t_next
+            t, node = t_next, s
+        return t, merge, child_time
+
+    def insert(self, r: int, i: int, j: int) -> None:
+        """
+        Insert a request into the route. The route must be rescheduled afterwards.
+        :param r: Request to insert
+        :param i: Position of the pickup
+        :param j: Position of the dropoff, before the node at this position in the route prior to the insertion
+        """
+        self.stops = self.stops[:i] + [r] + self.stops[i:j] + [r + self.problem.n] + self.stops[j:]
+
+    def remove(self, requests: List[int]) -> None:
+        """
+        Remove requests from the route. The route must be rescheduled afterwards.
+        :param requests: Requests to remove
+        """
+        n = self.problem.n
+        removed = set(requests)
+        self.stops = [s for s in self.stops if (s if s < n else s - n) not in removed]
@@ -0,0 +1,161 @@
+import logging
+from copy import copy
+from typing import List, Dict, Any, Optional
+
+from pandas import DataFrame, isna
+
+from avicena.models.Driver import Driver
+from avicena.models.Location import Location
+from avicena.models.TravelMatrix import TravelMatrix
+from avicena.models.Trip import Trip
+from avicena.util.Exceptions import InvalidTripException
+from avicena.util.Geolocator import find_coord_lat_lon
+from avicena.util.ParserUtil import convert_time
+from avicena.util.TimeWindows import get_time_window_by_hours_minutes
+
+log = logging.getLogger(__name__)
+
+
+class RoutingProblem:
+    """
+    This class holds the Patient Dispatch problem in the compact, index based form used by the heuristic solvers.
+    Every request (trip) r has a pickup node r and a dropoff node r + n, where n is the number of requests, and every
+    driver k has a depot node 2n + k. The time windows, capacities, level of service requirements, and penalties are
+    derived from the optimizer configuration in the same way the GeneralOptimizer derives them, so that solutions and
+    objective values of both optimizers are comparable.
+    When the problem is the remainder of a day that is already under way, trips that were executed are not part of the
+    problem. Every driver k then starts from a separate start node 2n + m + k, where m is the number of drivers, at the
+    dropoff of the driver's last executed trip or at the depot, and no earlier than the current time.
+    """
+
+    def __init__(self, trips: List[Trip], drivers: List[Driver], speed: int, config: Dict[str, Any],
+                 executed: Optional[DataFrame] = None, current_time: float = 0.0) -> None:
+        """
+        Initialize the problem from the parsed trips and the drivers
+        :param trips: List of valid Trip objects that were parsed and cleaned from the input file
+        :param drivers: List of drivers selected to be dispatched for this model
+        :param speed: Assumed travelling speed
+        :param config: Configuration Details for the optimizer
+        :param executed: (optional) Rows of a solution DataFrame with the trips that were already executed
+        :param current_time: Time before which no remaining trip can be started
+        """
+        self.EARLY_PICK_WINDOW = get_time_window_by_hours_minutes(0, config["early_pickup_window"])
+        self.LATE_PICK_WINDOW = get_time_window_by_hours_minutes(0, config["early_drop_window"])
+        self.LATE_DROP_WINDOW = get_time_window_by_hours_minutes(0, config["late_drop_window"])
+        self.CAP = config["driver_capacity"]
+        self.ROUTE_LIMIT_PEN = config["route_limit_penalty"]
+        self.EARLY_DAY_TIME = convert_time(config["early_day_time"])
+        self.MERGE_PEN = config["merge_penalty"]
+        self.REVENUE_PEN = config["revenue_penalty"]
+        self.W_PEN = config["wheelchair_penalty"]
+
+        self.trips = list(trips)[:config["max_trips"]]
+        self.drivers = []
+        for driver in list(drivers)[:config["max_drivers"]]:
+            d = copy(driver)
+            d.capacity = self.CAP
+            self.drivers.append(d)
+        self.n = len(self.trips)
+        self.num_drivers = len(self.drivers)
+        log.info(f"Number of Trips: {self.n}")
+        log.info(f"Number of Drivers: {self.num_drivers}")
+
+        depots = [Location(d.address, find_coord_lat_lon(d.get_clean_address()), d.suffix_len) for d in self.drivers]
+        self.depots = depots  # Home Location of every driver, indexed by driver
+        self.available = [current_time] * self.num_drivers  # Time each driver can start the route
+        self.executed_revenue = [0.0] * self.num_drivers
+        self.executed_wheelchairs = [0] * self.num_drivers
+        executed_legs = dict()  # Map from the ID of an executed trip to the driver ID and dropoff time
+        starts = []
+        if executed is not None:
+            driver_index = {d.id: k for k, d in enumerate(self.drivers)}
+            starts = list(depots)
+            for row in executed.sort_values('est_dropoff_time').itertuples():
+                executed_legs[row.trip_id] = (row.driver_id, row.est_dropoff_time)
+                k = driver_index.get(row.driver_id)
+                if k is None:
+                    continue
+                coord = (row.trip_dropoff_lat, row.trip_dropoff_lon)
+                if any(map(isna, coord)):
+                    # Solutions saved before coordinates were added to them
+                    coord = find_coord_lat_lon(row.trip_dropoff_address)
+                starts[k] = Location(row.trip_dropoff_address, coord)
+                self.available[k] = max(self.available[k], row.est_dropoff_time)
+                self.executed_revenue[k] += row.trip_rev
+                self.executed_wheelchairs[k] += row.trip_los == 'W'
+        self.travel_matrix = TravelMatrix([t.lp.o for t in self.trips] + [t.lp.d for t in self.trips] + depots +
+                                          starts, speed)
+        self.time = self.travel_matrix.time.astype(float).tolist()  # Nested lists are faster to index than arrays
+
+        # Node attributes, indexed by node
+        self.open = [0.0] * (2 * self.n + self.num_drivers)  # Earliest departure from a pickup node
+        self.close = [1.0] * (2 * self.n + self.num_drivers)  # Latest departure from a pickup or arrival to a dropoff
+        self.demand = [0.0] * (2 * self.n + self.num_drivers)  # Change of occupied space when visiting the node
+        for r, trip in enumerate(self.trips):
+            self.open[r] = trip.scheduled_pickup - self.EARLY_PICK_WINDOW
+            self.close[r] = trip.scheduled_pickup + self.LATE_PICK_WINDOW
+            self.close[r + self.n] = trip.scheduled_dropoff + self.LATE_DROP_WINDOW
+            self.demand[r] = trip.space
+            self.demand[r + self.n] = -trip.space
+
+        # Request attributes, indexed by request
+        self.revenue = [trip.rev for trip in self.trips]
+        self.wheelchair = [trip.required_level_of_service == 'W' for trip in self.trips]
+        self.direct_time = [self.time[r][r + self.n] for r in range(self.n)]
+        self.previous_leg = [-1] * self.n  # Leg of the same patient that must be completed before this one
+        self.next_leg = [-1] * self.n  # Leg of the same patient that must start after this one is completed
+        self.merge_parent = [-1] * self.n  # Leg that must be served by the same driver as this merge leg
+        self.merge_children = [[] for _ in range(self.n)]
+        required_driver = dict()  # Map from merge legs of executed trips to the ID of the driver that executed them
+        ids = {trip.id: r for r, trip in enumerate(self.trips)}
+        for r, trip in enumerate(self.trips):
+            if not isinstance(trip.id, str) or trip.id[-1] not in 'BC':
+                continue
+            previous_id = trip.id[:-1] + chr(ord(trip.id[-1]) - 1)
+            previous = ids.get(previous_id)
+            if previous is not None:
+                self.previous_leg[r] = previous
+                self.next_leg[previous] = r
+            elif previous_id in executed_legs:
+                driver_id, dropoff_time = executed_legs[previous_id]
+                self.open[r] = max(self.open[r], dropoff_time)
+                if trip.is_merge:
+                    required_driver[r] = driver_id
+                continue
+            if trip.is_merge:
+                if previous is None:
+                    raise InvalidTripException(f"Merge trip {trip.id} has no preceding leg to be merged with")
+                self.merge_parent[r] = previous
+                self.merge_children[previous].append(r)
+        # Legs that must be served by the same driver as each leg
+        self.merge_members = [([self.merge_parent[r]] if self.merge_parent[r] >= 0 else []) + self.merge_children[r]
+                              for r in range(self.n)]
+
+        # Driver attributes, indexed by driver
+        self.depot = [2 * self.n + k for k in range(self.num_drivers)]
+        self.start = [2 * self.n + self.num_drivers + k for k in range(self.num_drivers)] if starts else self.depot
+        self.can_serve = [[trip.required_level_of_service in d.level_of_service and
+                           required_driver.get(r, d.id) == d.id for r, trip in enumerate(self.trips)]
+                          for d in self.drivers]
+        self.wheelchair_drivers = [k for k, d in enumerate(self.drivers) if 'W' in d.level_of_service]
+        self.earliest_start = [max(available, 0.0 if d.early_day_flag else self.EARLY_DAY_TIME)
+                               for d, available in zip(self.drivers, self.available)]
+
+    def merge_group(self, r: int) -> List[int]:
+        """
+        :param r: Request index
+        :return: Requests that must be served by the same driver as the given request, in leg order
+        """
+        while self.merge_parent[r] >= 0:
+            r = self.merge_parent[r]
+        group = [r]
+        for request in group:
+            group.extend(self.merge_children[request])
+        return group
+
+    def relax_early_day(self) -> None:
+        """
+        Allow drivers who are not on an early day to start their route at any time
+        """
+        log.info("Relaxing early day requirements")
+        self.earliest_start = list(self.available)
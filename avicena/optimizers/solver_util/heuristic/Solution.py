@@ -0,0 +1,227 @@
+import logging
+from typing import List, Dict, Optional, Iterable, Set
+
+from pandas import DataFrame
+
+from avicena.optimizers.solver_util.heuristic.Route import Route, EPSILON
+from avicena.optimizers.solver_util.heuristic.RoutingProblem import RoutingProblem
+from avicena.util.Exceptions import InvalidSolutionException
+
+log = logging.getLogger(__name__)
+
+MAX_SCHEDULE_PASSES = 10
+
+
+class Solution:
+    """
+    This class represents a (possibly partial) solution of a RoutingProblem: one Route per driver and the set of
+    requests that are not served yet. It keeps track of the route and visiting time of every request node so that the
+    routes can respect the precedence between legs of a patient's trip served by different drivers.
+    """
+
+    def __init__(self, problem: RoutingProblem) -> None:
+        """
+        Initialize an empty Solution in which no request is served
+        :param problem: RoutingProblem being solved
+        """
+        self.problem = problem
+        self.routes = [Route(problem, k) for k in range(problem.num_drivers)]
+        self.node_route = [-1] * (2 * problem.n)
+        self.node_time = [0.0] * (2 * problem.n)
+        self.unassigned = set(range(problem.n))
+
+    def copy(self) -> 'Solution':
+        """
+        :return: Copy of the solution that can be modified independently
+        """
+        solution = Solution.__new__(Solution)
+        solution.problem = self.problem
+        solution.routes = [route.copy() for route in self.routes]
+        solution.node_route = list(self.node_route)
+        solution.node_time = list(self.node_time)
+        solution.unassigned = set(self.unassigned)
+        return solution
+
+    def objective(self) -> float:
+        """
+        :return: Objective value of the solution, in the same units as the GeneralOptimizer's objective
+        """
+        return sum(route.cost for route in self.routes) + self.spread_cost()
+
+    def spread_cost(self, changes: Optional[Dict[int, Route]] = None) -> float:
+        """
+        Compute the penalties for the differences in revenue and wheelchair trips between drivers
+        :param changes: (optional) Map from driver index to a Route replacing the driver's current route
+        :return: Revenue and wheelchair trip fairness penalties
+        """
+        p = self.problem
+        routes = self.routes
+        if changes:
+            routes = [changes.get(k, route) for k, route in enumerate(routes)]
+        revenues = [route.revenue for route in routes]
+        cost = p.REVENUE_PEN * (max(revenues) - min(revenues)) if revenues else 0.0
+        if p.wheelchair_drivers:
+            wheelchairs = [routes[k].wheelchairs for k in p.wheelchair_drivers]
+            cost += p.W_PEN * (max(wheelchairs) - min(wheelchairs))
+        return cost
+
+    def evaluate(self, changes: Dict[int, List[int]]) -> Optional[Dict[int, Route]]:
+        """
+        Schedule new node sequences for some of the routes without modifying the solution.
+        The routes are rescheduled until the visiting times of legs linked across the changed routes are consistent.
+        :param changes: Map from driver index to the new sequence of nodes visited by the driver
+        :return: Map from driver index to scheduled Route or None if any of the new routes is infeasible
+        """
+        candidates = {k: Route(self.problem, k, stops) for k, stops in changes.items()}
+        saved_route, saved_time = list(self.node_route), list(self.node_time)
+        for k in changes:
+            for s in self.routes[k].stops:
+                self.node_route[s] = -1
+        for route in candidates.values():
+            for s in route.stops:
+                self.node_route[s] = route.driver
+        feasible = False
+        for _ in range(MAX_SCHEDULE_PASSES):
+            changed = False
+            for route in candidates.values():
+                if not route.schedule(self.node_route, self.node_time):
+                    changed = None
+                    break
+                for s, t in zip(route.stops, route.times):
+                    if abs(self.node_time[s] - t) > EPSILON:
+                        changed = True
+                        self.node_time[s] = t
+            if changed is None:
+                break
+            if not changed or len(candidates) == 1:
+                feasible = True
+                break
+        self.node_route, self.node_time = saved_route, saved_time
+        return candidates if feasible else None
+
+    def linked_routes(self, nodes: Iterable[int]) -> Set[int]:
+        """
+        :param nodes: Request nodes
+        :return: Indices of the routes serving legs that must precede or follow the legs of the given nodes
+        """
+        p = self.problem
+        linked = set()
+        for s in nodes:
+            partner = p.previous_leg[s] + p.n if s < p.n else p.next_leg[s - p.n]
+            if partner >= 0 and self.node_route[partner] >= 0:
+                linked.add(self.node_route[partner])
+        return linked
+
+    def apply(self, changes: Dict[int, Route]) -> None:
+        """
+        Replace routes of the solution with new routes. The routes serving legs linked to nodes that were moved or
+        rescheduled by the change are rescheduled as well, so that every node is visited at its earliest time.
+        :param changes: Map from driver index to new Route
+        """
+        previous_route = dict()
+        for k in changes:
+            for s in self.routes[k].stops:
+                previous_route[s] = k
+                self.node_route[s] = -1
+                if s < self.problem.n:
+                    self.unassigned.add(s)
+        for k, route in changes.items():
+            self.routes[k] = route
+            for s in route.stops:
+                self.node_route[s] = k
+                self.unassigned.discard(s)
+        moved = [s for s in previous_route if self.node_route[s] < 0]
+        for route in changes.values():
+            if len(route.times) != len(route.stops) and not route.schedule(self.node_route, self.node_time):
+                raise InvalidSolutionException(f"Route of driver {route.driver} is infeasible")
+            for s, t in zip(route.stops, route.times):
+                if previous_route.get(s) != route.driver or abs(self.node_time[s] - t) > EPSILON:
+                    moved.append(s)
+                self.node_time[s] = t
+        self.reschedule(self.linked_routes(moved) - set(changes))
+
+    def reschedule(self, routes: Optional[Iterable[int]] = None) -> None:
+        """
+        Reschedule routes after the visiting times of legs they depend on have changed. Whenever the visiting time of a
+        leg changes, the route serving the leg that must precede or follow it is rescheduled as well.
+        :param routes: (optional) Indices of the routes to reschedule, all routes by default
+        """
+        pending = list(routes if routes is not None else range(len(self.routes)))
+        queued = set(pending)
+        while pending:
+            k = pending.pop(0)
+            queued.discard(k)
+            route = self.routes[k]
+            if not route.schedule(self.node_route, self.node_time):
+                raise InvalidSolutionException(f"Route of driver {route.driver} became infeasible while rescheduling")
+            changed = []
+            for s, t in zip(route.stops, route.times):
+                if abs(self.node_time[s] - t) > EPSILON:
+                    changed.append(s)
+                    self.node_time[s] = t
+            for linked in self.linked_routes(changed) - {k}:
+                if linked not in queued:
+                    pending.append(linked)
+                    queued.add(linked)
+
+    def remove(self, requests: Iterable[int]) -> None:
+        """
+        Remove requests from the routes serving them
+        :param requests: Requests to remove
+        """
+        by_route = dict()
+        for r in requests:
+            if self.node_route[r] >= 0:
+                by_route.setdefault(self.node_route[r], []).append(r)
+        changes = dict()
+        for k, removed in by_route.items():
+            changes[k] = Route(self.problem, k, list(self.routes[k].stops))
+            changes[k].remove(removed)
+        self.apply(changes)
+
+
+def load_solution(problem: RoutingProblem, solution_df: DataFrame) -> Solution:
+    """
+    Rebuild a Solution from the solution DataFrame of an optimizer, keeping the order in which every driver visits the
+    pickups and dropoffs. The groups of merged legs of each driver are added to the route one at a time in the order
+    of their pickups, and groups that make the route infeasible for the problem are left unassigned.
+    :param problem: RoutingProblem being solved
+    :param solution_df: DataFrame with the solution details
+    :return: Solution serving the feasible part of the given solution
+    """
+    solution = Solution(problem)
+    requests = {trip.id: r for r, trip in enumerate(problem.trips)}
+    drivers = {d.id: k for k, d in enumerate(problem.drivers)}
+    assigned = dict()
+    for trip_id, driver_id, pickup_time, dropoff_time in zip(solution_df['trip_id'], solution_df['driver_id'],
+                                                              solution_df['est_pickup_time'],
+                                                              solution_df['est_dropoff_time']):
+        if trip_id in requests and driver_id in drivers:
+            r = requests[trip_id]
+            solution.node_route[r] = solution.node_route[r + problem.n] = drivers[driver_id]
+            solution.node_time[r], solution.node_time[r + problem.n] = pickup_time, dropoff_time
+            assigned.setdefault(drivers[driver_id], []).append(r)
+
+    changes = dict()
+    for k, served in assigned.items():
+        route = Route(problem, k)
+        kept = []
+        groups = {problem.merge_group(r)[0]: problem.merge_group(r) for r in served}
+        for group in sorted(groups.values(), key=lambda g: solution.node_time[g[0]]):
+            if not all(solution.node_route[r] == k for r in group):
+                continue
+            stops = sorted([s for r in kept + group for s in (r, r + problem.n)],
+                           key=lambda s: (solution.node_time[s], s < problem.n))
+            candidate = Route(problem, k, stops)
+            if candidate.schedule(solution.node_route, solution.node_time):
+                route, kept = candidate, kept + group
+            else:
+                for r in group:
+                    solution.node_route[r] = solution.node_route[r + problem.n] = -1
+        changes[k] = route
+    log.info(f"Loaded solution with {sum(len(route.stops) for route in changes.values()) // 2} of "
+             f"{sum(len(served) for served in assigned.values())} assigned trips")
+    solution.node_route = [-1] * (2 * problem.n)
+    solution.apply(changes)
+    return solution
+
@@ -1,6 +1,11 @@
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import List, Optional, Match, AnyStr, Dict
+from io import BytesIO
+from itertools import islice, chain
+from typing import List, Dict, Iterable, Iterator
 import logging
 import pandas as pd
 from PyPDF2 import PdfFileReader
@@ -9,36 +14,98 @@ from pandas import DataFrame
 
 from avicena.models.MergeAddress import MergeAddress
 from avicena.models.RevenueRate import RevenueRate
-from avicena.util.ParserUtil import standardize_trip_df
+from avicena.util.ParserUtil import standardize_trip_chunk, standardize_trip_legs
 
 log = logging.getLogger(__name__)
 
+MAX_PDF_WORKERS = os.cpu_count() or 1  # Maximum number of processes extracting pages from the PDF
+PAGES_AHEAD_PER_WORKER = 2  # Number of pages each worker may extract before they are consumed
+CHUNK_SIZE = 500  # Number of trip records that are parsed and standardized together
+HEADER_LENGTH = 14  # Number of tokens at the start of the PDF that contain the date of the trips
+RECORD_SEPARATOR = re.compile(r"--\s*--")  # Text between two trip records
 
-def _load_pdf_content(pdf: PdfFileReader) -> str:
+_worker_pdf = None  # PDF loaded by a page extraction worker process
+
+# Pattern of the trip ID at the start of a row of raw data, which is followed by the trip status
+LEADING_TRIP_ID = re.compile(r"^\s*(\S+) \*\*")
+
+# Pattern of a single trip in the raw data, with a named group for each column it is split into
+TRIP_PATTERN = re.compile(
+    r"(?P<trip_id>.*?) \*\* (?P<trip_status>.*?) \*\* (?P<trip_reg>.*?) - (?P<trip_county>.*?) (?P<customer_name>.*?) "
+    r"Age : (?P<customer_age>.*?) (?P<trip_pickup_time>\d{2}:\d{2}) PU (?P<trip_pickup_name>.*?) "
+    r"Phy : (?P<trip_pickup_phone>.{16}) (?P<trip_pickup_address>.*?) (?P<trip_dropoff_time>\d{2}:\d{2}) "
+    r"DO (?P<trip_dropoff_name>.*?) Phy : (?P<trip_dropoff_phone>.{16}) (?P<trip_dropoff_address>.*?) "
+    r"LOS : (?P<trip_los>\S+) (?P<trip_daysofweek>.*?(?=CPay))CPay : (?P<trip_cpay>.*?) PCA : (?P<trip_pca>.*?) "
+    r"AEsc : (?P<trip_aesc>.*?) CEsc : (?P<trip_cesc>.*?) Seats : (?P<trip_seats>.*?) Miles : (?P<trip_miles>\d*)"
+    r"(?P<trip_notes>.*$)")
+
+
+def _open_pdf(trips_file: str) -> None:
+    """
+    Load the PDF once in every page extraction worker process
+    :param trips_file: Path to PDF trips file
+    """
+    global _worker_pdf
+    # The reader keeps reading from its stream, so the bytes are kept in memory instead of an open file handle
+    with open(trips_file, 'rb') as f:
+        _worker_pdf = PdfFileReader(BytesIO(f.read()))
+
+
+def _extract_page(page_number: int) -> str:
+    """
+    :param page_number: Index of a page in the PDF loaded by the worker process
+    :return: the raw text of the page
+    """
+    return _worker_pdf.getPage(page_number).extractText()
+
+
+def _load_pdf_pages(trips_file: str) -> Iterator[str]:
     """
     #################################
     ##        PDF Load content         ##
     #################################
-    :param pdf: PDFFileReader object that has loaded the PDF path
-    :return: the raw text from the PDF
+    Extract the pages of the PDF in a pool of worker processes. Only a few pages per worker are extracted ahead of the
+    page that is consumed, so the text of the whole PDF is never held in memory.
+    :param trips_file: Path to PDF trips file
+    :return: Iterator over the raw text of every page in order
     """
+    with open(trips_file, 'rb') as f:
+        num_pages = PdfFileReader(f).numPages
+    workers = max(1, min(MAX_PDF_WORKERS, num_pages))
+    pages = iter(range(num_pages))
+    found_text = False
+    with ProcessPoolExecutor(workers, initializer=_open_pdf, initargs=(trips_file,)) as executor:
+        pending = deque(executor.submit(_extract_page, page_number)
+                        for page_number in islice(pages, PAGES_AHEAD_PER_WORKER * workers))
+        while pending:
+            text = pending.popleft().result()
+            for page_number in islice(pages, 1):
+                pending.append(executor.submit(_extract_page, page_number))
+            found_text = found_text or text != ""
+            yield text
+    # PyPDF2 cannot read scanned files, so a PDF without any text was most likely scanned
+    if not found_text:
+        log.error('cannot read scanned images.')
 
-    # Discerning the number of pages will allow us to parse through all #the pages
-    num_pages = pdf.numPages
-    count = 0
+
+def _split_text(pages: Iterable[str]) -> Iterator[str]:
+    """
+    Join the pages of text and split them again after the last record separator ("-- --") of each page, so that no
+    trip record is split between two pieces of text. Text after the last separator is carried to the next page.
+    :param pages: raw text of the pages in order
+    :return: Iterator over pieces of the text that each end with a record separator
+    """
     text = ""
-    # The while loop will read each page
-    while count < num_pages:
-        pageObj = pdf.getPage(count)
-        count += 1
-        text += pageObj.extractText()
-    # This if statement exists to check if the above library returned #words. It's done because PyPDF2 cannot read scanned files.
-    if text != "":
-        text = text
-    # If the above returns as False, we run the OCR library textract to #convert scanned/image based PDF files into text
-    else:
-        log.error('cannot read scanned images.')
-    return text
+    for page in pages:
+        text += page
+        end = None
+        for end in RECORD_SEPARATOR.finditer(text):
+            pass
+        if end is not None:
+            yield text[:end.end()]
+            text = text[end.end():]
+    if text:
+        yield text
 
 
 def _tokenize_text(text: str) -> (List[str], int):
@@ -50,70 +117,65 @@ def _tokenize_text(text: str) -> (List[str], int):
     :param text: Parsed Text
     :return: Break up the text into a list of words and return the total number of trips
     """
+    return word_tokenize(text), text.count('Age:')
 
-    def _remove_adjacent(nums):
-        result = []
-        for num in nums:
-            if len(result) == 0 or num != result[-1]:
-                result.append(num)
-        return result
-
-    trip_count = text.count('Age:')
-    tokens = word_tokenize(text)
-    for index, x in enumerate(tokens):
-        if (x == '--') & (tokens[index - 1] == '--'):
-            tokens[index] = 'newline'
-    tokens = _remove_adjacent(tokens)
-    tokens.append('newline')
-    return tokens, trip_count
 
-
-def _initialize_df(tokens: List[str]) -> DataFrame:
+def _split_rows(token_lists: Iterable[List[str]], header_tokens: List[str]) -> Iterator[str]:
     """
     #################################
     ##   Split content into rows   ##
     #################################
-    :param tokens: list of string tokens extracted from PDF
-    :return: A dataframe of rows filled with a single column "raw_data" for each trip to be completed
+    Two adjacent '--' tokens end a row, and repeated tokens are removed
+    :param token_lists: lists of tokens of consecutive pieces of the text
+    :param header_tokens: List that is filled with the first tokens of the PDF, which contain the date of the trips
+    :return: Iterator over the rows of raw data, starting with the header of the PDF
     """
+    previous, kept, row = None, None, []
+    for tokens in token_lists:
+        for x in tokens:
+            if x == '--' and previous == '--':
+                x = 'newline'
+            previous = x
+            if x == kept:
+                continue
+            kept = x
+            if len(header_tokens) < HEADER_LENGTH:
+                header_tokens.append(x)
+            if x == 'newline':
+                yield ' '.join(row)
+                row = []
+            else:
+                row.append(x)
+    if row:
+        yield ' '.join(row)
 
-    list1 = []
-    list2 = []
-    for index, x in enumerate(tokens):
-        if x != 'newline':
-            list1.append(x)
-        elif x == 'newline':
-            list1 = ' '.join(list1)
-            list2.append(list1)
-            list1 = []
-    se = pd.Series(list2)
-    df = pd.DataFrame()
-    df['raw_data'] = se.values
-    df = df[df["raw_data"] != '--']
-    for index, row in df.iterrows():
-        searchString = row['raw_data']
-        if "LogistiCare" in searchString:
-            y = searchString.find("LogistiCare")
-            row['raw_data'] = row['raw_data'][:y]
-        searchString = row['raw_data']
-        searchString = searchString.replace('-- ', '')
-        row['raw_data'] = searchString
-    cols = df.columns.tolist()
-    cols = cols[-1:] + cols[:-1]
-    df = df[cols]
-    df = df.iloc[1:]
-    return df
+
+def _initialize_df(rows: List[str]) -> DataFrame:
+    """
+    :param rows: rows of raw data split from the PDF
+    :return: A dataframe of rows filled with a single column "raw_data" for each trip to be completed
+    """
+    raw_data = pd.Series(rows, dtype=object)
+    raw_data = raw_data[raw_data != '--']
+    raw_data = raw_data.str.split('LogistiCare', n=1).str[0].str.replace('-- ', '', regex=False)
+    return pd.DataFrame({'raw_data': raw_data})
 
 
-def _split_it(raw_data) -> Optional[Match[AnyStr]]:
+def _chunk_rows(rows: Iterator[str]) -> Iterator[DataFrame]:
     """
-    Apply Regex to the raw data column and split it into groups
-    :param raw_data: raw data string
-    :return: A Regex Match
+    :param rows: Iterator over the rows of raw data after the header
+    :return: Iterator over DataFrames with a "raw_data" column of at most CHUNK_SIZE rows each, indexed by the position
+             of the rows after the header
     """
-    return re.search(
-        r"(.*?) \*\* (.*?) \*\* (.*?) - (.*?) (.*?) Age : (.*?) (\d{2}:\d{2}) PU (.*?) Phy : (.{16}) (.*?) (\d{2}:\d{2}) DO (.*?) Phy : (.{16}) (.*?) LOS : (\S+) (.*?(?=CPay))CPay : (.*?) PCA : (.*?) AEsc : (.*?) CEsc : (.*?) Seats : (.*?) Miles : (\d*)(.*$)",
-        raw_data)
+    position = 0
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return
+        df = _initialize_df(chunk)
+        df.index += position
+        position += len(chunk)
+        yield df
 
 
 def _clean_address(addr: str) -> str:
@@ -130,62 +192,59 @@ def _clean_address(addr: str) -> str:
     return addr
 
 
-def _parse_raw_data(df: DataFrame, tokens: List[str]) -> None:
+def _trip_date(tokens: List[str]) -> str:
+    """
+    :param tokens: First tokens of the PDF
+    :return: Date of the trips in the PDF in MM-DD-YY format
+    """
+    s = (tokens[10] + ' ' + tokens[11] + tokens[12] + ' ' + tokens[13])
+    d = datetime.strptime(s, '%B %d, %Y')
+    return d.strftime('%m-%d-%y')
+
+
+def _parse_raw_data(df: DataFrame, tokens: List[str]) -> DataFrame:
     """
-    Split the 'raw_data' column in the dataframe and populate it with individual details of each column
+    Split the 'raw_data' column in the dataframe and populate it with individual details of each column.
+    Every row is matched against the trip pattern once and all of its groups are extracted together. Rows that do not
+    match the pattern are logged and dropped.
     :param df: DataFrame with `raw_data` column parsed from PDF
-    :param tokens: Raw Tokens from the PDF
+    :param tokens: First tokens of the PDF, which contain the date of the trips
+    :return: DataFrame with the raw data split into columns
     """
     #################################
     ## Split raw_data into columns ##
     #################################
-    df['trip_id'] = df['raw_data'].apply(lambda x: _split_it(x).group(1))
-    df['trip_status'] = df['raw_data'].apply(lambda x: _split_it(x).group(2))
-    df['trip_reg'] = df['raw_data'].apply(lambda x: _split_it(x).group(3))
-    df['trip_county'] = df['raw_data'].apply(lambda x: _split_it(x).group(4))
-    df['customer_name'] = df['raw_data'].apply(lambda x: _split_it(x).group(5))
-    df['customer_age'] = df['raw_data'].apply(lambda x: _split_it(x).group(6))
-    df['trip_pickup_time'] = df['raw_data'].apply(lambda x: _split_it(x).group(7))
-    df['trip_pickup_name'] = df['raw_data'].apply(lambda x: _split_it(x).group(8))
-    df['trip_pickup_phone'] = df['raw_data'].apply(lambda x: _split_it(x).group(9))
-    df['trip_pickup_address'] = df['raw_data'].apply(lambda x: _clean_address(_split_it(x).group(10)))
-    df['trip_dropoff_time'] = df['raw_data'].apply(lambda x: _split_it(x).group(11))
-    df['trip_dropoff_name'] = df['raw_data'].apply(lambda x: _split_it(x).group(12))
-    df['trip_dropoff_phone'] = df['raw_data'].apply(lambda x: _split_it(x).group(13))
-    df['trip_dropoff_address'] = df['raw_data'].apply(lambda x: _clean_address(_split_it(x).group(14)))
-    df['trip_los'] = df['raw_data'].apply(lambda x: _split_it(x).group(15))
-    df['trip_daysofweek'] = df['raw_data'].apply(lambda x: _split_it(x).group(16))
-    df['trip_cpay'] = df['raw_data'].apply(lambda x: _split_it(x).group(17))
-    df['trip_pca'] = df['raw_data'].apply(lambda x: _split_it(x).group(18))
-    df['trip_aesc'] = df['raw_data'].apply(lambda x: _split_it(x).group(19))
-    df['trip_cesc'] = df['raw_data'].apply(lambda x: _split_it(x).group(20))
-    df['trip_seats'] = df['raw_data'].apply(lambda x: _split_it(x).group(21))
-    df['trip_miles'] = df['raw_data'].apply(lambda x: _split_it(x).group(22))
-    df['trip_notes'] = df['raw_data'].apply(lambda x: _split_it(x).group(23))
-    s = (tokens[10] + ' ' + tokens[11] + tokens[12] + ' ' + tokens[13])
-    d = datetime.strptime(s, '%B %d, %Y')
-    filedate = d.strftime('%m-%d-%y')
-    df['trip_date'] = filedate
+    details = df['raw_data'].str.extract(TRIP_PATTERN)
+    unparsed = details['trip_id'].isna()
+    if unparsed.any():
+        # The raw rows contain patient details, so only their positions and the IDs of their trips are logged
+        trip_ids = df.loc[unparsed, 'raw_data'].str.extract(LEADING_TRIP_ID, expand=False).dropna()
+        log.warning(f"{unparsed.sum()} rows could not be parsed and will be skipped: rows "
+                    f"{list(df.index[unparsed])} with trip IDs {list(trip_ids)}")
+    df = pd.concat([df[~unparsed], details[~unparsed]], axis='columns')
+    df['trip_pickup_address'] = df['trip_pickup_address'].map(_clean_address)
+    df['trip_dropoff_address'] = df['trip_dropoff_address'].map(_clean_address)
+    df['trip_date'] = _trip_date(tokens)
+    return df
 
 
-def _store_raw_data(df: DataFrame, output_directory: str, name: str, trip_count: int) -> None:
+def _store_raw_data(df: DataFrame, path: str, write_header: bool) -> None:
     """
-    Save the raw parsed data in the directory
+    Append a chunk of the raw parsed data to the CSV file in the output directory
     :param df: DataFrame with the raw data split into columns
-    :param output_directory: directory where parsed DataFrame will be stored as CSV
-    :param name: name of the model run
-    :param trip_count: total number of trips found in PDF
+    :param path: path of the CSV file
+    :param write_header: True for the first chunk, which starts a new file
     """
-    filedate = df['trip_date'].iloc[0].replace('-', '_')
-    log.info(str(len(df)) + "/" + str(trip_count) + " trips parsed.")
-    df.to_csv(output_directory + name + filedate + '.csv', encoding='utf-8', index=False)
-    log.info('PDF file converted to ' + output_directory + name + filedate + '.csv')
+    df.to_csv(path, encoding='utf-8', index=False, mode='w' if write_header else 'a', header=write_header)
 
 
 def parse_trips_to_df(trips_file: str, merge_details: Dict[str, MergeAddress],
                       revenue_table: Dict[str, List[RevenueRate]], output_directory: str) -> DataFrame:
     """
-    Parse in the input PDF into a DataFrame with the trip details extracted
+    Parse in the input PDF into a DataFrame with the trip details extracted.
+    The PDF is processed as a stream: pages are extracted in parallel, and the trip records are parsed, stored, and
+    standardized in chunks as soon as their pages are loaded. Only the steps that relate legs of the same patient wait
+    for all trips.
     :param trips_file: Path to PDF trips file
     :param merge_details: dictionary mapping address substring to actual MergeAddress object
     :param revenue_table: dictionary mapping level of service to a list of associated revenue rates
@@ -194,15 +253,36 @@ def parse_trips_to_df(trips_file: str, merge_details: Dict[str, MergeAddress],
     """
     z = trips_file.find(".pdf")
     name = trips_file[trips_file.rfind('/') + 1:z]
-    pdfFileObj = open(trips_file, 'rb')
-    loaded_pdf = PdfFileReader(pdfFileObj)
-    text = _load_pdf_content(loaded_pdf)
-    tokens, trip_count = _tokenize_text(text)
-    df = _initialize_df(tokens)
-    _parse_raw_data(df, tokens)
-    _store_raw_data(df, output_directory, name, trip_count)
-    standardize_trip_df(df, merge_details, revenue_table)
-    df.drop(['raw_data', 'trip_notes', 'trip_reg', 'trip_county', 'customer_name', 'customer_age', 'trip_pickup_name',
-             'trip_pickup_phone', 'trip_dropoff_name', 'trip_dropoff_phone', 'trip_daysofweek', 'trip_cpay', 'trip_pca',
-             'trip_aesc', 'trip_cesc', 'trip_seats', 'trip_notes'], axis='columns', inplace=True)
+    trip_count = 0
+
+    def count_trips(text: str) -> List[str]:
+        nonlocal trip_count
+        tokens, count = _tokenize_text(text)
+        trip_count += count
+        return tokens
+
+    header_tokens = []
+    rows = _split_rows(map(count_trips, _split_text(_load_pdf_pages(trips_file))), header_tokens)
+    next(rows, None)  # Skip the header of the PDF
+    # The tokens with the date may continue past the header row, so rows are buffered until all of them are read
+    buffered_rows = []
+    while len(header_tokens) < HEADER_LENGTH:
+        row = next(rows, None)
+        if row is None:
+            break
+        buffered_rows.append(row)
+    raw_data_file = output_directory + name + _trip_date(header_tokens).replace('-', '_') + '.csv'
+    chunks = []
+    for df in _chunk_rows(chain(buffered_rows, rows)):
+        df = _parse_raw_data(df, header_tokens)
+        _store_raw_data(df, raw_data_file, write_header=len(chunks) == 0)
+        standardize_trip_chunk(df, revenue_table)
+        df.drop(['raw_data', 'trip_notes', 'trip_reg', 'trip_county', 'customer_name', 'customer_age',
+                 'trip_pickup_name', 'trip_pickup_phone', 'trip_dropoff_name', 'trip_dropoff_phone', 'trip_daysofweek',
+                 'trip_cpay', 'trip_pca', 'trip_aesc', 'trip_cesc', 'trip_seats'], axis='columns', inplace=True)
+        chunks.append(df)
+    df = pd.concat(chunks, ignore_index=True)
+    log.info(str(len(df)) + "/" + str(trip_count) + " trips parsed.")
+    log.info('PDF file converted to ' + raw_data_file)
+    standardize_trip_legs(df, merge_details)
     return df[df['trip_status'] != "CANCELED"]
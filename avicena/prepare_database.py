@@ -6,7 +6,7 @@ from avicena.models.Driver import load_drivers_from_csv
 from avicena.models.MergeAddress import load_merge_details_from_csv
 from avicena.models.RevenueRate import load_revenue_table_from_csv
 from avicena.util.ConfigValidation import _validate_db_details
-from avicena.util.Database import close_db_session, create_db_session, save_to_db_session, commit_db_session
+from avicena.util.Database import close_db_session, create_db_session, bulk_save_and_commit_to_db
 from avicena.util.Exceptions import InvalidConfigException
 
 def avicena_import_db():
@@ -37,19 +37,10 @@ def avicena_import_db():
     db_session = create_db_session(app_config['database'])
 
     rev_table = load_revenue_table_from_csv(args.revenue_table_file)
-    for level_of_service in rev_table:
-        for rate in rev_table[level_of_service]:
-            save_to_db_session(db_session, rate)
-
     merge_details = load_merge_details_from_csv(args.merge_details_file)
-    for merge_address in merge_details.values():
-        save_to_db_session(db_session, merge_address)
-
     drivers = load_drivers_from_csv(args.driver_details_file)
-    for driver in drivers:
-        save_to_db_session(db_session, driver)
-
-    commit_db_session(db_session)
+    rates = [rate for level_of_service in rev_table for rate in rev_table[level_of_service]]
+    bulk_save_and_commit_to_db(db_session, rates + list(merge_details.values()) + drivers)
     close_db_session(db_session)
 
 if __name__ == "__main__":
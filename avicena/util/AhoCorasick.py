@@ -0,0 +1,64 @@
+from collections import deque
+from typing import List, Dict, Optional
+
+
+class AhoCorasick:
+    """
+    This class finds which of a fixed set of patterns occur in a text with an Aho-Corasick automaton.
+    The automaton is built once for all patterns, after which every text is scanned a single time no matter how many
+    patterns there are.
+    """
+
+    def __init__(self, patterns: List[str]) -> None:
+        """
+        Build the automaton for the patterns
+        :param patterns: Strings to search for. Empty patterns are ignored.
+        """
+        self.goto: List[Dict[str, int]] = [dict()]  # Transitions of every state by character
+        self.fail: List[int] = [0]  # State of the longest proper suffix of every state that is also a state
+        self.first: List[Optional[int]] = [None]  # Lowest index of the patterns that end in every state
+        for index, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append(dict())
+                    self.fail.append(0)
+                    self.first.append(None)
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            if self.first[state] is None:
+                self.first[state] = index
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.goto[fail].get(char, 0)
+                # A state also matches every pattern that ends in its fail state
+                inherited = self.first[self.fail[next_state]]
+                if inherited is not None and (self.first[next_state] is None or inherited < self.first[next_state]):
+                    self.first[next_state] = inherited
+
+    def first_match(self, text: str) -> Optional[int]:
+        """
+        :param text: Text to search
+        :return: Lowest index of the patterns that occur in the text or None if none of them occur
+        """
+        best = None
+        state = 0
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            match = self.first[state]
+            if match is not None and (best is None or match < best):
+                best = match
+                if best == 0:
+                    break
+        return best
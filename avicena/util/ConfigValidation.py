@@ -1,5 +1,6 @@
 from typing import Any, Dict
 
+from avicena.util.DataFrameStorage import STORAGE_FORMATS
 from avicena.util.Exceptions import InvalidConfigException
 
 
@@ -18,6 +19,42 @@ def _validate_db_details(db_config: Dict[str, Any]) -> bool:
     return db_config['enabled']
 
 
+def _validate_geocoder_cache_details(cache_config: Dict[str, Any]) -> None:
+    """
+    Validate the optional geocoder cache details in the app_config dictionary that has been loaded
+    :param cache_config: the child dictionary with geocoder cache specific details
+    """
+    if 'path' not in cache_config:
+        raise InvalidConfigException("app_config.geocoder_cache missing required field path")
+    if type(cache_config['path']) != str:
+        raise InvalidConfigException(
+            f"app_config.geocoder_cache.path is expected to be {str}, found {type(cache_config['path'])} instead")
+    optional_types = {'ttl_days': (int, float), 'max_entries': (int,)}
+    for field in optional_types:
+        if cache_config.get(field) is not None and type(cache_config[field]) not in optional_types[field]:
+            raise InvalidConfigException(
+                f"app_config.geocoder_cache.{field} is expected to be one of {optional_types[field]}, found {type(cache_config[field])} instead")
+
+
+def _validate_geocoder_details(geocoder_config: Dict[str, Any]) -> None:
+    """
+    Validate the optional geocoder backend details in the app_config dictionary that has been loaded
+    :param geocoder_config: the child dictionary with geocoder backend specific details
+    """
+    if type(geocoder_config.get('backend', 'OpenCage')) != str:
+        raise InvalidConfigException(
+            f"app_config.geocoder.backend is expected to be {str}, found {type(geocoder_config['backend'])} instead")
+    if geocoder_config.get('backend') == 'Gazetteer':
+        if 'gazetteer_path' not in geocoder_config:
+            raise InvalidConfigException("app_config.geocoder missing required field gazetteer_path")
+        if type(geocoder_config['gazetteer_path']) != str:
+            raise InvalidConfigException(
+                f"app_config.geocoder.gazetteer_path is expected to be {str}, found {type(geocoder_config['gazetteer_path'])} instead")
+    if geocoder_config.get('fuzzy_cutoff') is not None and type(geocoder_config['fuzzy_cutoff']) not in (int, float):
+        raise InvalidConfigException(
+            f"app_config.geocoder.fuzzy_cutoff is expected to be one of {(int, float)}, found {type(geocoder_config['fuzzy_cutoff'])} instead")
+
+
 def validate_app_config(loaded_config: Dict[str, Any]) -> None:
     """
     Validate the overall app_config.yaml file.
@@ -32,6 +69,22 @@ def validate_app_config(loaded_config: Dict[str, Any]) -> None:
             raise InvalidConfigException(
                 f"app_config.{field} is expected to be {required_types[field]}, found {type(loaded_config[field])} instead")
     db_enabled = _validate_db_details(loaded_config['database'])
+    if 'geocoder_cache' in loaded_config:
+        if type(loaded_config['geocoder_cache']) != dict:
+            raise InvalidConfigException(
+                f"app_config.geocoder_cache is expected to be {dict}, found {type(loaded_config['geocoder_cache'])} instead")
+        _validate_geocoder_cache_details(loaded_config['geocoder_cache'])
+    if 'geocoder' in loaded_config:
+        if type(loaded_config['geocoder']) != dict:
+            raise InvalidConfigException(
+                f"app_config.geocoder is expected to be {dict}, found {type(loaded_config['geocoder'])} instead")
+        _validate_geocoder_details(loaded_config['geocoder'])
+    if 'output_format' in loaded_config and loaded_config['output_format'] not in STORAGE_FORMATS:
+        raise InvalidConfigException(f"app_config.output_format is expected to be one of {list(STORAGE_FORMATS)}, "
+                                     f"found {loaded_config['output_format']} instead")
+    if 'parse_cache_directory' in loaded_config and type(loaded_config['parse_cache_directory']) != str:
+        raise InvalidConfigException(f"app_config.parse_cache_directory is expected to be {str}, found "
+                                     f"{type(loaded_config['parse_cache_directory'])} instead")
     if not db_enabled:
         non_db_required_fields = {'merge_address_table_path': str, 'revenue_table_path': str, 'driver_table_path': str,
                                   'output_directory': str}
@@ -0,0 +1,110 @@
+import os
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pandas import DataFrame
+
+from avicena.util.Exceptions import InvalidConfigException
+
+# File extension of every supported storage format
+STORAGE_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Columns and types of the solution DataFrame returned by every optimizer, including the coordinates of the pickup,
+# dropoff, and driver home of every trip
+SOLUTION_SCHEMA = pa.schema([('trip_id', pa.string()), ('driver_id', pa.int64()), ('driver_name', pa.string()),
+                             ('trip_date', pa.string()), ('trip_pickup_address', pa.string()),
+                             ('trip_pickup_time', pa.float64()), ('est_pickup_time', pa.float64()),
+                             ('trip_dropoff_address', pa.string()), ('trip_dropoff_time', pa.float64()),
+                             ('est_dropoff_time', pa.float64()), ('trip_los', pa.string()),
+                             ('est_miles', pa.float64()), ('est_time', pa.float64()), ('trip_rev', pa.float64()),
+                             ('trip_pickup_lat', pa.float64()), ('trip_pickup_lon', pa.float64()),
+                             ('trip_dropoff_lat', pa.float64()), ('trip_dropoff_lon', pa.float64()),
+                             ('driver_lat', pa.float64()), ('driver_lon', pa.float64())])
+
+# Coordinate columns of the solution DataFrame. Solutions saved before they were added do not have them.
+SOLUTION_COORDINATE_COLUMNS = ['trip_pickup_lat', 'trip_pickup_lon', 'trip_dropoff_lat', 'trip_dropoff_lon',
+                               'driver_lat', 'driver_lon']
+
+# Columns and types of the parsed trips DataFrame produced by every parser
+PARSED_TRIPS_SCHEMA = pa.schema([('trip_id', pa.string()), ('trip_pickup_address', pa.string()),
+                                 ('trip_pickup_time', pa.float64()), ('trip_pickup_lat', pa.float64()),
+                                 ('trip_pickup_lon', pa.float64()), ('trip_dropoff_address', pa.string()),
+                                 ('trip_dropoff_time', pa.float64()), ('trip_dropoff_lat', pa.float64()),
+                                 ('trip_dropoff_lon', pa.float64()), ('trip_los', pa.string()),
+                                 ('trip_miles', pa.float64()), ('merge_flag', pa.bool_()),
+                                 ('trip_revenue', pa.float64())])
+
+
+def storage_format(path: str) -> str:
+    """
+    :param path: Path of a stored DataFrame
+    :return: Storage format of the file based on its extension. Files with unknown extensions are stored as CSV.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    for file_format, format_extension in STORAGE_FORMATS.items():
+        if extension == format_extension:
+            return file_format
+    return 'csv'
+
+
+def storage_path(directory: str, name: str, file_format: str) -> str:
+    """
+    :param directory: Directory of the file
+    :param name: Name of the file without extension
+    :param file_format: Storage format of the file
+    :return: Path of the file with the extension of its storage format
+    """
+    if file_format not in STORAGE_FORMATS:
+        raise InvalidConfigException(f"Unknown output_format {file_format}. Expected one of {list(STORAGE_FORMATS)}")
+    return os.path.join(directory, name + STORAGE_FORMATS[file_format])
+
+
+def suffixed_path(path: str, suffix: str) -> str:
+    """
+    :param path: Path of a stored DataFrame
+    :param suffix: Suffix to add to the name of the file
+    :return: Path of a file in the same storage format with the suffix added before its extension
+    """
+    root, extension = os.path.splitext(path)
+    return root + suffix + extension
+
+
+def save_df(df: DataFrame, path: str, schema: Optional[pa.Schema] = None) -> None:
+    """
+    Save a DataFrame in the storage format given by the extension of the path.
+    CSV files are written as before, with the index. Parquet and Arrow IPC files store the columns of the schema with
+    their exact types, so floats are not rounded through text.
+    :param df: DataFrame to save
+    :param path: Path of the file
+    :param schema: (optional) Columns and types to store in Parquet and Arrow IPC files. All columns if omitted.
+    """
+    file_format = storage_format(path)
+    if file_format == 'csv':
+        df.to_csv(path)
+        return
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    if file_format == 'parquet':
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def load_df(path: str, schema: Optional[pa.Schema] = None) -> DataFrame:
+    """
+    Load a DataFrame from the storage format given by the extension of the path.
+    Parquet and Arrow IPC files are memory-mapped instead of read into a buffer first, and their columns already have
+    the stored types. CSV columns in the schema are read with the schema's types.
+    :param path: Path of the file
+    :param schema: (optional) Columns and types expected in the file
+    :return: Loaded DataFrame
+    """
+    file_format = storage_format(path)
+    if file_format == 'csv':
+        dtype = {field.name: field.type.to_pandas_dtype() for field in schema} if schema is not None else None
+        return pd.read_csv(path, dtype=dtype)
+    if file_format == 'parquet':
+        return pq.read_table(path, memory_map=True).to_pandas()
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all().to_pandas()
@@ -1,8 +1,11 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, List
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
 from sqlalchemy.orm import Session
 
+from avicena.models.Assignment import Assignment
+
 
 def create_db_session(db_config: Dict[str, Any]) -> Session:
     """
@@ -10,7 +13,11 @@ def create_db_session(db_config: Dict[str, Any]) -> Session:
     :param db_config: database specific section of the app_config.yaml
     :return: SQLAlchmey database connection
     """
-    engine = create_engine(db_config['url'])
+    options = dict()
+    if make_url(db_config['url']).get_dialect().driver == 'psycopg2':
+        # Send the rows of bulk inserts in multi-row VALUES pages instead of one statement per row
+        options['executemany_mode'] = 'values'
+    engine = create_engine(db_config['url'], **options)
     session = Session(engine)
     return session
 
@@ -49,3 +56,43 @@ def save_and_commit_to_db(session: Session, item: Any):
     save_to_db_session(session, item)
     commit_db_session(session)
     return item
+
+
+def bulk_save_and_commit_to_db(session: Session, items: Iterable[Any]) -> None:
+    """
+    Insert many new objects and commit them in a single transaction.
+    Objects of each table are inserted with one executemany INSERT instead of being flushed one by one, so
+    relationships are not followed, and the database generated IDs are not set on the objects.
+    :param session: Database connection session
+    :param items: New objects to add to the database
+    """
+    try:
+        session.bulk_save_objects(list(items))
+        commit_db_session(session)
+    except Exception:
+        session.rollback()
+        raise
+
+
+def save_and_commit_assignments_to_db(session: Session, assignments: List[Assignment]) -> List[Assignment]:
+    """
+    Insert many Assignments along with all of their DriverAssignments and commit them in a single transaction.
+    The Assignments are inserted first so that their generated IDs can be set on their DriverAssignments, which are
+    then inserted together with one executemany INSERT.
+    :param session: Database connection session
+    :param assignments: New Assignments to add to the database
+    :return: The Assignments with their IDs set
+    """
+    try:
+        session.bulk_save_objects(assignments, return_defaults=True)
+        driver_assignments = []
+        for assignment in assignments:
+            for driver_assignment in assignment.driver_assignments:
+                driver_assignment.assignment_id = assignment.id
+                driver_assignments.append(driver_assignment)
+        session.bulk_save_objects(driver_assignments)
+        commit_db_session(session)
+    except Exception:
+        session.rollback()
+        raise
+    return assignments
@@ -14,7 +14,7 @@ class InvalidConfigException(Exception):
 
 class RevenueCalculationException(Exception):
     """
-    Raised when Revenue Table is missing the level of service for a trip
+    Raised when Revenue Table is missing the level of service or a mileage bracket for trips, or its brackets overlap
     """
     pass
 
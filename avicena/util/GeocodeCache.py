@@ -0,0 +1,125 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple, Dict
+
+log = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 60 * 60 * 24
+
+
+class GeocodeCache:
+    """
+    This class represents a persistent cache of geocoded addresses backed by a SQLite file.
+    Addresses are normalized before being used as keys so that trivial differences in spacing, casing, or comma
+    placement between input files do not cause a second lookup for the same address.
+    Entries can optionally expire after a number of days and the cache can be capped to a maximum number of entries,
+    in which case the least recently accessed entries are evicted first.
+    """
+
+    def __init__(self, path: str, ttl_days: Optional[float] = None, max_entries: Optional[int] = None) -> None:
+        """
+        Open (or create) the cache file
+        :param path: Path to the SQLite file storing the cache
+        :param ttl_days: (optional) Number of days after which a cached coordinate is considered expired
+        :param max_entries: (optional) Maximum number of addresses kept in the cache
+        """
+        self.path = path
+        self.ttl = ttl_days * SECONDS_PER_DAY if ttl_days else None
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS geocode_cache (address TEXT PRIMARY KEY, lat REAL NOT NULL, "
+                           "lon REAL NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS geocode_cache_last_access ON geocode_cache (last_access)")
+        self._conn.commit()
+        self.evict_expired()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+
+    @staticmethod
+    def normalize_address(addr: str) -> str:
+        """
+        Normalize an address so it can be used as a cache key
+        :param addr: Raw address string
+        :return: Lower case address with whitespace collapsed and consistent spacing around commas
+        """
+        addr = re.sub(r"\s*,\s*", ", ", addr.strip())
+        return re.sub(r"\s+", " ", addr).lower()
+
+    def get(self, addr: str) -> Optional[Tuple[float, float]]:
+        """
+        Look up the coordinates of an address in the cache
+        :param addr: Address to look up
+        :return: Latitude, Longitude of the address if cached and not expired, otherwise None
+        """
+        key = self.normalize_address(addr)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT lat, lon, created_at FROM geocode_cache WHERE address = ?",
+                                     (key,)).fetchone()
+            if row is None or (self.ttl is not None and now - row[2] > self.ttl):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE geocode_cache SET last_access = ? WHERE address = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return row[0], row[1]
+
+    def put(self, addr: str, coord: Tuple[float, float]) -> None:
+        """
+        Store the coordinates of an address in the cache, evicting the least recently accessed entries if the cache
+        has grown past its size cap
+        :param addr: Address that was geocoded
+        :param coord: Latitude, Longitude of the address
+        """
+        key = self.normalize_address(addr)
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute("UPDATE geocode_cache SET lat = ?, lon = ?, created_at = ?, last_access = ? "
+                                        "WHERE address = ?", (coord[0], coord[1], now, now, key))
+            if cursor.rowcount == 0:
+                self._conn.execute("INSERT INTO geocode_cache VALUES (?, ?, ?, ?, ?)",
+                                   (key, coord[0], coord[1], now, now))
+                self._size += 1
+            if self.max_entries is not None and self._size > self.max_entries:
+                overflow = self._size - self.max_entries
+                self._conn.execute("DELETE FROM geocode_cache WHERE address IN (SELECT address FROM geocode_cache "
+                                   "ORDER BY last_access ASC LIMIT ?)", (overflow,))
+                self._size -= overflow
+                log.debug(f"Evicted {overflow} least recently used addresses from geocode cache")
+            self._conn.commit()
+
+    def evict_expired(self) -> int:
+        """
+        Remove all entries older than the configured TTL
+        :return: Number of entries removed
+        """
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM geocode_cache WHERE created_at < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+            if hasattr(self, '_size'):
+                self._size -= cursor.rowcount
+        if cursor.rowcount:
+            log.info(f"Evicted {cursor.rowcount} expired addresses from geocode cache")
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: Dictionary with the number of cache hits, misses, and entries currently stored
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': self._size}
+
+    def close(self) -> None:
+        """
+        Close the connection to the cache file
+        """
+        log.info(f"Geocode cache statistics: {self.stats()}")
+        self._conn.close()
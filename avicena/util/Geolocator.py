@@ -1,32 +1,304 @@
+import atexit
+import difflib
 import os
-from typing import Optional
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Iterable, Tuple, Dict, Any, Callable
 import logging
-from opencage.geocoder import OpenCageGeocode
+
+import numpy as np
+import pandas as pd
+from opencage.geocoder import OpenCageGeocode, RateLimitExceededError
+
+from avicena.util.Exceptions import InvalidConfigException
+from avicena.util.GeocodeCache import GeocodeCache
+
+MAX_GEOCODER_WORKERS = 8
+MAX_GEOCODER_ATTEMPTS = 5
+INITIAL_BACKOFF_SECONDS = 1.0
 
 locations = {}
+geocode_cache = None
+geocoder = None
+_geocoders = {}
+_geocoders_lock = threading.Lock()
 
 log = logging.getLogger(__name__)
 
 
+class Geocoder:
+    """
+    This represents a Geocoder backend.
+    Every geocoder backend must extend from Geocoder and implement the "geocode" method. Backends that cannot be
+    safely queried from several threads at once must set supports_concurrency to False.
+    """
+    supports_concurrency = True
+
+    def geocode(self, addr: str) -> Optional[Tuple[float, float]]:
+        """
+        Find the latitude and longitude for an address
+        :param addr: Address to geocode
+        :return: Latitude, Longitude of address or None if the address could not be found
+        """
+        raise NotImplementedError("geocode must be implemented by child of Geocoder")
+
+
+class OpenCageGeocoder(Geocoder):
+    """
+    Geocoder backend that queries the OpenCage Geocoding API over the network.
+    """
+
+    def __init__(self, key: Optional[str]) -> None:
+        """
+        Initialize the OpenCage client
+        :param key: string for geocoder key
+        """
+        self._client = OpenCageGeocode(key)
+
+    def geocode(self, addr: str) -> Optional[Tuple[float, float]]:
+        """
+        Query OpenCage for an address, backing off exponentially while the service reports that the rate limit has
+        been exceeded
+        :param addr: Address to geocode
+        :return: Latitude, Longitude of address or None if the address could not be found
+        """
+        delay = INITIAL_BACKOFF_SECONDS
+        for attempt in range(MAX_GEOCODER_ATTEMPTS):
+            try:
+                l1loc = self._client.geocode(addr)
+                break
+            except RateLimitExceededError:
+                if attempt == MAX_GEOCODER_ATTEMPTS - 1:
+                    raise
+                log.warning(f"Geocoder rate limit exceeded while looking up {addr}. Retrying in {delay} seconds")
+                time.sleep(delay)
+                delay *= 2
+        try:
+            return l1loc[0]['geometry']['lat'], l1loc[0]['geometry']['lng']
+        except IndexError:
+            log.warning(f"Couldn't find coordinates for  {addr}")
+            return None
+
+
+class GazetteerGeocoder(Geocoder):
+    """
+    Geocoder backend that resolves addresses offline from a preloaded gazetteer.
+    The gazetteer is either a CSV file with the columns address, lat, lon or a SQLite file with a table of the same
+    columns called gazetteer. A SQLite file produced by the geocode cache may also be used directly.
+    Addresses are matched exactly after normalization, falling back to the closest fuzzy match sharing the same leading
+    token (typically the street number).
+    """
+    supports_concurrency = False
+
+    def __init__(self, path: str, fuzzy_cutoff: float = 0.85) -> None:
+        """
+        Load the gazetteer into memory
+        :param path: Path to the CSV or SQLite gazetteer
+        :param fuzzy_cutoff: Minimum similarity ratio in [0, 1] for a fuzzy match to be accepted
+        """
+        self.fuzzy_cutoff = fuzzy_cutoff
+        if path.endswith('.csv'):
+            gazetteer_df = pd.read_csv(path)
+        else:
+            conn = sqlite3.connect(path)
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            table = 'gazetteer' if 'gazetteer' in tables else 'geocode_cache'
+            gazetteer_df = pd.read_sql_query(f"SELECT address, lat, lon FROM {table}", conn)
+            conn.close()
+        self._exact = {GeocodeCache.normalize_address(addr): (float(lat), float(lon)) for addr, lat, lon in
+                       zip(gazetteer_df['address'], gazetteer_df['lat'], gazetteer_df['lon'])}
+        self._by_leading_token = dict()
+        for addr in self._exact:
+            self._by_leading_token.setdefault(addr.split(' ', 1)[0], []).append(addr)
+        log.info(f"Loaded {len(self._exact)} addresses from gazetteer {path}")
+
+    def geocode(self, addr: str) -> Optional[Tuple[float, float]]:
+        """
+        Look up an address in the gazetteer
+        :param addr: Address to geocode
+        :return: Latitude, Longitude of address or None if no sufficiently close address is in the gazetteer
+        """
+        key = GeocodeCache.normalize_address(addr)
+        if key in self._exact:
+            return self._exact[key]
+        candidates = self._by_leading_token.get(key.split(' ', 1)[0], [])
+        matches = difflib.get_close_matches(key, candidates, n=1, cutoff=self.fuzzy_cutoff)
+        if matches:
+            log.debug(f"Fuzzy matched {addr} to gazetteer address {matches[0]}")
+            return self._exact[matches[0]]
+        log.warning(f"Couldn't find coordinates for  {addr}")
+        return None
+
+
+# Supported Geocoder backends that will be passed into the Config file
+geocoders = {'OpenCage': OpenCageGeocoder, 'Gazetteer': GazetteerGeocoder}
+
+
+def configure_geocoder(geocoder_config: Dict[str, Any], key: Optional[str] = None) -> Geocoder:
+    """
+    Select the geocoder backend used by all address lookups
+    :param geocoder_config: geocoder specific section of the app_config.yaml
+    :param key: optional string for geocoder key used by the OpenCage backend
+    :return: The Geocoder that was configured
+    """
+    global geocoder
+    backend = geocoder_config.get('backend', 'OpenCage')
+    if backend == 'OpenCage':
+        geocoder = OpenCageGeocoder(key if key is not None else os.environ.get("GEOCODER_KEY"))
+    elif backend == 'Gazetteer':
+        geocoder = GazetteerGeocoder(geocoder_config['gazetteer_path'], geocoder_config.get('fuzzy_cutoff', 0.85))
+    else:
+        raise InvalidConfigException(f"Invalid geocoder backend {backend}")
+    return geocoder
+
+
+def configure_geocode_cache(path: str, ttl_days: Optional[float] = None,
+                            max_entries: Optional[int] = None) -> GeocodeCache:
+    """
+    Enable the persistent geocode cache used by all address lookups
+    :param path: Path to the SQLite file storing the cache
+    :param ttl_days: (optional) Number of days after which a cached coordinate is considered expired
+    :param max_entries: (optional) Maximum number of addresses kept in the cache
+    :return: The GeocodeCache that was configured
+    """
+    global geocode_cache
+    if geocode_cache is not None:
+        geocode_cache.close()
+    else:
+        # Report the hit rate of the run and close the cache file when the process exits
+        atexit.register(close_geocode_cache)
+    geocode_cache = GeocodeCache(path, ttl_days, max_entries)
+    return geocode_cache
+
+
+def close_geocode_cache() -> None:
+    """
+    Log the statistics of the persistent geocode cache, if one was configured, and close it
+    """
+    global geocode_cache
+    if geocode_cache is not None:
+        geocode_cache.close()
+        geocode_cache = None
+
+
+def _get_geocoder(key: Optional[str]) -> Geocoder:
+    """
+    Get the configured geocoder backend. If none has been configured, an OpenCage backend shared by all lookups made
+    with the given key is used.
+    :param key: string for geocoder key
+    :return: Geocoder backend
+    """
+    if geocoder is not None:
+        return geocoder
+    with _geocoders_lock:
+        if key not in _geocoders:
+            _geocoders[key] = OpenCageGeocoder(key)
+        return _geocoders[key]
+
+
+def _find_cached_coord_lat_lon(addr: str) -> Optional[Tuple[float, float]]:
+    """
+    Find the latitude and longitude for an address from the in-memory lookup table or the persistent geocode cache
+    :param addr: Address to look up
+    :return: Latitude, Longitude of address or None if it has not been geocoded before
+    """
+    if addr in locations:
+        return locations[addr]
+    if geocode_cache is not None:
+        coordinates = geocode_cache.get(addr)
+        if coordinates is not None:
+            locations[addr] = coordinates
+            return coordinates
+    return None
+
+
+def _store_coord_lat_lon(addr: str, coordinates: Tuple[float, float]) -> None:
+    """
+    Store geocoded coordinates in the in-memory lookup table and the persistent geocode cache
+    :param addr: Address that was geocoded
+    :param coordinates: Latitude, Longitude of address
+    """
+    locations[addr] = coordinates
+    if geocode_cache is not None:
+        geocode_cache.put(addr, coordinates)
+
+
 def find_coord_lat_lon(addr: str, key: Optional[str] = None) -> (float, float):
     """
     Find the latitude and longitude for an address
+    The in-memory lookup table is checked first followed by the persistent geocode cache, if one was configured,
+    before the geocoder is queried.
     :param addr: Address to geocode
     :param key: optional string for geocoder key
     :return: Latitude, Longitude of address
     """
     if key is None:
         key = os.environ.get("GEOCODER_KEY")
-    if addr in locations:
-        return locations[addr]
-    geolocator = OpenCageGeocode(key)
-    l1loc = geolocator.geocode(addr)
-    try:
-        coordinates = (l1loc[0]['geometry']['lat'], l1loc[0]['geometry']['lng'])
-        locations[addr] = coordinates
+    coordinates = _find_cached_coord_lat_lon(addr)
+    if coordinates is not None:
         return coordinates
-    except IndexError:
-        log.warning(f"Couldn't find coordinates for  {addr}")
+    coordinates = _get_geocoder(key).geocode(addr)
+    if coordinates is not None:
+        _store_coord_lat_lon(addr, coordinates)
+    return coordinates
+
+
+def geocode_many(addresses: Iterable[str], key: Optional[str] = None,
+                 max_workers: int = MAX_GEOCODER_WORKERS) -> np.ndarray:
+    """
+    Find the latitude and longitude for many addresses at once.
+    Duplicate addresses are only looked up once, and addresses missing from the caches are geocoded concurrently on a
+    bounded pool of threads sharing a single geocoder backend, if the backend supports concurrent lookups.
+    Coordinates are stored in the caches as soon as their lookup completes. If any lookup fails, the error is raised
+    once all other lookups are done, so the coordinates found in the batch are kept for the next run.
+    :param addresses: Addresses to geocode
+    :param key: optional string for geocoder key
+    :param max_workers: maximum number of concurrent geocoder requests
+    :return: Array of shape (number of addresses, 2) with the Latitude, Longitude of each address in the input order.
+             Addresses that could not be found are NaN.
+    """
+    if key is None:
+        key = os.environ.get("GEOCODER_KEY")
+    addresses = list(addresses)
+    resolved = {}
+    misses = []
+    for addr in dict.fromkeys(addresses):
+        coordinates = _find_cached_coord_lat_lon(addr)
+        if coordinates is None:
+            misses.append(addr)
+        else:
+            resolved[addr] = coordinates
+    if misses:
+        log.info(f"Geocoding {len(misses)} of {len(resolved) + len(misses)} unique addresses")
+        backend = _get_geocoder(key)
+        failures = {}
+
+        def store(addr: str, lookup: Callable[[], Optional[Tuple[float, float]]]) -> None:
+            # Every coordinate is stored as soon as it is found, so a failed lookup never discards the others
+            try:
+                coordinates = lookup()
+            except Exception as exception:
+                log.warning(f"Failed to geocode {addr}: {exception!r}")
+                failures[addr] = exception
+                return
+            if coordinates is not None:
+                _store_coord_lat_lon(addr, coordinates)
+                resolved[addr] = coordinates
+
+        if backend.supports_concurrency and len(misses) > 1:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(misses)))) as executor:
+                futures = {executor.submit(backend.geocode, addr): addr for addr in misses}
+                for future in as_completed(futures):
+                    store(futures[future], future.result)
+        else:
+            for addr in misses:
+                store(addr, lambda: backend.geocode(addr))
+        if failures:
+            log.error(f"Failed to geocode {len(failures)} of {len(misses)} addresses")
+            raise next(iter(failures.values()))
+    return np.array([resolved.get(addr, (np.nan, np.nan)) for addr in addresses], dtype=float).reshape(-1, 2)
 
 
 def find_coord_lon_lat(addr: str, key: Optional[str] = None) -> (float, float):
@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+from pandas import DataFrame
+
+from avicena.models.MergeAddress import MergeAddress
+from avicena.models.RevenueRate import RevenueRate
+from avicena.models.Trip import Trip
+from avicena.util.DataFrameStorage import save_df, load_df
+
+log = logging.getLogger(__name__)
+
+PARSE_CACHE_VERSION = 1  # Increase whenever parsing or standardization changes so that older results are not reused
+FILE_HASH_BLOCK_SIZE = 1 << 20  # Number of bytes of the trips file hashed at a time
+
+
+def fingerprint(parser_name: str, trips_file: str, merge_details: Dict[str, MergeAddress],
+                revenue_table: Dict[str, List[RevenueRate]], assumed_speed: int) -> str:
+    """
+    Compute a fingerprint of the content of everything the parsed trips are computed from
+    :param parser_name: Name of the parser module
+    :param trips_file: File with trip details
+    :param merge_details: Map from merge address to MergeAddress objects
+    :param revenue_table: Map from level of service to RevenueRate objects
+    :param assumed_speed: Assumed Driving Speed to determine travel times
+    :return: Hexadecimal fingerprint
+    """
+    digest = hashlib.sha256(repr((PARSE_CACHE_VERSION, parser_name, assumed_speed)).encode())
+    with open(trips_file, 'rb') as f:
+        for block in iter(lambda: f.read(FILE_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    digest.update(repr(sorted((address, merge_address.window.total_seconds())
+                              for address, merge_address in merge_details.items())).encode())
+    digest.update(repr(sorted((los, sorted((rate.lower_mileage_bound, rate.upper_mileage_bound, rate.base_rate,
+                                            rate.revenue_per_mile) for rate in rates))
+                              for los, rates in revenue_table.items())).encode())
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    This class stores the results of parsing a trips file on disk so that runs with the same inputs can skip parsing,
+    standardizing, and geocoding the trips again.
+    Every result is stored as the standardized trips DataFrame in Arrow IPC format next to the pickled list of valid
+    Trip objects, and both are identified by the fingerprint of the trips file content, the merge details, the revenue
+    table, and the assumed speed. Changes to the geocoder configuration are not part of the fingerprint, so the cache
+    directory should be cleared when the geocoder changes.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """
+        Initialize a Parse Cache
+        :param directory: Directory where the parsed trips are stored
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def __paths(self, key: str) -> Tuple[str, str]:
+        """
+        :param key: Fingerprint of the inputs
+        :return: Paths of the trips DataFrame file and the Trip list file
+        """
+        base = os.path.join(self.directory, key)
+        return f"{base}.arrow", f"{base}_trips.pkl"
+
+    def load(self, key: str) -> Optional[Tuple[DataFrame, List[Trip]]]:
+        """
+        Load cached parsed trips
+        :param key: Fingerprint of the inputs
+        :return: Standardized trips DataFrame and list of valid Trips or None if the inputs are not cached
+        """
+        df_file, trips_file = self.__paths(key)
+        if not os.path.exists(df_file) or not os.path.exists(trips_file):
+            return None
+        try:
+            trips_df = load_df(df_file)
+            with open(trips_file, 'rb') as f:
+                trips = pickle.load(f)
+        except Exception:
+            log.warning(f"Failed to load cached parsed trips {df_file}", exc_info=True)
+            return None
+        log.info(f"Loaded {len(trips)} cached parsed trips from {df_file}")
+        return trips_df, trips
+
+    def save(self, key: str, trips_df: DataFrame, trips: List[Trip]) -> None:
+        """
+        Store parsed trips in the cache. Files are written under a temporary name first so that runs in parallel never
+        read a partially written result.
+        :param key: Fingerprint of the inputs
+        :param trips_df: Standardized trips DataFrame
+        :param trips: List of valid Trips
+        """
+        df_file, trips_file = self.__paths(key)
+        suffix = f".{os.getpid()}.tmp"
+        # The storage format is given by the extension, so it must be kept for the temporary file
+        temporary_df_file = f"{df_file[:-len('.arrow')]}{suffix}.arrow"
+        try:
+            with open(trips_file + suffix, 'wb') as f:
+                pickle.dump(trips, f, protocol=pickle.HIGHEST_PROTOCOL)
+            save_df(trips_df, temporary_df_file)
+        except Exception:
+            log.warning(f"Failed to save parsed trips to cache {df_file}", exc_info=True)
+            for path in (trips_file + suffix, temporary_df_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        os.replace(temporary_df_file, df_file)
+        os.replace(trips_file + suffix, trips_file)
+        log.info(f"Saved parsed trips to cache {df_file}")
@@ -1,17 +1,26 @@
 import datetime
+import logging
+import re
 from typing import Union, Dict, List
 
+import numpy as np
 import pandas as pd
 from pandas import Series, DataFrame
 
 from avicena.models.MergeAddress import MergeAddress
 from avicena.models.RevenueRate import RevenueRate
-from avicena.util.Exceptions import RevenueCalculationException, MissingTripDetailsException
-from avicena.util.Geolocator import find_coord_lat_lon
+from avicena.models.RevenueTable import RevenueTable
+from avicena.util.AhoCorasick import AhoCorasick
+from avicena.util.DataFrameStorage import PARSED_TRIPS_SCHEMA, save_df
+from avicena.util.Exceptions import MissingTripDetailsException
+from avicena.util.Geolocator import geocode_many
 from avicena.util.TimeWindows import get_time_window_by_hours_minutes, timedelta_to_fraction_of_day
 
+log = logging.getLogger(__name__)
+
 INTER_LEG_BUFFER = get_time_window_by_hours_minutes(2, 30)
 TRIP_LENGTH_BUFFER = get_time_window_by_hours_minutes(2, 0)
+TIME_PATTERN = re.compile(r"^\s*(\d+)\s*:\s*(\d+)\s*(?::\s*(\d+)\s*)?$")  # HH:MM or HH:MM:SS
 
 
 def convert_time(time: Union[float, str]) -> float:
@@ -35,57 +44,41 @@ def convert_time(time: Union[float, str]) -> float:
         return timedelta_to_fraction_of_day(td)
 
 
-def _adjust_pickup_dropoff_merge(pickup_time: float, id: str, pickup_address: str, dropoff_times: Series, ids: Series,
-                                 merge_details: Dict[str, MergeAddress]) -> Series:
-    """
-    Clean up the pickup and dropoff times for a given trip that was parsed from the inputs
-    This function returns a a series with the udpated pickup_time, dropoff_time, and indication of whether it is a merge trip
-    :param pickup_time: Original pickup time of input trip
-    :param id: ID of input trip. Must end in 'A' , 'B', or 'C'
-    :param pickup_address: Pickup address of input trip
-    :param dropoff_times: All Trip Dropoff Times
-    :param ids: All Trip IDs
-    :param merge_details: dictionary mapping address substring to actual MergeAddress object
-    :return: Series containing [pickup_time, dropoff_time, is_merge]
-    """
-    id_mapping = {'B': 'A', 'C': 'B'}
-    start_window = INTER_LEG_BUFFER
-    is_merge = False
-    for merge_address in merge_details:
-        if pickup_address in merge_address:
-            start_window = timedelta_to_fraction_of_day(merge_details[merge_address].window)
-            is_merge = True
-            break
-    if (pickup_time == 0.0 or pickup_time > 1 - (1 / 24) or is_merge) and (id.endswith('B') or id.endswith('C')):
-        pickup_time = dropoff_times[ids == id[:-1] + id_mapping[id[-1]]].iloc[0] + start_window
-        return pd.Series([pickup_time, min(1 - (1 / 24), pickup_time + TRIP_LENGTH_BUFFER), is_merge])
-    else:
-        return pd.Series([pickup_time, min(1 - (1 / 24), pickup_time + TRIP_LENGTH_BUFFER), is_merge])
-
-
-def _revenue_calculation(table: Dict[str, List[RevenueRate]], miles: float, los: str) -> float:
+def convert_times(times: Series) -> Series:
     """
-    Calculate the revenue for a given Level of Service and miles for a trip using the revenue table
-    :param table: dictionary mapping level of service to a list of associated revenue rates
-    :param miles: miles for a trip
-    :param los: level of service of the trip
-    :return: revenue earned from the trip
+    Standardize a whole column of time inputs at once, accepting the same formats as convert_time.
+    Values that are directly convertable to floats are kept as they are and HH:MM or HH:MM:SS strings are converted to
+    the fraction of the day passed. Times repeat a lot across trips, so every distinct value is only converted once.
+    :param times: input times
+    :return: float representation of every time of day
     """
-    for revenue_rate in table[los]:
-        if revenue_rate.lower_mileage_bound <= miles <= revenue_rate.upper_mileage_bound:
-            return revenue_rate.calculate_revenue(miles)
-    raise RevenueCalculationException(f"Unable to calculate revenue for level of service:{los} miles:{miles}")
+    codes, values = pd.factorize(times)
+    values = pd.Series(values, dtype=object)
+    converted = pd.to_numeric(values, errors='coerce').astype(float)
+    strings = converted.isna()
+    if strings.any():
+        segments = values[strings].astype(str).str.extract(TIME_PATTERN).astype(float)
+        invalid = segments[0].isna()
+        if invalid.any():
+            raise ValueError(f"Unable to convert times {list(values[strings][invalid])} to fractions of a day")
+        seconds = segments[0] * 60 * 60 + segments[1] * 60 + segments[2].fillna(0)
+        converted[strings] = seconds / (60 * 60 * 24)
+    # Missing times have the code -1 and stay missing
+    return pd.Series(np.append(converted.to_numpy(), np.nan)[codes], index=times.index, name=times.name)
 
 
 def _get_trip_coordinates(df: DataFrame) -> None:
     """
-    Populate DataFrame with coordinates of pickup and dropoff addresses
+    Populate DataFrame with coordinates of pickup and dropoff addresses.
+    Pickup and dropoff addresses are geocoded together in one batch so that addresses shared across trips are only
+    looked up once.
     :param df: DataFrame to update
     """
-    df[['trip_pickup_lat', 'trip_pickup_lon']] = df['trip_pickup_address'].apply(
-        lambda x: pd.Series(find_coord_lat_lon(x)))
-    df[['trip_dropoff_lat', 'trip_dropoff_lon']] = df['trip_dropoff_address'].apply(
-        lambda x: pd.Series(find_coord_lat_lon(x)))
+    num_trips = len(df)
+    coordinates = geocode_many(np.concatenate([df['trip_pickup_address'].to_numpy(),
+                                               df['trip_dropoff_address'].to_numpy()]))
+    df[['trip_pickup_lat', 'trip_pickup_lon', 'trip_dropoff_lat', 'trip_dropoff_lon']] = \
+        pd.DataFrame(np.hstack([coordinates[:num_trips], coordinates[num_trips:]]), index=df.index)
 
 
 def _compute_trip_revenues(df: DataFrame, revenue_table: Dict[str, List[RevenueRate]]) -> None:
@@ -94,20 +87,57 @@ def _compute_trip_revenues(df: DataFrame, revenue_table: Dict[str, List[RevenueR
     :param df: DataFrame to be updated with trip details
     :param revenue_table: dictionary mapping level of service to a list of associated revenue rates
     """
-    df['trip_revenue'] = df[['trip_miles', 'trip_los']].apply(
-        lambda x: _revenue_calculation(revenue_table, float(x['trip_miles']), x['trip_los']), axis=1)
+    df['trip_revenue'] = RevenueTable(revenue_table).calculate_revenues(df['trip_miles'].astype(float), df['trip_los'],
+                                                                        df['trip_id'])
+
+
+def _merge_windows(addresses: Series, merge_details: Dict[str, MergeAddress]) -> Series:
+    """
+    Find the merge pickup window of every address. An address is a merge address if it contains the address substring
+    of any MergeAddress, and the first matching MergeAddress determines the window.
+    :param addresses: Pickup addresses of the trips
+    :param merge_details: dictionary mapping address substring to actual MergeAddress object
+    :return: Series with the window as a fraction of the day for merge addresses and NaN for all other addresses
+    """
+    merge_addresses = list(merge_details)
+    matcher = AhoCorasick(merge_addresses)
+    windows = dict()
+    for address in addresses.unique():
+        match = matcher.first_match(address)
+        if match is not None:
+            windows[address] = timedelta_to_fraction_of_day(merge_details[merge_addresses[match]].window)
+    return addresses.map(windows).astype(float)
 
 
 def _fill_in_missing_times_and_merge_details(df: DataFrame, merge_details: Dict[str, MergeAddress]) -> None:
     """
-    Update the missing travel times, correct for merge trip timings, set the merge indication flags
+    Update the missing travel times, correct for merge trip timings, set the merge indication flags.
+    A 'B' or 'C' leg that is picked up at a merge address or has a missing pickup time (0 or late at night) is picked
+    up a window after the dropoff of the previous leg of the patient. Every trip is expected to be dropped off within
+    TRIP_LENGTH_BUFFER of its pickup.
     :param df: DataFrame to be updated with trip details
     :param merge_details: dictionary mapping address substring to actual MergeAddress object
     """
-    df[['trip_pickup_time', 'trip_dropoff_time', 'merge_flag']] = \
-        df[['trip_pickup_time', 'trip_id', 'trip_pickup_address']].apply(
-            lambda x: _adjust_pickup_dropoff_merge(x['trip_pickup_time'], x['trip_id'], x['trip_pickup_address'],
-                                                   df['trip_dropoff_time'], df['trip_id'], merge_details), axis=1)
+    ids = df['trip_id'].astype(str)
+    legs = ids.str[-1]
+    previous_ids = ids.str[:-1] + legs.map({'B': 'A', 'C': 'B'})
+    dropoff_times = pd.Series(df['trip_dropoff_time'].to_numpy(), index=ids.to_numpy())
+    dropoff_times = dropoff_times[~dropoff_times.index.duplicated()]
+    previous_dropoff_times = previous_ids.map(dropoff_times)
+
+    windows = _merge_windows(df['trip_pickup_address'], merge_details)
+    is_merge = windows.notna()
+    pickup_times = df['trip_pickup_time']
+    adjust = legs.isin(['B', 'C']) & ((pickup_times == 0.0) | (pickup_times > 1 - (1 / 24)) | is_merge)
+    missing = adjust & previous_dropoff_times.isna()
+    if missing.any():
+        log.warning(f"Unable to adjust pickup times of trips {list(ids[missing])} without their previous legs")
+        adjust &= ~missing
+
+    pickup_times = pickup_times.mask(adjust, previous_dropoff_times + windows.fillna(INTER_LEG_BUFFER))
+    df['trip_pickup_time'] = pickup_times
+    df['trip_dropoff_time'] = np.minimum(1 - (1 / 24), pickup_times + TRIP_LENGTH_BUFFER)
+    df['merge_flag'] = is_merge
 
 
 def _standardize_time_format_trip_df(df: DataFrame) -> None:
@@ -115,8 +145,31 @@ def _standardize_time_format_trip_df(df: DataFrame) -> None:
     Convert all the times stored in the DataFrame to floats representing fraction of the day
     :param df: DataFrame with trip_pickup_time and trip_dropoff_time
     """
-    df['trip_pickup_time'] = df['trip_pickup_time'].apply(convert_time)
-    df['trip_dropoff_time'] = df['trip_dropoff_time'].apply(convert_time)
+    df['trip_pickup_time'] = convert_times(df['trip_pickup_time'])
+    df['trip_dropoff_time'] = convert_times(df['trip_dropoff_time'])
+
+
+def standardize_trip_chunk(df: DataFrame, revenue_table: Dict[str, List[RevenueRate]]) -> None:
+    """
+    Apply the standardization steps that only depend on each trip itself: time standardization, revenue calculations,
+    and coordinates. Large inputs can be standardized in chunks with this function before all chunks are combined
+    and completed with standardize_trip_legs.
+    :param df: input trip DataFrame to be updated
+    :param revenue_table: dictionary mapping level of service to a list of associated revenue rates
+    """
+    _standardize_time_format_trip_df(df)
+    _compute_trip_revenues(df, revenue_table)
+    _get_trip_coordinates(df)
+
+
+def standardize_trip_legs(df: DataFrame, merge_details: Dict[str, MergeAddress]) -> None:
+    """
+    Apply the standardization steps that relate the legs of a patient to each other: merge trip updates and missing
+    time updates. All legs of every patient must be in the DataFrame.
+    :param df: input trip DataFrame with standardized times
+    :param merge_details: dictionary mapping address substring to actual MergeAddress object
+    """
+    _fill_in_missing_times_and_merge_details(df, merge_details)
 
 
 def standardize_trip_df(df: DataFrame, merge_details: Dict[str, MergeAddress],
@@ -128,26 +181,22 @@ def standardize_trip_df(df: DataFrame, merge_details: Dict[str, MergeAddress],
     :param merge_details: dictionary mapping address substring to actual MergeAddress object
     :param revenue_table: dictionary mapping level of service to a list of associated revenue rates
     """
-    _standardize_time_format_trip_df(df)
-    _fill_in_missing_times_and_merge_details(df, merge_details)
-    _compute_trip_revenues(df, revenue_table)
-    _get_trip_coordinates(df)
+    standardize_trip_chunk(df, revenue_table)
+    standardize_trip_legs(df, merge_details)
 
 
-def verify_and_save_parsed_trips_df_to_csv(df: DataFrame, path_to_save: str) -> None:
+def verify_and_save_parsed_trips_df(df: DataFrame, path_to_save: str) -> None:
     """
     Check that all required columns are in the input DataFrame of parsed trips (i.e. it has been standardized) and
-    save it to the output_directory in a file called 'parsed_trips.csv'
-    :param df: DataFrame that will be verified and saved to CSV
-    :param path_to_save: path to save parsed CSV
+    save it to the output_directory in a file called 'parsed_trips' in the storage format given by its extension
+    :param df: DataFrame that will be verified and saved
+    :param path_to_save: path to save parsed trips
     :return:
     """
-    required_columns = {'trip_id', 'trip_pickup_address', 'trip_pickup_time', 'trip_pickup_lat', 'trip_pickup_lon',
-                        'trip_dropoff_address', 'trip_dropoff_time', 'trip_dropoff_lat', 'trip_dropoff_lon', 'trip_los',
-                        'trip_miles', 'merge_flag', 'trip_revenue'}
+    required_columns = PARSED_TRIPS_SCHEMA.names
     for column in required_columns:
         if column not in df.columns:
             raise MissingTripDetailsException(f"Expected {column} to be in DataFrame")
 
     parsed_df = df[required_columns]
-    parsed_df.to_csv(path_to_save)
+    save_df(parsed_df, path_to_save, PARSED_TRIPS_SCHEMA)